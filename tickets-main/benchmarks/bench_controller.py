@@ -0,0 +1,219 @@
+"""
+Benchmark the in-memory Controller hot paths at several scales.
+
+Every combination of `--tickets` and `--users` runs in a fresh process, so its
+peak RSS is its own. Each run creates `users` users and one event with
+`tickets` seats, then times event creation, purchase_tickets,
+get_available_tickets_count, get_ticket_by_id, authenticate_user and refunds,
+reporting ops/sec and p50/p99 latency per operation. Results are written as
+JSON; pass an earlier file to --compare to see the change in ops/sec.
+
+    python benchmarks/bench_controller.py --tickets 1000,1000000,10000000 --users 1000,1000000 --output bench.json
+    python benchmarks/bench_controller.py --compare before.json --output after.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is reported as null there
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "event_ticketing"))
+
+from controller import Controller, Hall  # noqa: E402
+from passwords import PasswordHasher  # noqa: E402
+
+PASSWORD = "bench-password"
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Kilobytes on Linux
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    return samples[min(len(samples) - 1, max(0, int(round(fraction * len(samples))) - 1))]
+
+
+def measure(results: dict, name: str, arguments: list, operation):
+    """Time `operation` once per argument and record ops/sec and latency percentiles (microseconds)."""
+    latencies = []
+    start = time.perf_counter()
+    for argument in arguments:
+        began = time.perf_counter_ns()
+        operation(argument)
+        latencies.append(time.perf_counter_ns() - began)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    results[name] = {
+        "ops": len(latencies),
+        "seconds": elapsed,
+        "ops_per_sec": len(latencies) / elapsed if latencies else None,
+        "p50_us": percentile(latencies, 0.50) / 1000 if latencies else None,
+        "p99_us": percentile(latencies, 0.99) / 1000 if latencies else None,
+    }
+
+
+def run(tickets: int, users: int, ops: int, auth_ops: int, quantity: int, seed: int) -> dict:
+    """One scale: build the state, then time each operation on it."""
+    rng = random.Random(seed)
+    controller = Controller()
+    results = {}
+    setup_start = time.perf_counter()
+
+    # Users share one stored hash: hashing each would only time the KDF
+    password_hash = PasswordHasher().hash(PASSWORD)
+    people = [
+        controller.create_user(name=f"User {i}", email=f"user{i}@example.com", password="", roles=["Buyer"], password_hash=password_hash)
+        for i in range(users)
+    ]
+    organizer = controller.create_user(name="Organizer", email="organizer@example.com", password="", roles=["EventOrganizer"], password_hash=password_hash)
+    hall = Hall(size="Stadium", capacity=tickets)
+    controller.add_hall(hall)
+    zones = [
+        {"type": "VIP", "percentage": 0.1, "price": 150.0, "quantity": tickets // 10},
+        {"type": "Regular", "percentage": 0.9, "price": 50.0, "quantity": tickets - tickets // 10},
+    ]
+    setup_seconds = time.perf_counter() - setup_start
+
+    events = []
+    measure(results, "create_event", [zones], lambda event_zones: events.append(controller.create_event(
+        name="Bench", date=datetime(2023, 8, 15), organizer=organizer, hall=hall,
+        description="Benchmark event", image_url="", zones=event_zones)))
+    # Small events in their own halls and days, to time creation apart from seat allocation
+    small_halls = [Hall(size="Small", capacity=100) for _ in range(10)]
+    for small_hall in small_halls:
+        controller.add_hall(small_hall)
+    small_zones = [{"type": "Regular", "percentage": 1.0, "price": 20.0, "quantity": 100}]
+    measure(results, "create_event_small", range(min(ops, 1000)), lambda i: controller.create_event(
+        name=f"Small {i}", date=datetime(2024, 1, 1) + timedelta(days=i // len(small_halls)), organizer=organizer,
+        hall=small_halls[i % len(small_halls)], description="Small benchmark event", image_url="", zones=small_zones))
+    zone_list = list(events[0].zones.values())
+
+    # Sell at most half of the seats, so every purchase succeeds at every scale
+    purchases = min(ops, max(1, tickets // (2 * quantity)))
+    orders = [controller.create_order(buyer=people[i % len(people)] if people else organizer) for i in range(purchases)]
+    measure(results, "purchase_tickets", range(purchases), lambda i: controller.purchase_tickets(
+        order_id=orders[i].id, zone=zone_list[i % len(zone_list)], quantity=quantity))
+    for order in orders:
+        controller.complete_order(order_id=order.id)
+
+    measure(results, "get_available_tickets_count", [zone_list[i % len(zone_list)] for i in range(ops)], controller.get_available_tickets_count)
+
+    first_ticket_id = min(zone.first_ticket_id for zone in zone_list)
+    measure(results, "get_ticket_by_id", [first_ticket_id + rng.randrange(tickets) for _ in range(ops)], controller.get_ticket_by_id)
+
+    emails = [f"user{rng.randrange(users)}@example.com" for _ in range(auth_ops)] if users else []
+    measure(results, "authenticate_user", emails, lambda email: controller.authenticate_user(email, PASSWORD))
+
+    sold = [ticket for order in orders for ticket in order.tickets]
+    refunds = rng.sample(sold, min(len(sold), ops // 10 or 1))
+
+    def refund(ticket):
+        request = controller.create_refund_request(ticket_id=ticket.id, buyer=ticket.buyer)
+        controller.approve_refund(request.id)
+    measure(results, "refund", refunds, refund)
+
+    return {
+        "tickets": tickets,
+        "users": users,
+        "setup_seconds": setup_seconds,
+        "peak_rss_bytes": peak_rss(),
+        "operations": results,
+    }
+
+
+def run_in_subprocess(scale: dict) -> dict:
+    """Run one scale in a fresh interpreter so that earlier scales do not inflate its peak RSS."""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(scale)],
+        check=True, stdout=subprocess.PIPE, text=True
+    )
+    return json.loads(completed.stdout)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_run(result: dict, baseline: dict = None):
+    rss = result["peak_rss_bytes"]
+    rss_text = f"{rss / 2 ** 20:,.1f} MiB" if rss is not None else "n/a"
+    print(f"\n{result['tickets']:,} tickets, {result['users']:,} users: setup {result['setup_seconds']:.2f} s, peak RSS {rss_text}")
+    print(f"{'operation':<28}{'ops':>8}{'ops/s':>14}{'p50 us':>12}{'p99 us':>12}" + (f"{'vs base':>10}" if baseline else ""))
+    for name, stats in result["operations"].items():
+        rate = stats["ops_per_sec"]
+        row = f"{name:<28}{stats['ops']:>8}{rate or 0:>14,.0f}{stats['p50_us']:>12,.1f}{stats['p99_us']:>12,.1f}" if stats["ops"] else f"{name:<28}{0:>8}"
+        base = baseline["operations"].get(name) if baseline else None
+        if base and base["ops_per_sec"] and rate:
+            row += f"{rate / base['ops_per_sec'] - 1:>+10.1%}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", default="1000,100000,1000000", help="Comma-separated seat counts")
+    parser.add_argument("--users", default="1000,100000", help="Comma-separated user counts")
+    parser.add_argument("--ops", type=int, default=2000, help="Operations timed per measurement")
+    parser.add_argument("--auth-ops", type=int, default=50, help="authenticate_user calls (each runs the password KDF)")
+    parser.add_argument("--quantity", type=int, default=4, help="Tickets per purchase")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Earlier JSON results to compare ops/sec with")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    if args.worker:
+        json.dump(run(**json.loads(args.worker)), sys.stdout)
+        return
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = {(run_result["tickets"], run_result["users"]): run_result for run_result in json.load(file)["runs"]}
+
+    runs = []
+    for tickets in (int(value) for value in args.tickets.split(",")):
+        for users in (int(value) for value in args.users.split(",")):
+            result = run_in_subprocess({
+                "tickets": tickets, "users": users, "ops": args.ops, "auth_ops": args.auth_ops, "quantity": args.quantity, "seed": args.seed
+            })
+            print_run(result, baseline.get((tickets, users)))
+            runs.append(result)
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {"ops": args.ops, "auth_ops": args.auth_ops, "quantity": args.quantity, "seed": args.seed},
+            "runs": runs,
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
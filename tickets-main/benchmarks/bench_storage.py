@@ -0,0 +1,95 @@
+"""
+Compare the in-memory Controller with SQLiteController.
+
+Creates one event with `--tickets` seats (default 1,000,000) in each backend and
+times event creation, purchases, availability reads, ticket lookups and refunds.
+
+    python benchmarks/bench_storage.py --tickets 1000000 --purchases 2000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "event_ticketing"))
+
+from controller import Controller, Hall  # noqa: E402
+from sqlite_controller import SQLiteController  # noqa: E402
+
+
+def timed(results: dict, name: str, operations: int, function):
+    start = time.perf_counter()
+    value = function()
+    elapsed = time.perf_counter() - start
+    results[name] = (elapsed, operations / elapsed if elapsed else float("inf"))
+    return value
+
+
+def run(controller, tickets: int, purchases: int, quantity: int) -> dict:
+    results = {}
+    user = controller.create_user(name="Bench", email="bench@example.com", password="bench", roles=["Buyer", "EventOrganizer"])
+    hall = Hall(size="Stadium", capacity=tickets)
+    controller.add_hall(hall)
+    zones = [
+        {"type": "VIP", "percentage": 0.1, "price": 150.0, "quantity": tickets // 10},
+        {"type": "Regular", "percentage": 0.9, "price": 50.0, "quantity": tickets - tickets // 10},
+    ]
+    event = timed(results, "create_event", tickets, lambda: controller.create_event(
+        name="Bench", date=datetime(2023, 8, 15), organizer=user, hall=hall,
+        description="Benchmark event", image_url="", zones=zones))
+    zone_list = list(event.zones.values())
+
+    def purchase():
+        sold = []
+        for i in range(purchases):
+            order = controller.create_order(buyer=user)
+            result = controller.purchase_many(order, {zone_list[i % len(zone_list)]: quantity})
+            controller.complete_order(order_id=order.id)
+            for zone_tickets in result.tickets.values():
+                sold.extend(ticket.id for ticket in zone_tickets)
+        return sold
+    sold = timed(results, "purchase", purchases, purchase)
+
+    timed(results, "availability", purchases, lambda: [zone_list[i % len(zone_list)].get_available_tickets_count() for i in range(purchases)])
+    sample = random.Random(0).sample(sold, min(len(sold), purchases))
+    timed(results, "get_ticket_by_id", len(sample), lambda: [controller.get_ticket_by_id(ticket_id) for ticket_id in sample])
+
+    refunds = sample[:max(1, len(sample) // 10)]
+
+    def refund():
+        for ticket_id in refunds:
+            request = controller.create_refund_request(ticket_id=ticket_id, buyer=user)
+            controller.approve_refund(request.id)
+    timed(results, "refund", len(refunds), refund)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--purchases", type=int, default=2000)
+    parser.add_argument("--quantity", type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    backends = {"memory": lambda: Controller()}
+    with tempfile.TemporaryDirectory() as directory:
+        backends["sqlite"] = lambda: SQLiteController(os.path.join(directory, "bench.db"))
+        results = {name: run(factory(), args.tickets, args.purchases, args.quantity) for name, factory in backends.items()}
+
+    print(f"{args.tickets:,} tickets, {args.purchases:,} purchases of {args.quantity}")
+    print(f"{'operation':<18}" + "".join(f"{name + ' s':>14}{name + ' ops/s':>16}" for name in backends))
+    for operation in results["memory"]:
+        row = f"{operation:<18}"
+        for name in backends:
+            elapsed, rate = results[name][operation]
+            row += f"{elapsed:>14.4f}{rate:>16,.0f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,196 @@
 from fasthtml.common import *
-from datetime import datetime
+from datetime import datetime, timedelta
 from controller import *
-import hashlib
-from fastapi.responses import RedirectResponse
-import shutil  # Add this import
+from waiting_room import WaitingRooms
+from persistence import ControllerStore
+from sqlite_controller import SQLiteController
+from shared_inventory import SharedInventory
+from coordinator import RemoteCoordinator
+from sessions import SessionStore, SignedCookieSessions
+from passwords import PasswordHasher, PasswordHashingBusy
+from log_config import configure_logging, parse_levels
+from page_cache import PageCache, PageCacheMiddleware
+from availability_stream import AvailabilityBroadcaster
+from media import ImageStore
+from static_assets import StaticAssets, StaticAssetMiddleware
+import asyncio
+import os
+import re
+from urllib.parse import urlencode
+from fastapi.responses import RedirectResponse, StreamingResponse
 
 app, rt = fast_app()
 
-# Initialize the controller and create sample data
-controller = Controller()
-user = controller.create_user(name="John Doe", email="john@example.com", password="password123", roles=["Buyer", "EventOrganizer"])
-hall1 = Hall(size="Large", capacity=1000)
-hall2 = Hall(size="Large", capacity=1000)
-hall3 = Hall(size="Large", capacity=1000)
-hall4 = Hall(size="Large", capacity=1000)
-hall5 = Hall(size="small", capacity=500)
-controller.add_hall(hall1)
-controller.add_hall(hall2)
-controller.add_hall(hall3)
-controller.add_hall(hall4)
-controller.add_hall(hall5)
-event = controller.create_event(
-    name="Concert",
-    date=datetime(2023, 8, 15),
-    organizer=user,
-    hall=hall1,
-    description="A grand concert featuring popular artists.",
-    image_url="https://example.com/concert.jpg",
-    zones=[ 
-        {"type": "VIP", "percentage": 0.2, "price": 150.0, "quantity": int(hall1.capacity * 0.2)},
-        {"type": "Regular", "percentage": 0.8, "price": 50.0, "quantity": int(hall1.capacity * 0.8)}
-    ]
+# Logs are written by a background thread; TICKETS_LOG_LEVELS sets levels per module,
+# e.g. "controller=WARNING" keeps the purchase path quiet
+configure_logging(
+    level=os.environ.get("TICKETS_LOG_LEVEL", "INFO"),
+    module_levels=parse_levels(os.environ.get("TICKETS_LOG_LEVELS", "")),
+    json_format=os.environ.get("TICKETS_LOG_FORMAT") == "json"
 )
-event1 = controller.create_event(
-    name="Concert2",
-    date=datetime(2023, 8, 15),
-    organizer=user,
-    hall=hall2,
-    description="Another amazing concert with different artists.",
-    image_url="https://example.com/concert2.jpg",
-    zones=[
-        {"type": "VIP", "percentage": 0.2, "price": 150.0, "quantity": int(hall2.capacity * 0.2)},
-        {"type": "Regular", "percentage": 0.8, "price": 50.0, "quantity": int(hall2.capacity * 0.8)}
-    ]
+
+# Initialize the controller: SQLite when TICKETS_SQLITE_PATH is set, otherwise in memory
+# (restoring saved state when TICKETS_DATA_DIR is set)
+sqlite_path = os.environ.get("TICKETS_SQLITE_PATH")
+data_dir = os.environ.get("TICKETS_DATA_DIR")
+store = ControllerStore(data_dir) if data_dir and not sqlite_path else None
+if sqlite_path:
+    controller = SQLiteController(sqlite_path)
+else:
+    controller = store.open() if store else Controller()
+    if os.environ.get("TICKETS_COORDINATOR"):
+        # Several app nodes sell the same zones through one coordinator (host:port); each worker is a node
+        coordinator_host, coordinator_port = os.environ["TICKETS_COORDINATOR"].rsplit(":", 1)
+        coordinator = RemoteCoordinator(coordinator_host, int(coordinator_port))
+        controller.use_coordinator(coordinator)
+        coordinator.catalog.start_follower(controller)  # Users, halls and events other nodes create show up here too
+    elif os.environ.get("TICKETS_SHARED_INVENTORY") and not store:
+        # Sibling uvicorn workers (same parent process) sell from one shared inventory
+        shared_inventory = SharedInventory(f"tickets-{os.getppid()}")
+        controller.attach_shared_inventory(shared_inventory)
+        shared_inventory.catalog.start_follower(controller)  # Users, halls and events other workers create show up here too
+controller.start_hold_sweeper()  # Release expired seat holds in the background
+# Password KDF (TICKETS_PASSWORD_KDF=scrypt or pbkdf2_sha256), hashed off the event loop
+controller.configure_password_hashing(
+    PasswordHasher(algorithm=os.environ.get("TICKETS_PASSWORD_KDF", "scrypt")),
+    max_workers=int(os.environ.get("TICKETS_HASH_WORKERS", "2")),
+    max_pending=int(os.environ.get("TICKETS_HASH_QUEUE", "64"))
+)
+
+if sqlite_path and controller.get_user_by_email("john@example.com"):
+    user = controller.get_user_by_email("john@example.com")
+elif store and store.restored:
+    store.checkpoint(controller)  # Fold the replayed log into a fresh snapshot
+    user = controller.get_user_by_email("john@example.com")
+else:
+    # Create sample data; workers sharing their inventory also share it, so only the first one creates it
+    with controller.shared_catalog():
+        user = controller.get_user_by_email("john@example.com")
+        if user is None:
+            user = controller.create_user(name="John Doe", email="john@example.com", password="password123", roles=["Buyer", "EventOrganizer"])
+            hall1 = Hall(size="Large", capacity=1000)
+            hall2 = Hall(size="Large", capacity=1000)
+            hall3 = Hall(size="Large", capacity=1000)
+            hall4 = Hall(size="Large", capacity=1000)
+            hall5 = Hall(size="small", capacity=500)
+            controller.add_hall(hall1)
+            controller.add_hall(hall2)
+            controller.add_hall(hall3)
+            controller.add_hall(hall4)
+            controller.add_hall(hall5)
+            event = controller.create_event(
+                name="Concert",
+                date=datetime(2023, 8, 15),
+                organizer=user,
+                hall=hall1,
+                description="A grand concert featuring popular artists.",
+                image_url="https://example.com/concert.jpg",
+                zones=[ 
+                    {"type": "VIP", "percentage": 0.2, "price": 150.0, "quantity": int(hall1.capacity * 0.2)},
+                    {"type": "Regular", "percentage": 0.8, "price": 50.0, "quantity": int(hall1.capacity * 0.8)}
+                ]
+            )
+            event1 = controller.create_event(
+                name="Concert2",
+                date=datetime(2023, 8, 15),
+                organizer=user,
+                hall=hall2,
+                description="Another amazing concert with different artists.",
+                image_url="https://example.com/concert2.jpg",
+                zones=[
+                    {"type": "VIP", "percentage": 0.2, "price": 150.0, "quantity": int(hall2.capacity * 0.2)},
+                    {"type": "Regular", "percentage": 0.8, "price": 50.0, "quantity": int(hall2.capacity * 0.8)}
+                ]
+            )
+
+# Background snapshots (BGSAVE) every TICKETS_BGSAVE_INTERVAL seconds; 0 disables them
+bgsave_interval = float(os.environ.get("TICKETS_BGSAVE_INTERVAL", "300"))
+if store and bgsave_interval > 0:
+    store.start_background_saves(controller, bgsave_interval)
+
+# Signing key for cookies; set TICKETS_SECRET_KEY so all workers agree on it
+secret_key = os.environ.get("TICKETS_SECRET_KEY", "").encode() or os.urandom(32)
+
+# Waiting room in front of the purchase route (TICKETS_ADMIT_PER_SECOND=0 disables it)
+waiting_rooms = WaitingRooms(
+    admit_per_second=float(os.environ.get("TICKETS_ADMIT_PER_SECOND", "50")),
+    burst=int(os.environ.get("TICKETS_ADMIT_BURST", "50")),
+    secret=secret_key
+)
+
+# Session management: server-side store, or stateless signed cookies with TICKETS_SESSION_MODE=cookie
+session_ttl = float(os.environ.get("TICKETS_SESSION_TTL", "1800"))
+if os.environ.get("TICKETS_SESSION_MODE") == "cookie":
+    sessions = SignedCookieSessions(lookup_user=controller.get_user_by_id, secret=secret_key, ttl=session_ttl)
+else:
+    sessions = SessionStore(max_size=int(os.environ.get("TICKETS_MAX_SESSIONS", "100000")), idle_ttl=session_ttl)
+    sessions.start_sweeper()
+
+# Rendered /events and /event/{id} pages, invalidated by the controller's change notifications.
+# Other workers' and nodes' changes are not announced here, so those setups also bound page age.
+# TICKETS_PAGE_CACHE_SIZE=0 turns the cache off.
+cross_process = bool(sqlite_path or os.environ.get("TICKETS_SHARED_INVENTORY") or os.environ.get("TICKETS_COORDINATOR"))
+page_cache_size = int(os.environ.get("TICKETS_PAGE_CACHE_SIZE", "1024"))
+page_cache = PageCache(
+    max_entries=page_cache_size,
+    ttl=float(os.environ.get("TICKETS_PAGE_CACHE_TTL", "1")) if cross_process else None
 )
 
-# Session management
-sessions = {}
+def invalidate_pages(change: str, event_id: int):
+    if change == "event":
+        page_cache.invalidate("events", f"event:{event_id}")
+    else:
+        page_cache.invalidate(f"event:{event_id}")
+
+def events_page(req, match):
+    return f"events:{req.url.query}:{req.headers.get('hx-request', '')}", ("events",)
+
+def event_page(req, match):
+    # The purchase form depends on the visitor's admission, so that is part of the key
+    event_id = int(match["event_id"])
+    return f"event:{event_id}:{is_admitted(req, event_id)}:{req.headers.get('hx-request', '')}", (f"event:{event_id}",)
+
+if page_cache_size > 0:
+    controller.add_change_listener(invalidate_pages)
+    app.add_middleware(PageCacheMiddleware, cache=page_cache, routes=[
+        (re.compile(r"/events"), events_page),
+        (re.compile(r"/event/(?P<event_id>\d+)"), event_page),
+    ])
+
+# Uploaded event images, content-addressed, with thumbnails for the event cards
+thumbnail_width, thumbnail_height = os.environ.get("TICKETS_THUMBNAIL_SIZE", "400x300").split("x")
+images = ImageStore(
+    root="static/images",
+    thumbnail_size=(int(thumbnail_width), int(thumbnail_height)),
+    workers=int(os.environ.get("TICKETS_IMAGE_WORKERS", "2")),
+    on_thumbnail=lambda image_url: page_cache.invalidate("events")  # Cards switch to the thumbnail
+)
+
+# Files under static/ are linked through fingerprinted /assets/ URLs, cached by browsers for a year
+assets = StaticAssets(root="static", prefix="/assets", variants_dir=os.environ.get("TICKETS_ASSET_VARIANTS"))
+app.add_middleware(StaticAssetMiddleware, assets=assets)
+
+# Live zone availability for event pages over server-sent events, at most
+# TICKETS_SSE_MAX_RATE updates per second per event. Changes made by other processes are
+# picked up by re-reading subscribed events every TICKETS_SSE_POLL_INTERVAL seconds.
+availability = AvailabilityBroadcaster(
+    controller,
+    max_rate=float(os.environ.get("TICKETS_SSE_MAX_RATE", "2")),
+    queue_size=int(os.environ.get("TICKETS_SSE_QUEUE", "8")),
+    poll_interval=float(os.environ.get("TICKETS_SSE_POLL_INTERVAL", "1")) if cross_process else None
+)
 
 def get_current_user(req):
-    session_id = req.cookies.get("session_id")
-    if (session_id and session_id in sessions):
-        return sessions[session_id]
-    return None
+    return sessions.get(req.cookies.get("session_id"))
+
+def is_admitted(req, event_id: int) -> bool:
+    """Check the signed admission cookie for an event's waiting room, which only admits the user it was issued to."""
+    if not waiting_rooms.enabled:
+        return True
+    current_user = get_current_user(req)
+    if not current_user:
+        return False
+    return waiting_rooms.get_room(event_id).verify_admission_token(req.cookies.get(f"admission_{event_id}"), current_user.id)
 
 # Routes
 @rt("/")
@@ -63,6 +201,7 @@ def home(req):
     return Titled("Welcome", 
         Ul(
             Li(A(href="/events")("View Events")),
+            Li(A(href="/search")("Search Events")),
             Li(A(href="/user_tickets")("My Tickets")),
             Li(A(href="/create_event")("Create Event")),
             Li(A(href="/login")("Login")),
@@ -72,25 +211,89 @@ def home(req):
         user_info
     )
 
+EVENTS_PER_PAGE = int(os.environ.get("TICKETS_EVENTS_PER_PAGE", "20"))
+
+def event_card(event):
+    return Div(Class="card")(
+        Img(src=assets.url(images.thumbnail_url(event.image_url)), Class="card-img-top", alt=event.name, loading="lazy"),
+        Div(Class="card-body")(
+            H5(Class="card-title")(event.name),
+            P(Class="card-text")(f"Date: {event.date.strftime('%Y-%m-%d')}"),
+            P(Class="card-text")(event.description),
+            A(href=f"/event/{event.id}", Class="btn btn-primary")("View Details")
+        )
+    )
+
 @rt("/events")
-def list_events():
-    """List all events."""
-    events = controller.get_events()  # Use a getter method
-    event_cards = Div(*[
-        Div(Class="card")(
-            Img(src=f"/{event.image_url}", Class="card-img-top", alt=event.name),
-            Div(Class="card-body")(
-                H5(Class="card-title")(event.name),
-                P(Class="card-text")(f"Date: {event.date.strftime('%Y-%m-%d')}"),
-                P(Class="card-text")(event.description),
-                A(href=f"/event/{event.id}", Class="btn btn-primary")("View Details")
-            )
-        ) for event in events
-    ])
-    return Titled("Events", event_cards)
+def list_events(req, cursor: str = None, hall: str = None, start: str = None, end: str = None):
+    """List events in date order, one page at a time, optionally by hall and date range."""
+    try:
+        page = controller.get_events_page(
+            cursor=cursor,
+            limit=EVENTS_PER_PAGE,
+            hall_id=int(hall) if hall else None,
+            start=datetime.strptime(start, "%Y-%m-%d") if start else None,
+            end=datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1) if end else None  # The end date is inclusive
+        )
+    except ValueError:
+        return Titled("Error", P("Invalid filter or page link"))
+
+    # The next page loads when this placeholder scrolls into view (plain link without htmx)
+    filters = {name: value for name, value in (("hall", hall), ("start", start), ("end", end)) if value}
+    more = ""
+    if page.next_cursor:
+        next_page = f"/events?{urlencode({**filters, 'cursor': page.next_cursor})}"
+        more = Div(hx_get=next_page, hx_trigger="revealed", hx_swap="outerHTML")(A(href=next_page)("More events"))
+    cards = [event_card(event) for event in page.events]
+    if req.headers.get("hx-request"):
+        return (*cards, more)
+
+    filter_form = Form(method="get", action="/events")(
+        Select(name="hall")(
+            Option("All halls", value=""),
+            *[Option(f"Hall {h.id} ({h.size})", value=str(h.id), selected=hall == str(h.id)) for h in controller.get_halls()]
+        ),
+        Input(type="date", name="start", value=start or ""),
+        Input(type="date", name="end", value=end or ""),
+        Button("Filter", type="submit")
+    )
+    return Titled("Events", filter_form, P(f"{page.total} events"), Div(*cards, more))
+
+@rt("/search")
+def search_events(q: str = "", start: str = None, end: str = None):
+    """Search events by words in their name or description, optionally within a date range."""
+    try:
+        start_date = datetime.strptime(start, "%Y-%m-%d") if start else None
+        end_date = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1) if end else None
+    except ValueError:
+        return Titled("Error", P("Invalid date"))
+
+    search_form = Form(method="get", action="/search")(
+        Input(
+            name="q", value=q, placeholder="Search events", list="search-terms", autocomplete="off",
+            hx_get="/search/suggest", hx_trigger="keyup changed delay:150ms", hx_target="#search-terms", hx_swap="innerHTML"
+        ),
+        Datalist(id="search-terms"),
+        Input(type="date", name="start", value=start or ""),
+        Input(type="date", name="end", value=end or ""),
+        Button("Search", type="submit")
+    )
+    if not q and not start and not end:
+        return Titled("Search Events", search_form)
+    results = controller.search_events(q, start=start_date, end=end_date, limit=50)
+    return Titled("Search Events", search_form, *([event_card(event) for event in results] or [P("No events found.")]))
+
+@rt("/search/suggest")
+def search_suggestions(q: str = ""):
+    """Autocomplete options for the search box: completions of its last word."""
+    words = q.split()
+    if not words or q[-1].isspace():
+        return ""
+    head = q[:len(q) - len(words[-1])]
+    return tuple(Option(value=head + term) for term in controller.suggest_search_terms(words[-1]))
 
 @rt("/event/{event_id:int}")
-def event_detail(event_id: int):
+def event_detail(req, event_id: int):
     """Display details of a specific event."""
     event = controller.get_event_by_id(event_id)
     if not event:
@@ -98,35 +301,108 @@ def event_detail(event_id: int):
     
     zones_info = Ul(*[
         Li(
-            f"{zone_type} - ${zone.price} ({zone.get_available_tickets_count()} available)"
+            f"{zone_type} - ${zone.price} (", Span(id=f"zone-{zone.id}-available")(controller.get_available_tickets_count(zone)), " available)"
         ) for zone_type, zone in event.zones.items()
     ])
+    # Counts are kept current from the availability stream instead of reloading the page
+    live_availability = Script(
+        f"new EventSource('/event/{event.id}/availability').addEventListener('availability', (e) => {{"
+        "for (const [zone, count] of Object.entries(JSON.parse(e.data))) {"
+        "const span = document.getElementById(`zone-${zone}-available`); if (span) span.textContent = count; }});"
+    )
     
     vip_zone = event.zones.get("VIP")
     regular_zone = event.zones.get("Regular")
-    vip_sold_out = vip_zone.get_available_tickets_count() == 0 if vip_zone else True
-    regular_sold_out = regular_zone.get_available_tickets_count() == 0 if regular_zone else True
+    vip_sold_out = controller.get_available_tickets_count(vip_zone) == 0 if vip_zone else True
+    regular_sold_out = controller.get_available_tickets_count(regular_zone) == 0 if regular_zone else True
     
+    if is_admitted(req, event.id):
+        purchase_form = Form(method="post", action=f"/purchase_tickets/{event.id}")(
+            P("VIP Quantity: ", Input(type="number", name="vip_quantity", min="0", required=True, disabled=vip_sold_out)),
+            P("Regular Quantity: ", Input(type="number", name="regular_quantity", min="0", required=True, disabled=regular_sold_out)),
+            Button("Buy Tickets", type="submit", disabled=vip_sold_out and regular_sold_out)
+        )
+    else:
+        purchase_form = A(href=f"/queue/{event.id}", Class="btn btn-primary")("Join the queue to buy tickets")
+
     return Titled(event.name, 
         P(f"Date: {event.date.strftime('%Y-%m-%d %H:%M:%S')}"),
         P(f"Description: {event.description}"),
-        Img(src=f"/{event.image_url}", alt=event.name),
+        Img(src=assets.url(event.image_url), alt=event.name),
         H2("Zones"),
         zones_info,
-        Form(method="post", action=f"/purchase_tickets/{event.id}")(
-            P("VIP Quantity: ", Input(type="number", name="vip_quantity", min="0", required=True, disabled=vip_sold_out)),
-            P("Regular Quantity: ", Input(type="number", name="regular_quantity", min="0", required=True, disabled=regular_sold_out)),
-            Button("Buy Tickets", type="submit", disabled=vip_sold_out and regular_sold_out)
+        purchase_form,
+        live_availability
+    )
+
+@rt("/event/{event_id:int}/availability")
+def availability_stream(event_id: int):
+    """Server-sent events with the seats left per zone: a full snapshot, then the zones that change."""
+    if not controller.get_event_by_id(event_id):
+        return Titled("Error", P("Event not found"))
+    return StreamingResponse(
+        availability.stream(event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@rt("/queue/{event_id:int}")
+def join_queue(req, event_id: int):
+    """Place the buyer in the event's waiting room."""
+    event = controller.get_event_by_id(event_id)
+    if not event:
+        return Titled("Error", P("Event not found"))
+
+    room = waiting_rooms.get_room(event_id)
+    queue_token = req.cookies.get(f"queue_{event_id}")
+    if room.get_position(queue_token) is None:
+        queue_token = room.join()
+    return Titled(f"Waiting Room - {event.name}",
+        Div(hx_get=f"/queue/{event_id}/status", hx_trigger="load", hx_swap="outerHTML")(P("Checking your place in the queue..."))
+    ), cookie(f"queue_{event_id}", queue_token)
+
+@rt("/queue/{event_id:int}/status")
+def queue_status(req, event_id: int):
+    """Polled by the waiting room page; returns a small fragment."""
+    room = waiting_rooms.get_room(event_id)
+    position = room.get_position(req.cookies.get(f"queue_{event_id}"))
+    if position is None:
+        return Div(P("You are not in the queue. ", A(href=f"/queue/{event_id}")("Join the queue")))
+
+    ahead = room.people_ahead(position)
+    if ahead:
+        return Div(hx_get=f"/queue/{event_id}/status", hx_trigger="every 2s", hx_swap="outerHTML")(
+            P(f"Your position: {position}. Buyers ahead of you: {ahead} (about {int(room.estimated_wait(position)) + 1}s).")
         )
+
+    # Admitted: trade the queue position for an admission token bound to the buyer.
+    # The queue cookie stays; its position is refused once the admission is used.
+    current_user = get_current_user(req)
+    if not current_user:
+        return Div(P("It's your turn! ", A(href="/login")("Log in"), " and come back to this page to continue."))
+    admission_token = room.issue_admission_token(position, current_user.id)
+    if admission_token is None:
+        return Div(P("This place in the queue has already been used. ", A(href=f"/queue/{event_id}")("Join the queue"))), cookie(f"queue_{event_id}", "", max_age=0)
+    return (
+        Div(P("It's your turn! ", A(href=f"/event/{event_id}")("Continue to purchase"))),
+        cookie(f"admission_{event_id}", admission_token)
     )
 
+def place_order(buyer: User, quantities: dict) -> PurchaseResult:
+    """Create an order, buy the seats for it and complete it if the purchase succeeded."""
+    order = controller.create_order(buyer=buyer)
+    result = controller.purchase_many(order, quantities)
+    if result.success and result.tickets:
+        controller.complete_order(order_id=order.id)
+    return result
+
 @rt("/purchase_tickets/{event_id:int}", methods=["POST"])
 async def purchase_tickets(req, event_id: int):
     """Handle ticket purchases."""
     event = controller.get_event_by_id(event_id)
     if not event:
         return Titled("Error", P("Event not found"))
-    
+
     form = await req.form()
     vip_quantity = int(form.get("vip_quantity", 0))
     regular_quantity = int(form.get("regular_quantity", 0))
@@ -134,46 +410,44 @@ async def purchase_tickets(req, event_id: int):
     if vip_quantity <= 0 and regular_quantity <= 0:
         return Titled("Error", P("Invalid quantity"))
 
+    current_user = get_current_user(req)
+    if not current_user:
+        return Titled("Error", P("User not logged in"))
+
+    # Availability is checked and seats reserved in one step, all zones or none
+    quantities = {}
     vip_zone = event.zones.get("VIP")
     regular_zone = event.zones.get("Regular")
-    vip_error = regular_error = None
-
-    if vip_quantity > 0 and vip_zone and vip_quantity > vip_zone.get_available_tickets_count():
-        vip_error = "Not enough VIP tickets available"
-
-    if regular_quantity > 0 and regular_zone and regular_quantity > regular_zone.get_available_tickets_count():
-        regular_error = "Not enough Regular tickets available"
-
-    if vip_error or regular_error:
+    if vip_quantity > 0 and vip_zone:
+        quantities[vip_zone] = vip_quantity
+    if regular_quantity > 0 and regular_zone:
+        quantities[regular_zone] = regular_quantity
+
+    # An admission buys once, and only for the user it was issued to
+    admission_token = req.cookies.get(f"admission_{event_id}")
+    room = waiting_rooms.get_room(event_id) if waiting_rooms.enabled else None
+    if room and not room.consume_admission_token(admission_token, current_user.id):
+        return Titled("Error", P("Please wait for your turn in the queue."), A(href=f"/queue/{event_id}")("Join the queue"))
+
+    # Journaled writes wait for their group commit, so keep them off the event loop
+    result = await asyncio.to_thread(place_order, current_user, quantities)
+    order = result.order
+    if room and not (result.success and result.tickets):
+        room.restore_admission_token(admission_token, current_user.id)
+    if not result.success:
         return Titled("Error", 
-            P(vip_error) if vip_error else "",
-            P(regular_error) if regular_error else "",
+            *[P(error) for error in result.errors.values()],
             A(href=f"/event/{event.id}")("Go Back")
         )
-
-    current_user = get_current_user(req)
-    if not current_user:
-        return Titled("Error", P("User not logged in"))
-
-    order = controller.create_order(buyer=current_user)
-    success_vip = success_regular = True
-
-    if vip_quantity > 0:
-        success_vip = controller.purchase_tickets(order_id=order.id, zone=vip_zone, quantity=vip_quantity)
-
-    if regular_quantity > 0:
-        success_regular = controller.purchase_tickets(order_id=order.id, zone=regular_zone, quantity=regular_quantity)
-
-    if not success_vip and not success_regular:
+    if not result.tickets:
         return Titled("Error", P("Failed to purchase tickets"))
 
-    controller.complete_order(order_id=order.id)
     return Titled("Success", 
         P(f"Order ID: {order.id}"),
         P(f"VIP Quantity: {vip_quantity}"),
         P(f"Regular Quantity: {regular_quantity}"),
         A(href="/user_tickets")("View My Tickets")
-    )
+    ), cookie(f"admission_{event_id}", "", max_age=0)
 
 @rt("/user_tickets")
 def user_tickets(req):
@@ -207,43 +481,48 @@ async def create_event(req):
         image_file = form.get("image_file")
         hall_id = int(form.get("hall_id"))
         hall = controller.get_hall_by_id(hall_id)
+        event_date = datetime.strptime(date, "%Y-%m-%d")
+        # Checked before the upload so a refused event leaves no image behind
+        if hall is None:
+            return Titled("Error", P(f"Hall {hall_id} not found."))
+        if not controller.can_book_hall(hall_id, event_date):
+            return Titled("Hall Unavailable", P(f"Hall {hall_id} is already booked on {date}."))
         zones = [
             {"type": "VIP", "percentage": float(form.get("vip_percentage")), "price": float(form.get("vip_price")), "quantity": int(hall.capacity * float(form.get("vip_percentage")) / 100)},
             {"type": "Regular", "percentage": float(form.get("regular_percentage")), "price": float(form.get("regular_price")), "quantity": int(hall.capacity * float(form.get("regular_percentage")) / 100)}
         ]
 
-        # Ensure the directory exists
-        image_dir = "static/images"
-        shutil.os.makedirs(image_dir, exist_ok=True)
-
-        # Save the uploaded image file
-        image_url = shutil.os.path.join(image_dir, image_file.filename)
-        with open(image_url, "wb") as f:
-            f.write(image_file.file.read())
+        # Streamed to disk off the event loop and stored under its content hash
+        try:
+            image_url = await images.save_upload(image_file)
+        except ValueError as error:
+            return Titled("Error", P(str(error)))
 
-        event = controller.create_event(
+        # Journaled, so the fsync is waited for in a worker thread as in purchase
+        event = await asyncio.to_thread(
+            controller.create_event,
             name=name,
-            date=datetime.strptime(date, "%Y-%m-%d"),
+            date=event_date,
             organizer=user,
             hall=hall,
             description=description,
             image_url=image_url,
             zones=zones
         )
+        if event is None:
+            return Titled("Hall Unavailable", P(f"Hall {hall_id} is already booked on {date}."))
         return Titled("Event Created", P(f"Event '{event.name}' created successfully!"))
 
-    halls = controller.get_halls()
-    used_halls = {event.hall.id for event in controller.get_events()}
-    available_halls = [hall for hall in halls if hall.id not in used_halls]
-    hall_options = [Option(value=hall.id)(f"ID: {hall.id} - {hall.size} - Capacity: {hall.capacity}") for hall in available_halls]
-
     return Titled("Create Event",
         Form(method="post", enctype="multipart/form-data")(
             P("Event Name: ", Input(type="text", name="name", required=True)),
-            P("Event Date: ", Input(type="date", name="date", required=True)),
+            P("Event Date: ", Input(
+                type="date", name="date", required=True,
+                hx_get="/create_event/halls", hx_trigger="change", hx_target="#hall-options", hx_swap="innerHTML"
+            )),
             P("Description: ", Textarea(name="description", required=True)),
             P("Image File: ", Input(type="file", name="image_file", accept="image/*", required=True)),
-            P("Hall: ", Select(name="hall_id", required=True)(*hall_options)),
+            P("Hall: ", Select(name="hall_id", id="hall-options", required=True)(Option(value="")("Pick a date first"))),
             P("VIP Zone Percentage: ", Input(type="number", name="vip_percentage", step="0.01", required=True)),
             P("VIP Zone Price: ", Input(type="number", name="vip_price", step="0.01", required=True)),
             P("Regular Zone Percentage: ", Input(type="number", name="regular_percentage", step="0.01", required=True)),
@@ -252,6 +531,18 @@ async def create_event(req):
         )
     )
 
+@rt("/create_event/halls")
+def free_halls(date: str = ""):
+    """Options for the halls free on the chosen date, from the booking calendar."""
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return Option(value="")("Pick a date first")
+    halls = controller.get_free_halls(day, day + timedelta(days=1))
+    if not halls:
+        return Option(value="")("No hall is free on this date")
+    return tuple(Option(value=hall.id)(f"ID: {hall.id} - {hall.size} - Capacity: {hall.capacity}") for hall in halls)
+
 @rt("/register", methods=["GET", "POST"])
 async def register(req):
     """User registration."""
@@ -260,8 +551,10 @@ async def register(req):
         name = form.get("name")
         email = form.get("email")
         password = form.get("password")
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
-        user = controller.create_user(name=name, email=email, password=hashed_password, roles=["Buyer"])
+        try:
+            user = await controller.create_user_async(name=name, email=email, password=password, roles=["Buyer"])
+        except PasswordHashingBusy:
+            return Titled("Registration Failed", P("The server is busy, please try again in a moment."))
         return Titled("Registration Successful", P(f"User '{user.name}' registered successfully!"))
 
     return Titled("Register",
@@ -280,13 +573,13 @@ async def login(req):
         form = await req.form()
         email = form.get("email")
         password = form.get("password")
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
-        user = controller.authenticate_user(email=email, password=hashed_password)
+        try:
+            user = await controller.authenticate_user_async(email=email, password=password)
+        except PasswordHashingBusy:
+            return Titled("Login Failed", P("The server is busy, please try again in a moment."))
         if user:
-            session_id = hashlib.sha256(f"{user.id}{datetime.now()}".encode()).hexdigest()
-            sessions[session_id] = user
             res = RedirectResponse(url="/")
-            res.set_cookie("session_id", session_id)
+            res.set_cookie("session_id", sessions.create(user), httponly=True)
             return res
         return Titled("Login Failed", P("Invalid email or password"))
 
@@ -301,9 +594,7 @@ async def login(req):
 @rt("/logout")
 def logout(req):
     """User logout."""
-    session_id = req.cookies.get("session_id")
-    if session_id and session_id in sessions:
-        del sessions[session_id]
+    sessions.delete(req.cookies.get("session_id"))
     res = RedirectResponse(url="/")
     res.delete_cookie("session_id")
     return res
@@ -366,4 +657,25 @@ def reject_refund(req, refund_request_id: int):
         return Titled("Success", P(f"Refund request ID {refund_request_id} rejected."))
     return Titled("Error", P("Failed to reject refund request"))
 
+@rt("/admin/bgsave", methods=["GET", "POST"])
+def background_save(req):
+    """Start a background snapshot (POST) and show the latest one's progress."""
+    current_user = get_current_user(req)
+    if not current_user or not current_user.has_role("EventOrganizer"):
+        return Titled("Error", P("Access denied"))
+    if not store:
+        return Titled("Error", P("Persistence is not enabled (set TICKETS_DATA_DIR)"))
+
+    if req.method == "POST" and not store.background_checkpoint(controller):
+        return Titled("Error", P("A background save is already in progress"))
+
+    save = store.background_save
+    if not save:
+        return Titled("Background Save", P("No background save has run yet."), Form(method="post")(Button("Start background save", type="submit")))
+    return Titled("Background Save",
+        P(f"Process {save.pid}: {save.state}, {save.progress:.0%} written"),
+        P(f"Bytes written: {save.bytes_written}, duration: {save.duration:.3f}s, covers log up to LSN {save.lsn}"),
+        Form(method="post")(Button("Start background save", type="submit"))
+    )
+
 serve()
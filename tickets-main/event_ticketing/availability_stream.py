@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import AsyncIterator, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def format_message(counts: Dict[str, int]) -> bytes:
+    """Encode zone counts (zone ID -> seats available) as one server-sent event."""
+    return b"event: availability\ndata: " + json.dumps(counts, separators=(",", ":")).encode() + b"\n\n"
+
+
+class Subscription:
+    """One client's bounded queue of encoded availability messages."""
+
+    def __init__(self, event_id: int, queue_size: int):
+        self.__event_id = event_id
+        self.__queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.__resets = 0
+
+    # Getter for event_id
+    @property
+    def event_id(self):
+        return self.__event_id
+
+    # Getter for resets (times the backlog was replaced by a snapshot)
+    @property
+    def resets(self):
+        return self.__resets
+
+    def offer(self, message: bytes) -> bool:
+        """Queue a message without waiting; False when the queue is full."""
+        try:
+            self.__queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def reset(self, snapshot: bytes):
+        """Replace the whole backlog with one full snapshot."""
+        while not self.__queue.empty():
+            self.__queue.get_nowait()
+        self.__queue.put_nowait(snapshot)
+        self.__resets += 1
+
+    async def get(self) -> bytes:
+        return await self.__queue.get()
+
+
+class AvailabilityBroadcaster:
+    """
+    Streams zone availability changes to server-sent event subscribers.
+    Controller change notifications only mark an event dirty; a single producer
+    task wakes at most `max_rate` times per second, reads the counts of dirty
+    events once and queues the zones whose count changed to each subscriber.
+    Client queues are bounded: a client that falls behind has its backlog
+    replaced by one full snapshot, so the producer never waits on a slow client.
+    With `poll_interval`, subscribed events are also re-read periodically to
+    catch changes made by other processes.
+    """
+
+    def __init__(self, controller, max_rate: float = 2.0, queue_size: int = 8, poll_interval: Optional[float] = None):
+        self.__controller = controller
+        self.__max_rate = max_rate
+        self.__queue_size = queue_size
+        self.__poll_interval = poll_interval
+        self.__subscribers: Dict[int, Set[Subscription]] = {}
+        self.__counts: Dict[int, Dict[str, int]] = {}  # Last counts sent per event
+        self.__dirty: Set[int] = set()
+        self.__dirty_lock = threading.Lock()
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__wakeup: Optional[asyncio.Event] = None
+        self.__producer: Optional[asyncio.Task] = None
+        self.__published = 0
+        controller.add_change_listener(self.__on_change)
+
+    def __on_change(self, change: str, event_id: int):
+        # Runs on whichever thread changed the controller
+        if self.__loop is None or event_id not in self.__subscribers:
+            return
+        with self.__dirty_lock:
+            wake = not self.__dirty
+            self.__dirty.add(event_id)
+        if wake:
+            self.__loop.call_soon_threadsafe(self.__wakeup.set)
+
+    def __start(self):
+        if self.__producer is None:
+            self.__loop = asyncio.get_running_loop()
+            self.__wakeup = asyncio.Event()
+            self.__producer = self.__loop.create_task(self.__produce(), name="availability-producer")
+
+    def __read_counts(self, event_id: int) -> Dict[str, int]:
+        event = self.__controller.get_event_by_id(event_id)
+        if not event:
+            return {}
+        return {str(zone.id): self.__controller.get_available_tickets_count(zone) for zone in event.zones.values()}
+
+    async def __produce(self):
+        interval = 1.0 / self.__max_rate
+        while True:
+            try:
+                await asyncio.wait_for(self.__wakeup.wait(), self.__poll_interval)
+            except asyncio.TimeoutError:
+                with self.__dirty_lock:
+                    self.__dirty.update(self.__subscribers)
+            self.__wakeup.clear()
+            with self.__dirty_lock:
+                dirty, self.__dirty = self.__dirty, set()
+            dirty = [event_id for event_id in dirty if event_id in self.__subscribers]
+            if dirty:
+                try:
+                    # Counts may come from a remote coordinator, so read them off the event loop
+                    readings = await asyncio.to_thread(lambda: {event_id: self.__read_counts(event_id) for event_id in dirty})
+                except Exception:
+                    logger.exception("Reading availability of events %s failed.", dirty)
+                else:
+                    for event_id, counts in readings.items():
+                        self.__publish(event_id, counts)
+            # Changes arriving meanwhile are coalesced into the next round
+            await asyncio.sleep(interval)
+
+    def __publish(self, event_id: int, counts: Dict[str, int]):
+        subscribers = self.__subscribers.get(event_id)
+        previous = self.__counts.get(event_id, {})
+        changed = {zone_id: count for zone_id, count in counts.items() if previous.get(zone_id) != count}
+        if not subscribers or not changed:
+            return
+        self.__counts[event_id] = counts
+        message = format_message(changed)
+        snapshot = None
+        for subscription in subscribers:
+            if not subscription.offer(message):
+                snapshot = snapshot or format_message(counts)
+                subscription.reset(snapshot)
+        self.__published += 1
+
+    async def subscribe(self, event_id: int) -> Subscription:
+        """Register a client; its first message is the event's full availability."""
+        self.__start()
+        subscription = Subscription(event_id, self.__queue_size)
+        # Registered before reading, so a change during the read marks the event dirty
+        self.__subscribers.setdefault(event_id, set()).add(subscription)
+        counts = self.__counts.get(event_id)
+        if counts is None:
+            counts = await asyncio.to_thread(self.__read_counts, event_id)
+            # Counts published during the read are newer and already queued; never follow them with older ones
+            counts = self.__counts.setdefault(event_id, counts)
+        subscription.offer(format_message(counts))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self.__subscribers.get(subscription.event_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            # Nothing tracks an event without subscribers; the next one reads fresh counts
+            del self.__subscribers[subscription.event_id]
+            self.__counts.pop(subscription.event_id, None)
+
+    async def stream(self, event_id: int, heartbeat: float = 15.0) -> AsyncIterator[bytes]:
+        """Server-sent events for one client, with a comment line as keep-alive when idle."""
+        subscription = await self.subscribe(event_id)
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscription.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def get_metrics(self) -> dict:
+        return {
+            "events": len(self.__subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self.__subscribers.values()),
+            "published": self.__published,
+        }
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from controller import Hall, User, Event, Zone, Ticket
+from persistence import apply_record
+
+logger = logging.getLogger(__name__)
+
+# Journal records that describe the catalog; orders and seat state are not replicated
+CATALOG_OPS = {"create_user", "add_hall", "create_event"}
+# ID counters the catalog keeps in agreement between processes
+CATALOG_COUNTERS = ((User, "user_counter"), (Hall, "hall_counter"), (Event, "event_counter"), (Zone, "zone_counter"), (Ticket, "ticket_counter"))
+
+
+class Catalog:
+    """
+    Users, halls and events shared by several processes, as an append-only
+    log of their journal records with one lock over it. Creating a user, hall
+    or event happens in a section() that holds the lock and first replays the
+    records other processes appended, which also moves the ID counters past
+    every ID handed out so far: IDs, and so zone segment names and coordinator
+    keys, agree everywhere. Subclasses provide the lock and the log.
+    """
+
+    def __init__(self):
+        self.__position = 0  # How much of the log this process has applied
+        self.__halls: Dict[int, Hall] = {}
+        self.__owner: Optional[int] = None  # Thread inside section(); sections nest
+        self.__replaying = False
+        self.__follower: Optional[threading.Thread] = None
+
+    # Getter for position
+    @property
+    def position(self):
+        return self.__position
+
+    # Getter for replaying: True while records from other processes are applied
+    @property
+    def replaying(self):
+        return self.__replaying
+
+    def acquire_lock(self):
+        raise NotImplementedError
+
+    def release_lock(self):
+        raise NotImplementedError
+
+    def read_records(self, position) -> List[Tuple[dict, object]]:
+        """Records appended since `position`, each with the position after it."""
+        raise NotImplementedError
+
+    def append_record(self, record: dict):
+        """Append a record while holding the lock; returns the position after it."""
+        raise NotImplementedError
+
+    def has_new_records(self) -> bool:
+        """Cheap check whether sync() would find anything; may be conservative."""
+        return True
+
+    @contextmanager
+    def section(self, controller):
+        """Hold the catalog lock, with every record appended so far applied to `controller`."""
+        if self.__owner == threading.get_ident():
+            yield
+            return
+        self.acquire_lock()
+        self.__owner = threading.get_ident()
+        try:
+            self.__sync(controller)
+            yield
+        finally:
+            self.__owner = None
+            self.release_lock()
+
+    def sync(self, controller):
+        """Apply the records other processes appended, if there are any."""
+        if self.has_new_records():
+            with self.section(controller):
+                pass
+
+    def __sync(self, controller):
+        records = self.read_records(self.__position)
+        if not records:
+            return
+        for hall in controller.get_halls():
+            self.__halls.setdefault(hall.id, hall)
+        # A controller restored from its own journal already has the records it applied before
+        restored = self.__restored_ids(controller) if self.__position == 0 else set()
+        counters = [getattr(cls, counter) for cls, counter in CATALOG_COUNTERS]
+        self.__replaying = True
+        try:
+            for record, position in records:
+                if (record["op"], record["id"]) not in restored:
+                    apply_record(controller, record, self.__halls)
+                self.__position = position
+        finally:
+            self.__replaying = False
+            # Replaying sets each counter to the record's ID; never move one backwards
+            for (cls, counter), value in zip(CATALOG_COUNTERS, counters):
+                setattr(cls, counter, max(value, getattr(cls, counter)))
+        logger.info("Applied %s catalog records from other processes.", len(records))
+
+    def __restored_ids(self, controller) -> set:
+        for event in controller.get_events():
+            self.__halls.setdefault(event.hall.id, event.hall)
+        return ({("create_user", user.id) for user in controller.get_users()} | {("add_hall", hall.id) for hall in controller.get_halls()}
+                | {("create_event", event.id) for event in controller.get_events()})
+
+    def publish(self, record: dict):
+        """Append a journal record made inside section(); other records and replays are ignored."""
+        if self.__replaying or record["op"] not in CATALOG_OPS:
+            return
+        if self.__owner != threading.get_ident():
+            raise RuntimeError(f"Catalog record '{record['op']}' made outside Catalog.section()")
+        self.__position = self.append_record(record)
+
+    def start_follower(self, controller, interval: float = 0.25) -> threading.Thread:
+        """Apply other processes' records from a daemon thread every `interval` seconds."""
+        def follow():
+            while True:
+                try:
+                    self.sync(controller)
+                except Exception:
+                    logger.exception("Following the catalog failed.")
+                time.sleep(interval)
+        if self.__follower is None:
+            self.__follower = threading.Thread(target=follow, name="catalog-follower", daemon=True)
+            self.__follower.start()
+        return self.__follower
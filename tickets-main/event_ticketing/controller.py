@@ -1,17 +1,28 @@
-from datetime import datetime
-from typing import List, Dict, Optional
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Dict, Optional
+from collections.abc import Sequence
+from array import array
 from enum import Enum
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+import asyncio
 import logging
-import hashlib
+import os
+import threading
+import time
+import math
+from contextlib import contextmanager, nullcontext
+from passwords import PasswordHasher, HashingPool, verify_password
+from search import EventSearchIndex
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
 
 # Enumerations
 class TicketStatus(Enum):
     AVAILABLE = "AVAILABLE"
     SOLD = "SOLD"
     REFUNDED = "REFUNDED"
+    HELD = "HELD"
 
 class OrderStatus(Enum):
     PENDING = "PENDING"
@@ -28,16 +39,30 @@ class RefundStatus(Enum):
     APPROVED = "APPROVED"
     REJECTED = "REJECTED"
 
+class HoldStatus(Enum):
+    ACTIVE = "ACTIVE"
+    CONVERTED = "CONVERTED"
+    RELEASED = "RELEASED"
+    EXPIRED = "EXPIRED"
+
+# Zones store one status byte per seat; AVAILABLE must encode as 0
+TICKET_STATUSES: List[TicketStatus] = list(TicketStatus)
+TICKET_STATUS_CODES: Dict[TicketStatus, int] = {status: code for code, status in enumerate(TICKET_STATUSES)}
+
+# Re-check zone status counters against a full seat scan after every transition
+DEBUG_INVENTORY = os.environ.get("TICKETS_DEBUG_INVENTORY") == "1"
+
 # Classes
 class User:
     user_counter = 0  # Static counter for User IDs
 
-    def __init__(self, name: str, email: str, password: str, roles: List[str]):
+    def __init__(self, name: str, email: str, password: str, roles: List[str], password_hash: Optional[str] = None):
         User.user_counter += 1
         self.__id = User.user_counter  # Auto-generate ID
         self.__name = name
         self.__email = email
-        self.__password = hashlib.sha256(password.encode()).hexdigest()
+        # A stored hash (e.g. from a snapshot) is used as-is
+        self.__password = password_hash or PasswordHasher().hash(password)
         self.__roles = roles
 
     # Getter for id
@@ -60,22 +85,31 @@ class User:
     def roles(self):
         return self.__roles
 
+    # Getter for password_hash
+    @property
+    def password_hash(self):
+        return self.__password
+
+    # Setter for password_hash
+    @password_hash.setter
+    def password_hash(self, value: str):
+        self.__password = value
+
     def has_role(self, role: str) -> bool:
         return role in self.__roles
 
     def add_role(self, role: str):
         if role not in self.__roles:
             self.__roles.append(role)
-            logging.info(f"Role '{role}' added to user '{self.name}'.")
+            logger.info("Role '%s' added to user '%s'.", role, self.name)
 
     def remove_role(self, role: str):
         if role in self.__roles:
             self.__roles.remove(role)
-            logging.info(f"Role '{role}' removed from user '{self.name}'.")
+            logger.info("Role '%s' removed from user '%s'.", role, self.name)
 
     def verify_password(self, password: str) -> bool:
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
-        return self.__password == hashed_password
+        return verify_password(password, self.__password)
 
 class Event:
     event_counter = 0  # Static counter for Event IDs
@@ -106,6 +140,11 @@ class Event:
     def date(self):
         return self.__date
 
+    # Getter for organizer
+    @property
+    def organizer(self):
+        return self.__organizer
+
     # Getter for description
     @property
     def description(self):
@@ -128,13 +167,14 @@ class Event:
 
     def add_zone(self, zone: 'Zone', user: User):
         if not user.has_role("EventOrganizer"):
-            logging.error(f"User '{user.name}' does not have permission to add zones.")
+            logger.error("User '%s' does not have permission to add zones.", user.name)
             return False
         self.__zones[zone.type] = zone
-        logging.info(f"Zone '{zone.type}' added to event '{self.name}'.")
+        logger.info("Zone '%s' added to event '%s'.", zone.type, self.name)
         return True
 
-    def add_zone_with_percentage(self, zone_type: str, percentage: float, price: float, quantity: int, user: User, controller: 'Controller'):
+    def add_zone_with_percentage(self, zone_type: str, percentage: float, price: float, quantity: int, user: User, controller: 'Controller',
+                                 inventory: Optional[tuple] = None):
         """
         Add a zone with a percentage of the hall's capacity.
         :param zone_type: Type of the zone (e.g., "VIP", "Regular")
@@ -143,13 +183,14 @@ class Event:
         :param quantity: Number of tickets in this zone
         :param user: User adding the zone (must be an EventOrganizer)
         :param controller: Controller instance to create tickets
+        :param inventory: Existing seat arrays for the zone, e.g. from a snapshot (see Zone)
         """
         if not user.has_role("EventOrganizer"):
-            logging.error(f"User '{user.name}' does not have permission to add zones.")
+            logger.error("User '%s' does not have permission to add zones.", user.name)
             return False
-        zone = Zone(type=zone_type, capacity=quantity, price=price, event=self, controller=controller)
+        zone = Zone(type=zone_type, capacity=quantity, price=price, event=self, controller=controller, inventory=inventory)
         self.add_zone(zone, user)
-        logging.info(f"Zone '{zone_type}' added with {quantity} seats ({percentage * 100}% of hall capacity).")
+        logger.info("Zone '%s' added with %s seats (%s%% of hall capacity).", zone_type, quantity, percentage * 100)
         return True
 
     def display_event_info(self):
@@ -191,17 +232,81 @@ class Hall:
 class Ticket:  # Forward declaration
     pass
 
+class SeatAllocator:
+    """
+    Where a zone looks for free seats: a cursor below which every seat has been
+    handed out at least once, plus the seats returned below it (an
+    insertion-ordered dict used as an ordered set). The zone keeps it exact:
+    every available seat is at or past the cursor or in the returned set.
+    shared_inventory.SharedSeatAllocator keeps the same state in shared memory.
+    """
+
+    def __init__(self):
+        self.__cursor = 0
+        self.__returned_seats: Dict[int, None] = {}
+
+    # Getter for cursor
+    @property
+    def cursor(self):
+        return self.__cursor
+
+    # Setter for cursor
+    @cursor.setter
+    def cursor(self, value: int):
+        self.__cursor = value
+
+    def add(self, index: int):
+        """A seat below the cursor became available."""
+        self.__returned_seats[index] = None
+
+    def discard(self, index: int):
+        """A seat stopped being available."""
+        self.__returned_seats.pop(index, None)
+
+    def returned_seats(self, quantity: int) -> List[int]:
+        """Up to `quantity` returned seats, all of them available."""
+        return list(islice(self.__returned_seats, quantity))
+
+    def __len__(self):
+        return len(self.__returned_seats)
+
 class Zone:
     zone_counter = 0  # Static counter for Zone IDs
 
-    def __init__(self, type: str, capacity: int, price: float, event: 'Event', controller: 'Controller'):
+    def __init__(self, type: str, capacity: int, price: float, event: 'Event', controller: 'Controller', inventory: Optional[tuple] = None):
+        """
+        :param inventory: (statuses, buyer_ids, counts) buffers to use as the seat
+                          arrays instead of allocating them (see attach_inventory)
+        """
         Zone.zone_counter += 1
         self.__id = Zone.zone_counter  # Auto-generate ID
         self.__type = type
         self.__capacity = capacity
         self.__price = price
         self.__event = event
-        self.__tickets: List['Ticket'] = [controller.create_ticket(zone=self) for _ in range(capacity)]
+        self.__controller = controller
+        # Ticket IDs are reserved as one contiguous block per zone
+        self.__first_ticket_id = controller.reserve_ticket_ids(capacity)
+        # Seat state is kept in compact arrays; Ticket objects are created on demand
+        self.__ticket_views: Dict[int, 'Ticket'] = {}
+        # Live number of seats per status code, updated on every transition
+        self.__status_counts = array('q', bytes(8 * len(TICKET_STATUSES)))
+        # Seat allocator: seats below its cursor are only free if they are in its returned pool
+        self.__allocator = SeatAllocator()
+        # Guards seat state; held only for short array updates
+        self.__lock = threading.Lock()
+        if inventory is None:
+            self.__statuses = bytearray(capacity)
+            self.__buyer_ids = array('q', bytes(8 * capacity))
+            self.__status_counts[TICKET_STATUS_CODES[TicketStatus.AVAILABLE]] = capacity
+        else:
+            self.__adopt_inventory(*inventory)
+        controller.register_zone(self)
+
+    # Getter for id
+    @property
+    def id(self):
+        return self.__id
 
     # Getter for type
     @property
@@ -218,42 +323,269 @@ class Zone:
     def capacity(self):
         return self.__capacity
 
+    # Getter for first_ticket_id
+    @property
+    def first_ticket_id(self):
+        return self.__first_ticket_id
+
     # Getter for tickets
     @property
     def tickets(self):
-        return self.__tickets
+        return ZoneTickets(self)
 
     # Getter for event
     @property
     def event(self):
         return self.__event
 
+    # Getter for lock
+    @property
+    def lock(self):
+        return self.__lock
+
+    def get_ticket(self, index: int) -> 'Ticket':
+        """Return the Ticket view for a seat, creating it on first access."""
+        ticket = self.__ticket_views.get(index)
+        if ticket is None:
+            # setdefault keeps a single view per seat if two threads race here
+            ticket = self.__ticket_views.setdefault(index, self.__controller.create_ticket(zone=self, index=index))
+        return ticket
+
+    def get_ticket_status(self, index: int) -> TicketStatus:
+        return TICKET_STATUSES[self.__statuses[index]]
+
+    def set_ticket_status(self, index: int, status: TicketStatus):
+        code = TICKET_STATUS_CODES[status]
+        previous_code = self.__statuses[index]
+        if code == previous_code:
+            return
+        self.__statuses[index] = code
+        self.__status_counts[previous_code] -= 1
+        self.__status_counts[code] += 1
+        if code == TICKET_STATUS_CODES[TicketStatus.AVAILABLE]:
+            if index < self.__allocator.cursor:
+                self.__allocator.add(index)
+        else:
+            self.__allocator.discard(index)
+        if DEBUG_INVENTORY:
+            assert self.verify_counters(), f"Status counters out of sync in zone '{self.__type}'."
+
+    def get_ticket_buyer_id(self, index: int) -> int:
+        """Get the buyer's user ID for a seat (0 when the seat has no buyer)."""
+        return self.__buyer_ids[index]
+
+    def set_ticket_buyer_id(self, index: int, user_id: int):
+        self.__buyer_ids[index] = user_id
+
+    def get_available_seats(self, quantity: int) -> List[int]:
+        """
+        Find up to `quantity` free seat indices without claiming them.
+        Returned seats are handed out first, then seats past the cursor, so the
+        cost is proportional to `quantity` rather than to the zone's capacity.
+        The caller must hold the zone lock.
+        """
+        available_code = TICKET_STATUS_CODES[TicketStatus.AVAILABLE]
+        seats = self.__allocator.returned_seats(quantity)
+        if len(seats) < quantity:
+            # Move the cursor past the handed-out prefix for good
+            cursor = self.__allocator.cursor
+            while cursor < self.__capacity and self.__statuses[cursor] != available_code:
+                cursor += 1
+            self.__allocator.cursor = cursor
+            seats += self.__seats_from(cursor, quantity - len(seats))
+        if len(seats) < min(quantity, self.get_available_tickets_count()):
+            # The allocator missed available seats: a bug, not something to scan the zone for
+            logger.error(
+                "Seat allocator of zone %s out of sync: found %s of %s available seats (cursor %s, %s returned).",
+                self.__id, len(seats), self.get_available_tickets_count(), self.__allocator.cursor, len(self.__allocator)
+            )
+        return seats
+
+    def __seats_from(self, index: int, quantity: int) -> List[int]:
+        available_code = TICKET_STATUS_CODES[TicketStatus.AVAILABLE]
+        seats: List[int] = []
+        while len(seats) < quantity and index < self.__capacity:
+            if self.__statuses[index] == available_code:
+                seats.append(index)
+            index += 1
+        return seats
+
+    def claim_seats(self, indices: List[int], buyer: User):
+        """Mark seats as sold to `buyer`. The caller must hold the zone lock."""
+        for index in indices:
+            self.__buyer_ids[index] = buyer.id
+            self.set_ticket_status(index, TicketStatus.SOLD)
+
+    def hold_seats(self, indices: List[int], user: User):
+        """Mark seats as held for `user`. The caller must hold the zone lock."""
+        for index in indices:
+            self.__buyer_ids[index] = user.id
+            self.set_ticket_status(index, TicketStatus.HELD)
+
+    def release_seats(self, indices: List[int]):
+        """Return held seats to the available pool. The caller must hold the zone lock."""
+        for index in indices:
+            if self.__statuses[index] == TICKET_STATUS_CODES[TicketStatus.HELD]:
+                self.__buyer_ids[index] = 0
+                self.set_ticket_status(index, TicketStatus.AVAILABLE)
+
     def get_available_tickets(self, quantity: int) -> List['Ticket']:
-        available_tickets = [ticket for ticket in self.__tickets if ticket.status == TicketStatus.AVAILABLE]
-        if len(available_tickets) == 0:
-            logging.warning(f"No tickets available in zone '{self.type}'.")
-        return available_tickets[:quantity]
+        if self.get_available_tickets_count() == 0:
+            logger.warning("No tickets available in zone '%s'.", self.type)
+            return []
+        with self.__lock:
+            seats = self.get_available_seats(quantity)
+        return [self.get_ticket(index) for index in seats]
+
+    def get_tickets_count(self, status: TicketStatus) -> int:
+        """Get the number of tickets in the zone with the given status."""
+        return self.__status_counts[TICKET_STATUS_CODES[status]]
 
     def get_available_tickets_count(self) -> int:
         """Get the number of available tickets in the zone."""
-        available_tickets = [ticket for ticket in self.__tickets if ticket.status == TicketStatus.AVAILABLE]
-        return len(available_tickets)
+        return self.get_tickets_count(TicketStatus.AVAILABLE)
+
+    def get_sold_tickets_count(self) -> int:
+        """Get the number of sold tickets in the zone."""
+        return self.get_tickets_count(TicketStatus.SOLD)
+
+    def get_refunded_tickets_count(self) -> int:
+        """Get the number of refunded tickets in the zone."""
+        return self.get_tickets_count(TicketStatus.REFUNDED)
+
+    def verify_counters(self) -> bool:
+        """Check the live status counters against a full scan of the seats."""
+        statuses = bytes(self.__statuses)  # The seat arrays may be memoryviews
+        for code, status in enumerate(TICKET_STATUSES):
+            scanned = statuses.count(code)
+            if scanned != self.__status_counts[code]:
+                logger.error("Zone '%s' counts %s %s tickets, scan found %s.", self.__type, self.__status_counts[code], status.name, scanned)
+                return False
+        return True
+
+    def export_inventory(self) -> tuple:
+        """
+        Copy the seat arrays and status counts, e.g. for a snapshot.
+        Holds do not survive a restart, so held seats are exported as available.
+        :return: (status bytes, buyer ID bytes, count per status code)
+        """
+        with self.__lock:
+            statuses = bytearray(self.__statuses)
+            buyer_ids = bytearray(self.__buyer_ids)
+            counts = list(self.__status_counts)
+        held_code = TICKET_STATUS_CODES[TicketStatus.HELD]
+        available_code = TICKET_STATUS_CODES[TicketStatus.AVAILABLE]
+        index = statuses.find(held_code)
+        while index != -1:
+            statuses[index] = available_code
+            buyer_ids[8 * index:8 * index + 8] = bytes(8)
+            index = statuses.find(held_code, index + 1)
+        counts[available_code] += counts[held_code]
+        counts[held_code] = 0
+        return statuses, buyer_ids, counts
+
+    def attach_inventory(self, statuses, buyer_ids, counts: List[int]):
+        """
+        Use existing writable buffers as the seat arrays instead of copying them,
+        e.g. views into a mapped snapshot.
+        :param statuses: One status code byte per seat
+        :param buyer_ids: One int64 buyer ID per seat
+        :param counts: Number of seats per status code
+        """
+        with self.__lock:
+            self.__adopt_inventory(statuses, buyer_ids, counts)
+
+    def __adopt_inventory(self, statuses, buyer_ids, counts: List[int]):
+        self.__statuses = memoryview(statuses).cast('B')
+        self.__buyer_ids = memoryview(buyer_ids).cast('B').cast('q')
+        for code, count in enumerate(counts):
+            self.__status_counts[code] = count
+        self.__allocator = SeatAllocator()
+
+    def share_inventory(self, statuses, buyer_ids, status_counts, lock, allocator):
+        """
+        Keep the seat state in buffers shared with other processes (see
+        shared_inventory.py). The arrays, status counters and allocator are used
+        in place, so counts read without a lock; `lock` must exclude other processes too.
+        """
+        self.__statuses = memoryview(statuses).cast('B')
+        self.__buyer_ids = memoryview(buyer_ids).cast('B').cast('q')
+        self.__status_counts = memoryview(status_counts).cast('B').cast('q')
+        self.__lock = lock
+        self.__allocator = allocator
 
     def return_ticket(self, ticket: 'Ticket'):
         """Return a refunded ticket to the available tickets pool."""
-        if ticket.status == TicketStatus.REFUNDED:
+        with self.__lock:
+            if ticket.status != TicketStatus.REFUNDED:
+                return
             ticket.status = TicketStatus.AVAILABLE
-            logging.info(f"Ticket {ticket.id} returned to zone '{self.__type}'.")
+            self.set_ticket_buyer_id(ticket.index, 0)
+        logger.debug("Ticket %s returned to zone '%s'.", ticket.id, self.__type)
+
+class TicketList(Sequence):
+    """
+    Tickets kept as their IDs, e.g. an ID list mapped from a snapshot, with
+    Ticket views resolved on access. The IDs are copied into an array on the
+    first change.
+    """
+
+    def __init__(self, ticket_ids, resolve: Callable[[int], 'Ticket']):
+        self.__ids = ticket_ids
+        self.__resolve = resolve
+
+    # Getter for ids
+    @property
+    def ids(self):
+        return self.__ids
+
+    def __len__(self):
+        return len(self.__ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.__resolve(ticket_id) for ticket_id in self.__ids[index]]
+        return self.__resolve(self.__ids[index])
+
+    def __contains__(self, ticket):
+        return ticket.id in self.__ids
+
+    def append(self, ticket: 'Ticket'):
+        self.__writable().append(ticket.id)
+
+    def remove(self, ticket: 'Ticket'):
+        self.__writable().remove(ticket.id)
+
+    def __writable(self) -> array:
+        if not isinstance(self.__ids, array):
+            self.__ids = array('q', self.__ids)
+        return self.__ids
+
+class ZoneTickets(Sequence):
+    """Read-only sequence over a zone's seats that materializes Ticket views lazily."""
+
+    def __init__(self, zone: Zone):
+        self.__zone = zone
+
+    def __len__(self):
+        return self.__zone.capacity
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.__zone.get_ticket(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ticket index out of range")
+        return self.__zone.get_ticket(index)
 
 class Ticket:
-    ticket_counter = 0  # Static counter for Ticket IDs
+    ticket_counter = 0  # Static counter for Ticket IDs, advanced per zone block
 
-    def __init__(self, zone: 'Zone', controller: 'Controller'):
-        Ticket.ticket_counter += 1
-        self.__id = Ticket.ticket_counter  # Auto-generate ID
+    def __init__(self, zone: 'Zone', index: int, controller: 'Controller'):
+        self.__id = zone.first_ticket_id + index  # Derived from the zone's ID block
         self.__zone = zone
-        self.__buyer: Optional[User] = None
-        self.__status = TicketStatus.AVAILABLE
+        self.__index = index
         self.__controller = controller  # Add controller reference
 
     # Getter for id
@@ -266,34 +598,180 @@ class Ticket:
     def zone(self):
         return self.__zone
 
+    # Getter for index (seat offset within the zone)
+    @property
+    def index(self):
+        return self.__index
+
     # Getter for status
     @property
     def status(self):
-        return self.__status
+        return self.__zone.get_ticket_status(self.__index)
 
     # Setter for status
     @status.setter
     def status(self, value: TicketStatus):
-        self.__status = value
+        self.__zone.set_ticket_status(self.__index, value)
+
+    # Getter for buyer
+    @property
+    def buyer(self) -> Optional[User]:
+        buyer_id = self.__zone.get_ticket_buyer_id(self.__index)
+        return self.__controller.get_user_by_id(buyer_id) if buyer_id else None
 
     def purchase(self, buyer: User) -> bool:
-        if self.__status == TicketStatus.AVAILABLE:
-            self.__buyer = buyer
-            self.__status = TicketStatus.SOLD
-            logging.info(f"Ticket {self.__id} purchased by {buyer.name}.")
-            return True
-        return False
+        with self.__zone.lock:
+            if self.status != TicketStatus.AVAILABLE:
+                return False
+            self.__zone.claim_seats([self.__index], buyer)
+        logger.debug("Ticket %s purchased by %s.", self.__id, buyer.name)
+        return True
 
     def refund(self) -> bool:
-        if self.__status == TicketStatus.SOLD and self.__buyer:
-            self.__status = TicketStatus.REFUNDED
-            logging.info(f"Ticket {self.__id} refunded.")
-            # Remove the ticket from the user's tickets
-            self.__controller.remove_ticket_from_user(self.__buyer, self)
-            # Return the ticket to its original zone
-            self.__zone.return_ticket(self)
-            return True
-        return False
+        buyer = self.buyer
+        with self.__zone.lock:
+            if self.status != TicketStatus.SOLD or not buyer:
+                return False
+            self.status = TicketStatus.REFUNDED
+        logger.info("Ticket %s refunded.", self.__id)
+        # Remove the ticket from the user's tickets
+        self.__controller.remove_ticket_from_user(buyer, self)
+        # Return the ticket to its original zone
+        self.__controller.release_seats(self.__zone, [self.__index])
+        return True
+
+class Hold:
+    hold_counter = 0  # Static counter for Hold IDs
+
+    def __init__(self, zone: Zone, seats: List[int], user: User, expires_at: float):
+        Hold.hold_counter += 1
+        self.__id = Hold.hold_counter  # Auto-generate ID
+        self.__zone = zone
+        self.__seats = seats
+        self.__user = user
+        self.__expires_at = expires_at  # time.monotonic() deadline
+        self.__status = HoldStatus.ACTIVE
+
+    # Getter for id
+    @property
+    def id(self):
+        return self.__id
+
+    # Getter for zone
+    @property
+    def zone(self):
+        return self.__zone
+
+    # Getter for seats (seat indices within the zone)
+    @property
+    def seats(self):
+        return self.__seats
+
+    # Getter for user
+    @property
+    def user(self):
+        return self.__user
+
+    # Getter for expires_at
+    @property
+    def expires_at(self):
+        return self.__expires_at
+
+    # Getter for status
+    @property
+    def status(self):
+        return self.__status
+
+    # Setter for status
+    @status.setter
+    def status(self, value: HoldStatus):
+        self.__status = value
+
+class TimingWheel:
+    """
+    Hashed timing wheel. Items are bucketed by the tick they expire on, so a
+    sweep only visits the buckets of the ticks that elapsed since the last one.
+    Items more than one revolution away stay in their bucket until due.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512, now: Optional[float] = None):
+        self.__tick = tick
+        self.__slots: List[Dict[int, tuple]] = [{} for _ in range(slots)]
+        self.__locations: Dict[int, int] = {}  # key -> slot
+        self.__last_tick = math.floor((time.monotonic() if now is None else now) / tick)
+
+    def __len__(self):
+        return len(self.__locations)
+
+    def schedule(self, key: int, item, expires_at: float):
+        # Slots of ticks already swept are not visited again until the next revolution
+        due_tick = max(math.ceil(expires_at / self.__tick), self.__last_tick + 1)
+        slot = due_tick % len(self.__slots)
+        self.__slots[slot][key] = (due_tick, item)
+        self.__locations[key] = slot
+
+    def cancel(self, key: int):
+        """Remove an item; returns it, or None if it already expired or was cancelled."""
+        slot = self.__locations.pop(key, None)
+        if slot is None:
+            return None
+        return self.__slots[slot].pop(key)[1]
+
+    def advance(self, now: float) -> list:
+        """Move the wheel to `now` and return every item that has come due."""
+        now_tick = math.floor(now / self.__tick)
+        expired = []
+        # A gap longer than one revolution still only needs one pass over the slots
+        first_tick = max(self.__last_tick + 1, now_tick - len(self.__slots) + 1)
+        for tick in range(first_tick, now_tick + 1):
+            bucket = self.__slots[tick % len(self.__slots)]
+            due = [key for key, (due_tick, _) in bucket.items() if due_tick <= now_tick]
+            for key in due:
+                expired.append(bucket.pop(key)[1])
+                del self.__locations[key]
+        self.__last_tick = max(self.__last_tick, now_tick)
+        return expired
+
+class SharedExclusiveLock:
+    """
+    Many holders in shared mode or one in exclusive mode; waiting exclusive
+    holders block new shared ones so they cannot starve. Not reentrant.
+    """
+
+    def __init__(self):
+        self.__condition = threading.Condition()
+        self.__shared_holders = 0
+        self.__exclusive_held = False
+        self.__exclusive_waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self.__condition:
+            while self.__exclusive_held or self.__exclusive_waiting:
+                self.__condition.wait()
+            self.__shared_holders += 1
+        try:
+            yield
+        finally:
+            with self.__condition:
+                self.__shared_holders -= 1
+                if self.__shared_holders == 0:
+                    self.__condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self.__condition:
+            self.__exclusive_waiting += 1
+            while self.__exclusive_held or self.__shared_holders:
+                self.__condition.wait()
+            self.__exclusive_waiting -= 1
+            self.__exclusive_held = True
+        try:
+            yield
+        finally:
+            with self.__condition:
+                self.__exclusive_held = False
+                self.__condition.notify_all()
 
 class Order:
     order_counter = 0  # Static counter for Order IDs
@@ -303,7 +781,7 @@ class Order:
         self.__id = Order.order_counter  # Auto-generate ID
         self.__buyer = buyer
         self.__tickets: List[Ticket] = []
-        self.__total_price: float = 0.0
+        self.__total_price: Optional[float] = 0.0  # None until summed for restored tickets
         self.__status = OrderStatus.PENDING
 
     # Getter for id
@@ -316,28 +794,50 @@ class Order:
     def status(self):
         return self.__status
 
+    # Setter for status
+    @status.setter
+    def status(self, value: OrderStatus):
+        self.__status = value
+
     # Getter for buyer
     @property
     def buyer(self):
         return self.__buyer
 
+    # Getter for tickets
+    @property
+    def tickets(self):
+        return self.__tickets
+
+    # Getter for total_price
+    @property
+    def total_price(self):
+        if self.__total_price is None:
+            self.__total_price = sum(ticket.zone.price for ticket in self.__tickets)
+        return self.__total_price
+
     def add_ticket(self, ticket: Ticket):
         self.__tickets.append(ticket)
-        self.__total_price += ticket.zone.price
+        self.__total_price = self.total_price + ticket.zone.price
+
+    def restore_tickets(self, tickets: TicketList):
+        """Replace the tickets with a lazily resolved list, e.g. from a snapshot; the total is computed when first read."""
+        self.__tickets = tickets
+        self.__total_price = None
 
     def complete_order(self) -> bool:
         if self.__status == OrderStatus.PENDING:
             if not self.__tickets:
-                logging.error(f"Order {self.__id} has no tickets to complete.")
+                logger.error("Order %s has no tickets to complete.", self.__id)
                 return False
             self.__status = OrderStatus.COMPLETED
-            payment = Payment(order=self, amount=self.__total_price)
+            payment = Payment(order=self, amount=self.total_price)
             if payment.process_payment(success=True):
-                logging.info(f"Order {self.__id} completed successfully.")
+                logger.info("Order %s completed successfully.", self.__id)
                 return True
             else:
                 self.__status = OrderStatus.PENDING
-                logging.error(f"Payment for order {self.__id} failed.")
+                logger.error("Payment for order %s failed.", self.__id)
                 return False
         return False
 
@@ -367,11 +867,11 @@ class Payment:
     def process_payment(self, success: bool) -> bool:
         if success:
             self.__status = PaymentStatus.COMPLETED
-            logging.info(f"Payment {self.__id} completed successfully.")
+            logger.info("Payment %s completed successfully.", self.__id)
             return True
         else:
             self.__status = PaymentStatus.FAILED
-            logging.error(f"Payment {self.__id} failed.")
+            logger.error("Payment %s failed.", self.__id)
             return False
 
 class RefundRequest:
@@ -390,26 +890,189 @@ class RefundRequest:
     def id(self):
         return self.__id
 
+    # Getter for ticket
+    @property
+    def ticket(self):
+        return self.__ticket
+
+    # Getter for buyer
+    @property
+    def buyer(self):
+        return self.__buyer
+
     # Getter for status
     @property
     def status(self):
         return self.__status
 
+    # Setter for status
+    @status.setter
+    def status(self, value: RefundStatus):
+        self.__status = value
+
     def approve_refund(self) -> bool:
         if self.__status == RefundStatus.PENDING:
             self.__status = RefundStatus.APPROVED
             self.__ticket.refund()
-            logging.info(f"Refund request {self.__id} approved.")
+            logger.info("Refund request %s approved.", self.__id)
             return True
         return False
 
     def reject_refund(self) -> bool:
         if self.__status == RefundStatus.PENDING:
             self.__status = RefundStatus.REJECTED
-            logging.info(f"Refund request {self.__id} rejected.")
+            logger.info("Refund request %s rejected.", self.__id)
             return True
         return False
 
+class PurchaseResult:
+    """Outcome of Controller.purchase_many: either every requested seat or none."""
+
+    def __init__(self, order: Order, tickets: Dict[Zone, List[Ticket]], errors: Dict[Zone, str]):
+        self.__order = order
+        self.__tickets = tickets
+        self.__errors = errors
+
+    # Getter for order
+    @property
+    def order(self):
+        return self.__order
+
+    # Getter for tickets (purchased tickets per zone)
+    @property
+    def tickets(self):
+        return self.__tickets
+
+    # Getter for errors (failure reason per zone)
+    @property
+    def errors(self):
+        return self.__errors
+
+    # Getter for success
+    @property
+    def success(self):
+        return not self.__errors
+
+class EventPage:
+    """One slice of the date-ordered event catalog (see Controller.get_events_page)."""
+
+    def __init__(self, events: List['Event'], next_cursor: Optional[str], total: int):
+        self.__events = events
+        self.__next_cursor = next_cursor
+        self.__total = total
+
+    # Getter for events
+    @property
+    def events(self):
+        return self.__events
+
+    # Getter for next_cursor (None on the last page)
+    @property
+    def next_cursor(self):
+        return self.__next_cursor
+
+    # Getter for total (events matching the filters, on all pages)
+    @property
+    def total(self):
+        return self.__total
+
+    @staticmethod
+    def encode_cursor(date: datetime, event_id: int) -> str:
+        return f"{date.isoformat()}~{event_id}"
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple:
+        """(date, event ID) of the last event on the previous page."""
+        date, event_id = cursor.rsplit("~", 1)
+        return datetime.fromisoformat(date), int(event_id)
+
+class InventoryCoordinator:
+    """
+    Owns seat claims and releases for the Controller's zones. LocalCoordinator
+    works on this process's zone arrays; coordinator.RemoteCoordinator asks a
+    coordinator server shared by several app nodes.
+    """
+
+    def register(self, zone: Zone):
+        """Make a newly created zone known to the coordinator."""
+
+    def claim(self, buyer: User, quantities: Dict[Zone, int]) -> tuple:
+        """
+        Claim seats in several zones for `buyer`: every requested seat or none.
+        :return: (seat indices per zone, error per zone); one of them is empty
+        """
+        raise NotImplementedError
+
+    def release(self, zone: Zone, indices: List[int]):
+        """Return refunded seats to the zone's available pool."""
+        raise NotImplementedError
+
+    def hold(self, user: User, zone: Zone, quantity: int) -> List[int]:
+        """Hold `quantity` seats for `user`; returns their indices, or an empty list if they cannot be held."""
+        raise NotImplementedError
+
+    def release_hold(self, zone: Zone, indices: List[int]):
+        """Return held seats to the zone's available pool."""
+        raise NotImplementedError
+
+    def convert_hold(self, buyer: User, zone: Zone, indices: List[int]):
+        """Sell held seats to `buyer`."""
+        raise NotImplementedError
+
+    def get_available_count(self, zone: Zone) -> int:
+        raise NotImplementedError
+
+    # Getter for catalog: the catalog.Catalog nodes sharing this coordinator create users, halls and events through
+    @property
+    def catalog(self):
+        return None
+
+class LocalCoordinator(InventoryCoordinator):
+    """Claims seats directly in the zone arrays, under the zone locks."""
+
+    def claim(self, buyer: User, quantities: Dict[Zone, int]) -> tuple:
+        # Zone locks are taken in zone ID order so concurrent claims cannot deadlock
+        zones = sorted((zone for zone, quantity in quantities.items() if quantity > 0), key=lambda zone: zone.id)
+        claimed: Dict[Zone, List[int]] = {}
+        errors: Dict[Zone, str] = {}
+        for zone in zones:
+            zone.lock.acquire()
+        try:
+            for zone in zones:
+                if zone.get_available_tickets_count() < quantities[zone]:
+                    errors[zone] = f"Not enough {zone.type} tickets available"
+            if not errors:
+                for zone in zones:
+                    claimed[zone] = zone.get_available_seats(quantities[zone])
+                    zone.claim_seats(claimed[zone], buyer)
+        finally:
+            for zone in reversed(zones):
+                zone.lock.release()
+        return claimed, errors
+
+    def release(self, zone: Zone, indices: List[int]):
+        for index in indices:
+            zone.return_ticket(zone.get_ticket(index))
+
+    def hold(self, user: User, zone: Zone, quantity: int) -> List[int]:
+        with zone.lock:
+            if zone.get_available_tickets_count() < quantity:
+                return []
+            seats = zone.get_available_seats(quantity)
+            zone.hold_seats(seats, user)
+        return seats
+
+    def release_hold(self, zone: Zone, indices: List[int]):
+        with zone.lock:
+            zone.release_seats(indices)
+
+    def convert_hold(self, buyer: User, zone: Zone, indices: List[int]):
+        with zone.lock:
+            zone.claim_seats(indices, buyer)
+
+    def get_available_count(self, zone: Zone) -> int:
+        return zone.get_available_tickets_count()
+
 class UserTickets:
     def __init__(self, user: User):
         self.__user = user
@@ -427,7 +1090,11 @@ class UserTickets:
 
     def add_ticket(self, ticket: Ticket):
         self.__tickets.append(ticket)
-        logging.info(f"Ticket {ticket.id} added to user '{self.__user.name}'.")
+        logger.debug("Ticket %s added to user '%s'.", ticket.id, self.__user.name)
+
+    def restore_tickets(self, tickets: TicketList):
+        """Replace the tickets with a lazily resolved list, e.g. from a snapshot."""
+        self.__tickets = tickets
 
     def display_tickets(self):
         """Display the tickets owned by the user."""
@@ -438,7 +1105,7 @@ class UserTickets:
 
 # Controller Class
 class Controller:
-    def __init__(self):
+    def __init__(self, booking_length: timedelta = timedelta(days=1)):
         self.__users: List[User] = []
         self.__events: List[Event] = []
         self.__orders: List[Order] = []
@@ -446,29 +1113,199 @@ class Controller:
         self.__refund_requests: List[RefundRequest] = []
         self.__user_tickets: Dict[int, UserTickets] = {}
         self.__halls: List[Hall] = []
+        # Hash indexes kept alongside the ordered lists above
+        self.__users_by_id: Dict[int, User] = {}
+        self.__users_by_email: Dict[str, User] = {}
+        self.__events_by_id: Dict[int, Event] = {}
+        self.__orders_by_id: Dict[int, Order] = {}
+        self.__refund_requests_by_id: Dict[int, RefundRequest] = {}
+        self.__halls_by_id: Dict[int, Hall] = {}
+        # Date-ordered event index of (date, event ID) keys, overall and per hall.
+        # It doubles as the hall booking calendar: every event books its hall
+        # for `booking_length` from its date, so the per-hall lists are sorted
+        # interval lists of equal-length bookings.
+        self.__event_dates: List[tuple] = []
+        self.__event_dates_by_hall: Dict[int, List[tuple]] = {}
+        # Hall calendar by day: sorted (start, hall ID) bookings starting on each date
+        self.__bookings_by_day: Dict[date, List[tuple]] = {}
+        self.__event_index_lock = threading.RLock()
+        self.__booking_length = booking_length
+        # Full-text and date search over events
+        self.__search_index = EventSearchIndex()
+        # Ticket ID range directory: zones sorted by the first ID of their block
+        self.__zone_range_starts: List[int] = []
+        self.__zone_ranges: List[Zone] = []
+        # Active seat holds, expired through a timing wheel
+        self.__holds_by_id: Dict[int, Hold] = {}
+        self.__hold_wheel = TimingWheel()
+        self.__holds_lock = threading.Lock()
+        self.__zones_by_id: Dict[int, Zone] = {}
+        # Optional write-ahead journal. Mutations run under the state lock in
+        # shared mode so a snapshot can take it exclusively for a consistent view.
+        self.__journal = None
+        self.__state_lock = SharedExclusiveLock()
+        # Optional cross-process seat storage for zones, and the catalog
+        # (see catalog.Catalog) through which users, halls and events are shared
+        self.__shared_inventory = None
+        self.__catalog = None
+        # Decides which seats purchases get (see InventoryCoordinator)
+        self.__coordinator: InventoryCoordinator = LocalCoordinator()
+        # Password KDF; the async user methods hash in a bounded thread pool
+        self.__password_hasher = PasswordHasher()
+        self.__hashing_pool = HashingPool(self.__password_hasher)
+        # Called with (change, event ID) once a mutation is done; see add_change_listener
+        self.__change_listeners: List[Callable[[str, int], None]] = []
+
+    # Persistence
+    def attach_journal(self, journal):
+        """Record every mutation to `journal` (see persistence.WriteAheadLog)."""
+        self.__journal = journal
+
+    def attach_shared_inventory(self, inventory):
+        """Keep the seats of zones created from now on in `inventory` (see shared_inventory.SharedInventory)."""
+        self.__shared_inventory = inventory
+        self.attach_catalog(inventory.catalog)
+
+    def attach_catalog(self, catalog):
+        """
+        Share users, halls and events with other processes through `catalog`.
+        Halls get their IDs when constructed, so construct them inside shared_catalog().
+        """
+        self.__catalog = catalog
+
+    def shared_catalog(self):
+        """Context manager holding the catalog lock, with other processes' users, halls and events applied."""
+        return self.__catalog.section(self) if self.__catalog else nullcontext()
+
+    def use_coordinator(self, coordinator: InventoryCoordinator):
+        """
+        Claim, hold and release seats through `coordinator`; existing zones are registered with it.
+        A coordinator shared by several nodes brings the catalog they create users, halls and events through.
+        """
+        self.__coordinator = coordinator
+        if coordinator.catalog is not None:
+            self.attach_catalog(coordinator.catalog)
+        for zone in self.__zones_by_id.values():
+            coordinator.register(zone)
+
+    def add_change_listener(self, listener: Callable[[str, int], None]):
+        """
+        Call `listener(change, event_id)` after every change to what an event shows:
+        "event" when it is created, "availability" when its seats are sold, held or returned.
+        Listeners run on the thread that made the change and should return quickly.
+        """
+        self.__change_listeners.append(listener)
+
+    def __notify(self, change: str, zones) -> None:
+        for event_id in {zone.event.id for zone in zones}:
+            for listener in self.__change_listeners:
+                listener(change, event_id)
+
+    def freeze(self):
+        """Context manager that pauses all mutations, e.g. while capturing a snapshot."""
+        return self.__state_lock.exclusive()
+
+    def fork(self, child: Callable[[], int]) -> int:
+        """
+        Fork with all mutations paused and every zone lock held, so the child
+        starts from a consistent copy-on-write view of the state.
+        The child runs `child` and exits with its return value without ever
+        returning here; the parent gets the child's PID and resumes at once.
+        A plain os.fork() is deliberate: only a fork hands the child this
+        memory as it is. The process's other threads (WAL flusher, hold
+        sweeper and the like) do not exist in the child and may have held
+        locks at the fork, logging's among them, so `child` must not log or
+        touch objects they share; it reports back through file descriptors
+        it was given instead.
+        """
+        with self.freeze():
+            # Holds take zone locks outside the state lock, so those are held too
+            zones = sorted(self.__zones_by_id.values(), key=lambda zone: zone.id)
+            for zone in zones:
+                zone.lock.acquire()
+            try:
+                pid = os.fork()
+            finally:
+                for zone in reversed(zones):
+                    zone.lock.release()
+            if pid == 0:
+                status = 1
+                try:
+                    status = child()
+                finally:
+                    os._exit(status)
+        return pid
+
+    def __record(self, op: str, **fields) -> int:
+        """Journal a mutation; must be called inside its shared state-lock section."""
+        record = {"op": op, **fields}
+        if self.__catalog is not None:
+            self.__catalog.publish(record)
+        if self.__journal is None:
+            return 0
+        return self.__journal.append(record)
+
+    def __commit(self, lsn: int):
+        """Wait for a journaled mutation to become durable (group commit)."""
+        if lsn:
+            self.__journal.wait_durable(lsn)
+
+    def configure_password_hashing(self, hasher: PasswordHasher, max_workers: int = 2, max_pending: int = 64):
+        """Hash new passwords with `hasher`; existing hashes are upgraded on login."""
+        self.__password_hasher = hasher
+        self.__hashing_pool = HashingPool(hasher, max_workers=max_workers, max_pending=max_pending)
+
+    def get_password_hashing_metrics(self) -> dict:
+        return self.__hashing_pool.get_metrics()
+
+    @staticmethod
+    def normalize_email(email: str) -> str:
+        return email.strip().casefold()
 
     # User Management
-    def create_user(self, name: str, email: str, password: str, roles: List[str]) -> User:
-        user = User(name=name, email=email, password=password, roles=roles)
-        self.__users.append(user)
-        self.__user_tickets[user.id] = UserTickets(user=user)
-        logging.info(f"User '{name}' created with roles: {roles}.")
+    def create_user(self, name: str, email: str, password: str, roles: List[str], password_hash: Optional[str] = None) -> User:
+        password_hash = password_hash or self.__password_hasher.hash(password)
+        with self.shared_catalog(), self.__state_lock.shared():
+            user = User(name=name, email=email, password=password, roles=roles, password_hash=password_hash)
+            self.__users.append(user)
+            self.__users_by_id[user.id] = user
+            # Keep the first account registered for an email, as the old scan did
+            self.__users_by_email.setdefault(self.normalize_email(email), user)
+            self.__user_tickets[user.id] = UserTickets(user=user)
+            lsn = self.__record("create_user", id=user.id, name=name, email=email, password_hash=user.password_hash, roles=roles)
+        self.__commit(lsn)
+        logger.info("User '%s' created with roles: %s.", name, roles)
         return user
+
+    async def create_user_async(self, name: str, email: str, password: str, roles: List[str]) -> User:
+        """
+        create_user() with the password hashed in the hashing pool instead of the
+        calling thread, and the journal write waited for in a worker thread.
+        """
+        password_hash = await self.__hashing_pool.hash(password)
+        return await asyncio.to_thread(self.create_user, name=name, email=email, password="", roles=roles, password_hash=password_hash)
+
+    def set_password_hash(self, user: User, password_hash: str):
+        with self.__state_lock.shared():
+            user.password_hash = password_hash
+            lsn = self.__record("set_password_hash", id=user.id, password_hash=password_hash)
+        self.__commit(lsn)
+
     def get_users(self) -> List[User]:
         return self.__users
 
     def get_user_by_id(self, user_id: int) -> Optional[User]:
-        for user in self.__users:
-            if user.id == user_id:
-                return user
-        logging.warning(f"User with ID {user_id} not found.")
+        user = self.__users_by_id.get(user_id)
+        if user:
+            return user
+        logger.warning("User with ID %s not found.", user_id)
         return None
 
     def get_user_by_email(self, email: str) -> Optional[User]:
-        for user in self.__users:
-            if user.email == email:
-                return user
-        logging.warning(f"User with email {email} not found.")
+        user = self.__users_by_email.get(self.normalize_email(email))
+        if user:
+            return user
+        logger.warning("User with email %s not found.", email)
         return None
 
     def add_ticket_to_user(self, user: User, ticket: Ticket):
@@ -479,30 +1316,53 @@ class Controller:
         if user_id in self.__user_tickets:
             self.__user_tickets[user_id].display_tickets()
         else:
-            logging.error(f"User with ID {user_id} not found.")
+            logger.error("User with ID %s not found.", user_id)
 
     def authenticate_user(self, email: str, password: str) -> Optional[User]:
         user = self.get_user_by_email(email)
         if user and user.verify_password(password):
+            if self.__password_hasher.needs_rehash(user.password_hash):
+                self.set_password_hash(user, self.__password_hasher.hash(password))
             return user
-        logging.warning(f"Authentication failed for email: {email}")
+        logger.warning("Authentication failed for email: %s", email)
+        return None
+
+    async def authenticate_user_async(self, email: str, password: str) -> Optional[User]:
+        """
+        authenticate_user() with hashing done in the bounded hashing pool.
+        Hashes from a legacy scheme or older KDF settings are upgraded on success.
+        Raises passwords.PasswordHashingBusy when the pool is saturated.
+        """
+        user = self.get_user_by_email(email)
+        if user and await self.__hashing_pool.verify(password, user.password_hash):
+            if self.__password_hasher.needs_rehash(user.password_hash):
+                await asyncio.to_thread(self.set_password_hash, user, await self.__hashing_pool.hash(password))
+                logger.info("Password hash of user %s upgraded to %s.", user.id, self.__password_hasher.algorithm)
+            return user
+        logger.warning("Authentication failed for email: %s", email)
         return None
 
     def get_user_tickets(self, user_id: int) -> List[Ticket]:
         if user_id in self.__user_tickets:
             return self.__user_tickets[user_id].tickets
-        logging.warning(f"User with ID {user_id} not found.")
+        logger.warning("User with ID %s not found.", user_id)
         return []
 
+    def restore_user_tickets(self, user: User, ticket_ids):
+        """Give a user the tickets with these IDs, resolving their views only when they are read."""
+        if user.id in self.__user_tickets:
+            self.__user_tickets[user.id].restore_tickets(TicketList(ticket_ids, self.get_ticket_by_id))
+
     def remove_ticket_from_user(self, user: User, ticket: Ticket):
         if user.id in self.__user_tickets:
             self.__user_tickets[user.id].tickets.remove(ticket)
-            logging.info(f"Ticket {ticket.id} removed from user '{user.name}'.")
+            logger.debug("Ticket %s removed from user '%s'.", ticket.id, user.name)
 
     # Event Management
-    def create_event(self, name: str, date: datetime, organizer: User, hall: Hall, description: str, image_url: str, zones: List[Dict[str, float]]) -> Event:
+    def create_event(self, name: str, date: datetime, organizer: User, hall: Hall, description: str, image_url: str, zones: List[Dict[str, float]],
+                     allow_overlap: bool = False) -> Optional[Event]:
         """
-        Create an event and automatically add zones.
+        Create an event and automatically add zones, booking its hall from `date` for the booking length.
         :param name: Name of the event
         :param date: Date of the event
         :param organizer: Organizer of the event
@@ -510,28 +1370,47 @@ class Controller:
         :param description: Description of the event
         :param image_url: URL of the event image
         :param zones: List of zones to be added with their percentage, price, and quantity
-        :return: Created Event object
+        :param allow_overlap: Book the hall even if already booked (replaying history)
+        :return: Created Event object, or None if the hall is booked at that time
         """
-        event = Event(name=name, date=date, organizer=organizer, hall=hall, description=description, image_url=image_url)
-        self.__events.append(event)
-        logging.info(f"Event '{name}' created by '{organizer.name}'.")
-
-        for zone in zones:
-            self.add_zone_to_event(event_id=event.id, zone_type=zone['type'], percentage=zone['percentage'], price=zone['price'], quantity=zone['quantity'], user=organizer)
-
+        with self.shared_catalog(), self.__state_lock.shared():
+            # Checked and booked under one lock, so two requests cannot both take the hall
+            with self.__event_index_lock:
+                if not allow_overlap and self.__hall_bookings(self.__event_dates_by_hall.get(hall.id, []), date, date + self.__booking_length):
+                    logger.warning("Hall %s is already booked on %s.", hall.id, date)
+                    return None
+                event = Event(name=name, date=date, organizer=organizer, hall=hall, description=description, image_url=image_url)
+                self.__events.append(event)
+                self.__events_by_id[event.id] = event
+                self.__index_event(event)
+            logger.info("Event '%s' created by '%s'.", name, organizer.name)
+
+            for zone in zones:
+                self.add_zone_to_event(event_id=event.id, zone_type=zone['type'], percentage=zone['percentage'], price=zone['price'], quantity=zone['quantity'], user=organizer)
+
+            lsn = self.__record(
+                "create_event", id=event.id, name=name, date=date.isoformat(), organizer_id=organizer.id,
+                hall={"id": hall.id, "size": hall.size, "capacity": hall.capacity}, description=description, image_url=image_url,
+                zones=[{"id": zone.id, "type": zone.type, "price": zone.price, "capacity": zone.capacity, "first_ticket_id": zone.first_ticket_id} for zone in event.zones.values()]
+            )
+        self.__commit(lsn)
+        for listener in self.__change_listeners:
+            listener("event", event.id)
         return event
 
-    def add_zone_to_event(self, event_id: int, zone_type: str, percentage: float, price: float, quantity: int, user: User) -> bool:
+    def add_zone_to_event(self, event_id: int, zone_type: str, percentage: float, price: float, quantity: int, user: User,
+                          inventory: Optional[tuple] = None) -> bool:
         event = self.get_event_by_id(event_id)
         if event:
-            return event.add_zone_with_percentage(zone_type=zone_type, percentage=percentage, price=price, quantity=quantity, user=user, controller=self)
+            return event.add_zone_with_percentage(zone_type=zone_type, percentage=percentage, price=price, quantity=quantity, user=user, controller=self,
+                                                  inventory=inventory)
         return False
 
     def get_event_by_id(self, event_id: int) -> Optional[Event]:
-        for event in self.__events:
-            if event.id == event_id:
-                return event
-        logging.warning(f"Event with ID {event_id} not found.")
+        event = self.__events_by_id.get(event_id)
+        if event:
+            return event
+        logger.warning("Event with ID %s not found.", event_id)
         return None
 
     def display_event_info(self, event_id: int):
@@ -539,16 +1418,110 @@ class Controller:
         if event:
             event.display_event_info()
         else:
-            logging.error(f"Event with ID {event_id} not found.")
+            logger.error("Event with ID %s not found.", event_id)
 
     def get_events(self) -> List[Event]:
         return self.__events
 
+    def __index_event(self, event: Event):
+        key = (event.date, event.id)
+        with self.__event_index_lock:
+            insort(self.__event_dates, key)
+            insort(self.__event_dates_by_hall.setdefault(event.hall.id, []), key)
+            insort(self.__bookings_by_day.setdefault(event.date.date(), []), (event.date, event.hall.id))
+        self.__search_index.add(event.id, event.name, event.description, event.date)
+
+    def __hall_bookings(self, keys: List[tuple], start: datetime, end: datetime) -> List[tuple]:
+        """
+        The (date, event ID) keys of bookings overlapping [start, end). All
+        bookings have the same length, so those are the ones starting in
+        (start - booking_length, end): one contiguous slice, found by bisection.
+        """
+        low = bisect_right(keys, (start - self.__booking_length, math.inf))
+        high = bisect_left(keys, (end,))
+        return keys[low:high]
+
+    def is_hall_free(self, hall_id: int, start: datetime, end: datetime) -> bool:
+        """Whether no event has the hall booked between `start` and `end`."""
+        with self.__event_index_lock:
+            return not self.__hall_bookings(self.__event_dates_by_hall.get(hall_id, []), start, end)
+
+    def can_book_hall(self, hall_id: int, date: datetime) -> bool:
+        """Whether an event on `date` would find the hall free for its whole booking."""
+        return self.is_hall_free(hall_id, date, date + self.__booking_length)
+
+    def get_booked_hall_ids(self, start: datetime, end: datetime) -> set:
+        """
+        IDs of the halls booked between `start` and `end`, from the day calendar:
+        only the days a booking overlapping the period can start on are read, each
+        bisected to the exact bounds, so this is O(days · log b + k) for k bookings.
+        """
+        first = start - self.__booking_length
+        busy = set()
+        with self.__event_index_lock:
+            for offset in range((end.date() - first.date()).days + 1):
+                bookings = self.__bookings_by_day.get(first.date() + timedelta(days=offset))
+                if bookings:
+                    low = bisect_right(bookings, (first, math.inf))
+                    high = bisect_left(bookings, (end,))
+                    busy.update(hall_id for _, hall_id in bookings[low:high])
+        return busy
+
+    def get_free_halls(self, start: datetime, end: datetime) -> List[Hall]:
+        """
+        Registered halls with no booking between `start` and `end`: the complement
+        of the booked halls found in the day calendar.
+        :param start: Start of the period
+        :param end: End of the period (exclusive)
+        """
+        busy = self.get_booked_hall_ids(start, end)
+        if not busy:
+            return list(self.__halls)
+        return [hall for hall in self.__halls if hall.id not in busy]
+
+    def search_events(self, query: str, start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = 20) -> List[Event]:
+        """
+        Events whose name or description contain every word of `query`, best match first.
+        :param query: Words to find; the last one also matches words it starts
+        :param start: Only events on or after this date
+        :param end: Only events before this date
+        :param limit: Maximum number of results
+        """
+        return [self.__events_by_id[event_id] for event_id in self.__search_index.search(query, start=start, end=end, limit=limit)]
+
+    def suggest_search_terms(self, prefix: str, limit: int = 10) -> List[str]:
+        """Words from event names and descriptions that start with `prefix`, most common first."""
+        return self.__search_index.suggest(prefix, limit=limit)
+
+    def get_events_page(self, cursor: Optional[str] = None, limit: int = 20, hall_id: Optional[int] = None,
+                        start: Optional[datetime] = None, end: Optional[datetime] = None) -> EventPage:
+        """
+        One page of events in date order. Only the requested slice is read, and
+        the total is the distance between two positions in the date index.
+        :param cursor: next_cursor of the previous page, or None for the first page
+        :param limit: Maximum number of events on the page
+        :param hall_id: Only events in this hall
+        :param start: Only events on or after this date
+        :param end: Only events before this date
+        :return: EventPage with the events, the next page's cursor and the number of matching events
+        """
+        keys = self.__event_dates if hall_id is None else self.__event_dates_by_hall.get(hall_id, [])
+        low = 0 if start is None else bisect_left(keys, (start,))
+        high = len(keys) if end is None else bisect_left(keys, (end,))
+        position = low if cursor is None else max(low, bisect_right(keys, EventPage.decode_cursor(cursor)))
+        page_keys = keys[position:min(position + limit, high)]
+        next_cursor = EventPage.encode_cursor(*page_keys[-1]) if page_keys and position + limit < high else None
+        return EventPage(events=[self.__events_by_id[event_id] for _, event_id in page_keys], next_cursor=next_cursor, total=max(0, high - low))
+
     # Order Management
     def create_order(self, buyer: User) -> Order:
-        order = Order(buyer=buyer)
-        self.__orders.append(order)
-        logging.info(f"Order {order.id} created by '{buyer.name}'.")
+        with self.__state_lock.shared():
+            order = Order(buyer=buyer)
+            self.__orders.append(order)
+            self.__orders_by_id[order.id] = order
+            lsn = self.__record("create_order", id=order.id, buyer_id=buyer.id)
+        self.__commit(lsn)
+        logger.info("Order %s created by '%s'.", order.id, buyer.name)
         return order
 
     def add_ticket_to_order(self, order_id: int, ticket: Ticket) -> bool:
@@ -560,9 +1533,13 @@ class Controller:
 
     def complete_order(self, order_id: int) -> bool:
         order = self.get_order_by_id(order_id)
-        if order:
-            return order.complete_order()
-        return False
+        if not order:
+            return False
+        with self.__state_lock.shared():
+            completed = order.complete_order()
+            lsn = self.__record("complete_order", order_id=order_id) if completed else 0
+        self.__commit(lsn)
+        return completed
 
     def cancel_order(self, order_id: int) -> bool:
         order = self.get_order_by_id(order_id)
@@ -570,11 +1547,14 @@ class Controller:
             return order.cancel_order()
         return False
 
+    def get_orders(self) -> List[Order]:
+        return self.__orders
+
     def get_order_by_id(self, order_id: int) -> Optional[Order]:
-        for order in self.__orders:
-            if order.id == order_id:
-                return order
-        logging.warning(f"Order with ID {order_id} not found.")
+        order = self.__orders_by_id.get(order_id)
+        if order:
+            return order
+        logger.warning("Order with ID %s not found.", order_id)
         return None
 
     def display_order_tickets(self, order_id: int):
@@ -582,7 +1562,7 @@ class Controller:
         if order:
             order.display_order_tickets()
         else:
-            logging.error(f"Order with ID {order_id} not found.")
+            logger.error("Order with ID %s not found.", order_id)
 
     # Payment Management
     def process_payment(self, order_id: int, success: bool) -> bool:
@@ -597,88 +1577,287 @@ class Controller:
     def create_refund_request(self, ticket_id: int, buyer: User) -> Optional[RefundRequest]:
         ticket = self.get_ticket_by_id(ticket_id)
         if ticket:
-            refund_request = RefundRequest(ticket=ticket, buyer=buyer)
-            self.__refund_requests.append(refund_request)
-            logging.info(f"Refund request {refund_request.id} created for ticket {ticket_id}.")
+            with self.__state_lock.shared():
+                refund_request = RefundRequest(ticket=ticket, buyer=buyer)
+                self.__refund_requests.append(refund_request)
+                self.__refund_requests_by_id[refund_request.id] = refund_request
+                lsn = self.__record("create_refund_request", id=refund_request.id, ticket_id=ticket_id, buyer_id=buyer.id)
+            self.__commit(lsn)
+            logger.info("Refund request %s created for ticket %s.", refund_request.id, ticket_id)
             return refund_request
         return None
 
     def approve_refund(self, refund_request_id: int) -> bool:
         refund_request = self.get_refund_request_by_id(refund_request_id)
-        if refund_request:
-            return refund_request.approve_refund()
-        return False
+        if not refund_request:
+            return False
+        with self.__state_lock.shared():
+            approved = refund_request.approve_refund()
+            lsn = self.__record("approve_refund", id=refund_request_id) if approved else 0
+        self.__commit(lsn)
+        return approved
 
     def reject_refund(self, refund_request_id: int) -> bool:
         refund_request = self.get_refund_request_by_id(refund_request_id)
-        if refund_request:
-            return refund_request.reject_refund()
-        return False
+        if not refund_request:
+            return False
+        with self.__state_lock.shared():
+            rejected = refund_request.reject_refund()
+            lsn = self.__record("reject_refund", id=refund_request_id) if rejected else 0
+        self.__commit(lsn)
+        return rejected
 
     def get_refund_request_by_id(self, refund_request_id: int) -> Optional[RefundRequest]:
-        for refund_request in self.__refund_requests:
-            if refund_request.id == refund_request_id:
-                return refund_request
-        logging.warning(f"Refund request with ID {refund_request_id} not found.")
+        refund_request = self.__refund_requests_by_id.get(refund_request_id)
+        if refund_request:
+            return refund_request
+        logger.warning("Refund request with ID %s not found.", refund_request_id)
         return None
 
     def get_refund_requests(self) -> List[RefundRequest]:
         return self.__refund_requests
 
     # Helper Methods
+    def reserve_ticket_ids(self, quantity: int) -> int:
+        """Reserve a contiguous block of ticket IDs and return the first one."""
+        first_ticket_id = Ticket.ticket_counter + 1
+        Ticket.ticket_counter += quantity
+        return first_ticket_id
+
+    def register_zone(self, zone: Zone):
+        """Add a zone's ticket ID block to the range directory."""
+        self.__zones_by_id[zone.id] = zone
+        if self.__shared_inventory:
+            self.__shared_inventory.attach(zone)
+        self.__coordinator.register(zone)
+        if zone.capacity == 0:
+            return
+        position = bisect_left(self.__zone_range_starts, zone.first_ticket_id)
+        self.__zone_range_starts.insert(position, zone.first_ticket_id)
+        self.__zone_ranges.insert(position, zone)
+
+    def release_seats(self, zone: Zone, indices: List[int]):
+        """Return refunded seats to their zone through the coordinator."""
+        self.__coordinator.release(zone, indices)
+        self.__notify("availability", [zone])
+
+    def get_available_tickets_count(self, zone: Zone) -> int:
+        """Seats left in a zone as the coordinator sees them (possibly cached)."""
+        return self.__coordinator.get_available_count(zone)
+
+    def get_zone_by_id(self, zone_id: int) -> Optional[Zone]:
+        zone = self.__zones_by_id.get(zone_id)
+        if zone:
+            return zone
+        logger.warning("Zone with ID %s not found.", zone_id)
+        return None
+
     def get_ticket_by_id(self, ticket_id: int) -> Optional[Ticket]:
-        for event in self.__events:
-            for zone in event.zones.values():
-                for ticket in zone.tickets:
-                    if ticket.id == ticket_id:
-                        return ticket
-        logging.warning(f"Ticket with ID {ticket_id} not found.")
+        position = bisect_right(self.__zone_range_starts, ticket_id) - 1
+        if position >= 0:
+            zone = self.__zone_ranges[position]
+            offset = ticket_id - zone.first_ticket_id
+            if offset < zone.capacity:
+                return zone.get_ticket(offset)
+        logger.warning("Ticket with ID %s not found.", ticket_id)
         return None
 
     def purchase_tickets(self, order_id: int, zone: Zone, quantity: int) -> bool:
         order = self.get_order_by_id(order_id)
         if not order:
-            logging.error(f"Order with ID {order_id} not found.")
+            logger.error("Order with ID %s not found.", order_id)
+            return False
+        return self.purchase_many(order, {zone: quantity}).success
+
+    def purchase_many(self, order: Order, quantities: Dict[Zone, int]) -> PurchaseResult:
+        """
+        Atomically buy seats in several zones for one order.
+        The coordinator claims the seats: only if all requested quantities can
+        be met are any of them marked sold.
+        :param order: Order receiving the tickets
+        :param quantities: Number of tickets to buy per zone
+        :return: PurchaseResult with the tickets per zone or the errors per zone
+        """
+        with self.__state_lock.shared():
+            claimed, errors = self.__coordinator.claim(order.buyer, quantities)
+            if errors:
+                for zone in errors:
+                    logger.error("Not enough tickets available in zone '%s'.", zone.type)
+                return PurchaseResult(order=order, tickets={}, errors=errors)
+
+            # Seats are already ours; bookkeeping happens outside any zone lock
+            tickets, lsn = self.__finish_purchase(order, claimed)
+        self.__commit(lsn)
+        self.__notify("availability", claimed)
+        return PurchaseResult(order=order, tickets=tickets, errors={})
+
+    def __finish_purchase(self, order: Order, claimed: Dict[Zone, List[int]]) -> tuple:
+        """Add claimed seats to the order and the buyer's tickets, and journal the sale."""
+        tickets: Dict[Zone, List[Ticket]] = {}
+        for zone, indices in claimed.items():
+            tickets[zone] = [zone.get_ticket(index) for index in indices]
+            for ticket in tickets[zone]:
+                order.add_ticket(ticket)
+                self.add_ticket_to_user(user=order.buyer, ticket=ticket)
+        if logger.isEnabledFor(logging.INFO):
+            # One record per order, whatever its size; per-ticket detail is DEBUG
+            zone_counts = {zone.type: len(indices) for zone, indices in claimed.items()}
+            logger.info(
+                "Order %s: %s tickets sold to '%s' (%s).", order.id, sum(zone_counts.values()), order.buyer.name, zone_counts,
+                extra={"order_id": order.id, "buyer_id": order.buyer.id, "tickets": {zone.id: len(indices) for zone, indices in claimed.items()}}
+            )
+        lsn = self.__record("purchase", order_id=order.id, seats={str(zone.id): indices for zone, indices in claimed.items()})
+        return tickets, lsn
+
+    def apply_purchase(self, order_id: int, seats: Dict[int, List[int]]) -> bool:
+        """
+        Sell specific seats into an order, e.g. when replaying the journal.
+        :param order_id: ID of the order receiving the tickets
+        :param seats: Seat indices per zone ID
+        """
+        order = self.get_order_by_id(order_id)
+        claimed = {self.get_zone_by_id(int(zone_id)): indices for zone_id, indices in seats.items()}
+        if not order or None in claimed:
             return False
+        with self.__state_lock.shared():
+            for zone, indices in claimed.items():
+                with zone.lock:
+                    zone.claim_seats(indices, order.buyer)
+            _, lsn = self.__finish_purchase(order, claimed)
+        self.__commit(lsn)
+        self.__notify("availability", claimed)
+        return True
+
+    # Hold Management
+    def hold_tickets(self, zone: Zone, quantity: int, user: User, ttl: float) -> Optional[Hold]:
+        """
+        Hold seats for a user while they pay, without selling them.
+        :param zone: Zone to hold seats in
+        :param quantity: Number of seats to hold
+        :param user: User the seats are held for
+        :param ttl: Seconds before the hold expires and the seats are released
+        :return: Created Hold, or None if the TTL is not positive or not enough seats are available
+        """
+        if ttl <= 0:
+            logger.error("Hold TTL must be positive, got %s.", ttl)
+            return None
+        self.expire_holds()
+        seats = self.__coordinator.hold(user, zone, quantity) if quantity > 0 else []
+        if not seats:
+            logger.error("Not enough tickets available in zone '%s' to hold %s.", zone.type, quantity)
+            return None
+        hold = Hold(zone=zone, seats=seats, user=user, expires_at=time.monotonic() + ttl)
+        with self.__holds_lock:
+            self.__holds_by_id[hold.id] = hold
+            self.__hold_wheel.schedule(hold.id, hold, hold.expires_at)
+        self.__notify("availability", [zone])
+        logger.info("Hold %s placed on %s tickets in zone '%s' for '%s'.", hold.id, quantity, zone.type, user.name)
+        return hold
+
+    def get_hold_by_id(self, hold_id: int) -> Optional[Hold]:
+        hold = self.__holds_by_id.get(hold_id)
+        if hold:
+            return hold
+        logger.warning("Hold with ID %s not found.", hold_id)
+        return None
 
-        available_tickets = zone.get_available_tickets(quantity)
-        if len(available_tickets) < quantity:
-            logging.error(f"Not enough tickets available in zone '{zone.type}'.")
+    def __take_hold(self, hold_id: int) -> Optional[Hold]:
+        """Remove an active hold from the index and the wheel; only one caller wins."""
+        with self.__holds_lock:
+            hold = self.__holds_by_id.pop(hold_id, None)
+            if hold:
+                self.__hold_wheel.cancel(hold_id)
+            return hold
+
+    def __end_hold(self, hold: Hold, status: HoldStatus):
+        self.__coordinator.release_hold(hold.zone, hold.seats)
+        hold.status = status
+        self.__notify("availability", [hold.zone])
+        logger.info("Hold %s %s, %s tickets returned to zone '%s'.", hold.id, status.name.lower(), len(hold.seats), hold.zone.type)
+
+    def release_hold(self, hold_id: int) -> bool:
+        hold = self.__take_hold(hold_id)
+        if not hold:
             return False
+        self.__end_hold(hold, HoldStatus.RELEASED)
+        return True
 
-        for ticket in available_tickets:
-            if ticket.purchase(order.buyer):
-                self.add_ticket_to_order(order_id=order.id, ticket=ticket)
-                self.add_ticket_to_user(user=order.buyer, ticket=ticket)
-        
-        logging.info(f"Purchased {quantity} tickets in zone '{zone.type}' for order {order_id}.")
+    def expire_holds(self, now: Optional[float] = None) -> int:
+        """Release every hold whose TTL has passed; costs O(expired), not O(tickets)."""
+        now = time.monotonic() if now is None else now
+        with self.__holds_lock:
+            expired = self.__hold_wheel.advance(now)
+            for hold in expired:
+                del self.__holds_by_id[hold.id]
+        for hold in expired:
+            self.__end_hold(hold, HoldStatus.EXPIRED)
+        return len(expired)
+
+    def convert_hold_to_order(self, hold_id: int, order_id: int) -> bool:
+        """Sell the held seats into an order; costs O(held seats)."""
+        order = self.get_order_by_id(order_id)
+        if not order:
+            return False
+        hold = self.get_hold_by_id(hold_id)
+        if not hold or hold.user.id != order.buyer.id:
+            logger.error("Hold %s cannot be used for order %s.", hold_id, order_id)
+            return False
+        hold = self.__take_hold(hold_id)
+        if not hold:
+            return False
+        if hold.expires_at <= time.monotonic():
+            self.__end_hold(hold, HoldStatus.EXPIRED)
+            return False
+        with self.__state_lock.shared():
+            self.__coordinator.convert_hold(order.buyer, hold.zone, hold.seats)
+            hold.status = HoldStatus.CONVERTED
+            _, lsn = self.__finish_purchase(order, {hold.zone: hold.seats})
+        self.__commit(lsn)
+        logger.info("Hold %s converted into order %s.", hold.id, order.id)
         return True
 
+    def start_hold_sweeper(self, interval: float = 1.0) -> threading.Thread:
+        """Expire holds from a daemon thread every `interval` seconds."""
+        def sweep():
+            while True:
+                time.sleep(interval)
+                self.expire_holds()
+        sweeper = threading.Thread(target=sweep, name="hold-sweeper", daemon=True)
+        sweeper.start()
+        return sweeper
+
     def add_zones_to_event(self, event: Event, zones: List[Dict[str, float]], user: User) -> bool:
         for zone in zones:
             if not self.add_zone_to_event(event_id=event.id, zone_type=zone['type'], percentage=zone['percentage'], price=zone['price'], user=user):
-                logging.error(f"Failed to add zone '{zone['type']}' to event '{event.name}'.")
+                logger.error("Failed to add zone '%s' to event '%s'.", zone['type'], event.name)
                 return False
         return True
 
     def add_hall(self, hall: Hall):
-        self.__halls.append(hall)
+        with self.shared_catalog(), self.__state_lock.shared():
+            if self.__halls_by_id.get(hall.id, hall) is not hall:
+                raise ValueError(f"Hall ID {hall.id} is already taken; construct halls inside shared_catalog()")
+            self.__halls.append(hall)
+            self.__halls_by_id[hall.id] = hall
+            lsn = self.__record("add_hall", id=hall.id, size=hall.size, capacity=hall.capacity)
+        self.__commit(lsn)
 
     def get_halls(self) -> List[Hall]:
         return self.__halls
 
     def get_hall_by_id(self, hall_id: int) -> Optional[Hall]:
-        for hall in self.__halls:
-            if hall.id == hall_id:
-                return hall
-        logging.warning(f"Hall with ID {hall_id} not found.")
+        hall = self.__halls_by_id.get(hall_id)
+        if hall:
+            return hall
+        logger.warning("Hall with ID %s not found.", hall_id)
         return None
 
-    def create_ticket(self, zone: Zone) -> Ticket:
-        return Ticket(zone=zone, controller=self)
+    def create_ticket(self, zone: Zone, index: int) -> Ticket:
+        return Ticket(zone=zone, index=index, controller=self)
 
 # Example Usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     controller = Controller()
 
     # Create a user with multiple roles
@@ -0,0 +1,454 @@
+"""
+Inventory coordinator shared by several app nodes.
+
+CoordinatorServer owns the seat inventory of every registered zone and answers
+newline-delimited JSON requests over TCP. A line holds either one request or a
+list of requests (a batch); responses come back in the same shape, matched to
+requests by their "id":
+
+    {"id": 1, "op": "register", "zone": 3, "capacity": 800}
+    {"id": 2, "op": "claim", "zones": {"3": 2, "4": 1}}  -> {"id": 2, "ok": true, "seats": {...}, "available": {...}}
+    {"id": 3, "op": "release", "zone": 3, "seats": [17]}
+    {"id": 4, "op": "available", "zones": [3, 4]}        -> {"id": 4, "ok": true, "available": {...}}
+
+Zones are keyed by ID, so nodes create users, halls and events through the
+catalog the coordinator also keeps (see catalog.Catalog), which gives every
+zone one ID on all nodes. Its lock is a lease, lost if not renewed in time:
+
+    {"id": 5, "op": "catalog_lock", "owner": "9f2c...", "lease": 30}  -> {"id": 5, "ok": true}
+    {"id": 6, "op": "catalog_read", "position": 12}  -> {"id": 6, "ok": true, "records": [...], "position": 14}
+    {"id": 7, "op": "catalog_append", "owner": "9f2c...", "record": {...}}  -> {"id": 7, "ok": true, "position": 15}
+    {"id": 8, "op": "catalog_unlock", "owner": "9f2c..."}
+    {"id": 9, "op": "catalog_position"}  -> {"id": 9, "ok": true, "position": 15}
+
+RemoteCoordinator is the node side: an InventoryCoordinator that batches and
+pipelines requests over a few connections and caches availability.
+
+Run a local coordinator with:  python coordinator.py --port 7070
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from catalog import Catalog
+from controller import InventoryCoordinator, Zone, User
+from log_config import configure_logging, parse_levels
+
+logger = logging.getLogger(__name__)
+
+
+class SeatInventory:
+    """Taken/free state of one zone's seats on the coordinator."""
+
+    def __init__(self, capacity: int):
+        self.__capacity = capacity
+        self.__taken = bytearray(capacity)
+        self.__available = capacity
+        # Same allocator as Zone: a cursor over never-sold seats plus returned seats
+        self.__free_cursor = 0
+        self.__returned_seats: Dict[int, None] = {}
+
+    # Getter for capacity
+    @property
+    def capacity(self):
+        return self.__capacity
+
+    # Getter for available
+    @property
+    def available(self):
+        return self.__available
+
+    def take(self, quantity: int) -> List[int]:
+        """Take `quantity` free seats; the caller checks availability first."""
+        seats = list(itertools.islice(self.__returned_seats, quantity))
+        for index in seats:
+            del self.__returned_seats[index]
+        index = self.__free_cursor
+        while len(seats) < quantity:
+            if not self.__taken[index]:
+                seats.append(index)
+            index += 1
+        self.__free_cursor = index
+        for index in seats:
+            self.__taken[index] = 1
+        self.__available -= len(seats)
+        return seats
+
+    def release(self, indices: List[int]):
+        for index in indices:
+            if 0 <= index < self.__capacity and self.__taken[index]:
+                self.__taken[index] = 0
+                self.__available += 1
+                if index < self.__free_cursor:
+                    self.__returned_seats[index] = None
+
+
+class CoordinatorServer:
+    """Standalone owner of zone inventory; requests run one at a time on the event loop."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 7070):
+        self.__host = host
+        self.__port = port
+        self.__inventories: Dict[int, SeatInventory] = {}
+        # Catalog records, and the node holding the catalog lock until its lease ends
+        self.__catalog: List[dict] = []
+        self.__catalog_owner: Optional[str] = None
+        self.__catalog_lease_end = 0.0
+
+    def handle(self, request: dict) -> dict:
+        """Apply one request and build its response."""
+        response = {"id": request.get("id"), "ok": True}
+        op = request.get("op")
+        if op == "register":
+            zone_id, capacity = int(request["zone"]), int(request["capacity"])
+            inventory = self.__inventories.setdefault(zone_id, SeatInventory(capacity))
+            if inventory.capacity != capacity:
+                # Zone IDs come from the catalog, so this is a node that does not follow it
+                response.update(ok=False, errors={str(zone_id): f"Zone registered with capacity {inventory.capacity}, not {capacity}"})
+        elif op == "claim":
+            quantities = {int(zone_id): quantity for zone_id, quantity in request["zones"].items() if quantity > 0}
+            errors = {}
+            for zone_id, quantity in quantities.items():
+                inventory = self.__inventories.get(zone_id)
+                if inventory is None:
+                    errors[str(zone_id)] = "Unknown zone"
+                elif inventory.available < quantity:
+                    errors[str(zone_id)] = "Not enough tickets available"
+            if errors:
+                response.update(ok=False, errors=errors)
+            else:
+                response["seats"] = {str(zone_id): self.__inventories[zone_id].take(quantity) for zone_id, quantity in quantities.items()}
+            response["available"] = {str(zone_id): self.__inventories[zone_id].available for zone_id in quantities if zone_id in self.__inventories}
+        elif op == "release":
+            inventory = self.__inventories.get(int(request["zone"]))
+            if inventory is None:
+                response.update(ok=False, errors={str(request["zone"]): "Unknown zone"})
+            else:
+                inventory.release(request["seats"])
+                response["available"] = {str(request["zone"]): inventory.available}
+        elif op == "available":
+            response["available"] = {str(zone_id): self.__inventories[int(zone_id)].available for zone_id in request["zones"] if int(zone_id) in self.__inventories}
+        elif op == "catalog_lock":
+            now = time.monotonic()
+            if self.__catalog_owner in (None, request["owner"]) or self.__catalog_lease_end <= now:
+                self.__catalog_owner, self.__catalog_lease_end = request["owner"], now + float(request["lease"])
+            else:
+                response["ok"] = False
+        elif op == "catalog_unlock":
+            if self.__catalog_owner == request["owner"]:
+                self.__catalog_owner = None
+        elif op == "catalog_read":
+            response.update(records=self.__catalog[int(request["position"]):], position=len(self.__catalog))
+        elif op == "catalog_append":
+            if self.__catalog_owner == request["owner"]:
+                self.__catalog.append(request["record"])
+            else:
+                response.update(ok=False, errors={"owner": "Catalog lock not held"})
+            response["position"] = len(self.__catalog)
+        elif op == "catalog_position":
+            response["position"] = len(self.__catalog)
+        else:
+            response.update(ok=False, errors={"op": f"Unknown operation '{op}'"})
+        return response
+
+    async def __serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                reply = [self.handle(request) for request in message] if isinstance(message, list) else self.handle(message)
+                writer.write(json.dumps(reply, separators=(",", ":")).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError) as error:
+            logger.warning("Coordinator client disconnected: %s", error)
+        finally:
+            writer.close()
+
+    async def start(self) -> asyncio.AbstractServer:
+        server = await asyncio.start_server(self.__serve_client, self.__host, self.__port)
+        logger.info("Coordinator listening on %s:%s.", self.__host, self.__port)
+        return server
+
+    async def serve_forever(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+
+class CoordinatorConnection:
+    """
+    One pipelined connection: requests queued by any thread are written as a
+    batch by the sender thread without waiting for earlier responses, and the
+    reader thread completes each request's future when its response arrives.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.__socket = socket.create_connection((host, port))
+        self.__socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__outgoing: queue.Queue = queue.Queue()
+        self.__pending: Dict[int, Future] = {}
+        self.__pending_lock = threading.Lock()
+        self.__batches = 0
+        threading.Thread(target=self.__send_loop, name="coordinator-sender", daemon=True).start()
+        threading.Thread(target=self.__receive_loop, name="coordinator-receiver", daemon=True).start()
+
+    # Getter for batches (lines written, each carrying one or more requests)
+    @property
+    def batches(self):
+        return self.__batches
+
+    def submit(self, request: dict) -> Future:
+        future: Future = Future()
+        with self.__pending_lock:
+            self.__pending[request["id"]] = future
+        self.__outgoing.put(request)
+        return future
+
+    def __send_loop(self):
+        while True:
+            batch = [self.__outgoing.get()]
+            # Everything queued while the previous batch was written goes out together
+            while True:
+                try:
+                    batch.append(self.__outgoing.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                return
+            try:
+                self.__socket.sendall(json.dumps(batch, separators=(",", ":")).encode() + b"\n")
+            except OSError as error:
+                self.__fail_pending(error)
+                return
+            self.__batches += 1
+
+    def __receive_loop(self):
+        with self.__socket.makefile("rb") as stream:
+            try:
+                for line in stream:
+                    for response in json.loads(line):
+                        with self.__pending_lock:
+                            future = self.__pending.pop(response["id"], None)
+                        if future:
+                            future.set_result(response)
+            except OSError as error:
+                self.__fail_pending(error)
+                return
+        self.__fail_pending(ConnectionError("Coordinator closed the connection"))
+
+    def __fail_pending(self, error: Exception):
+        with self.__pending_lock:
+            pending, self.__pending = self.__pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+
+    def close(self):
+        self.__outgoing.put(None)
+        try:
+            self.__socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.__socket.close()
+
+
+class CoordinatorCatalog(Catalog):
+    """Catalog kept by the coordinator server; its lock is a lease that lapses if the node holding it dies."""
+
+    def __init__(self, call: Callable[..., Optional[dict]], lease: float = 30.0, retry_interval: float = 0.05):
+        super().__init__()
+        self.__call = call
+        self.__token = uuid.uuid4().hex  # Names this node as the lock owner
+        self.__lease = lease
+        self.__retry_interval = retry_interval
+        self.__thread_lock = threading.Lock()
+
+    def __request(self, op: str, **fields) -> dict:
+        response = self.__call(op, **fields)
+        if response is None:
+            raise ConnectionError(f"Inventory coordinator did not answer '{op}'")
+        return response
+
+    def acquire_lock(self):
+        self.__thread_lock.acquire()
+        try:
+            while not self.__request("catalog_lock", owner=self.__token, lease=self.__lease)["ok"]:
+                time.sleep(self.__retry_interval)
+        except BaseException:
+            self.__thread_lock.release()
+            raise
+
+    def release_lock(self):
+        try:
+            self.__call("catalog_unlock", owner=self.__token)  # If this is lost, the lease lapses
+        finally:
+            self.__thread_lock.release()
+
+    def read_records(self, position) -> List[tuple]:
+        response = self.__request("catalog_read", position=position)
+        return [(record, position + offset) for offset, record in enumerate(response["records"], 1)]
+
+    def append_record(self, record: dict):
+        response = self.__request("catalog_append", owner=self.__token, record=record)
+        if not response["ok"]:
+            raise RuntimeError(f"Catalog lease lapsed before '{record['op']}' was appended")
+        return response["position"]
+
+    def has_new_records(self) -> bool:
+        response = self.__call("catalog_position")
+        return response is not None and response["position"] > self.position
+
+
+class RemoteCoordinator(InventoryCoordinator):
+    """
+    InventoryCoordinator backed by a CoordinatorServer. Seats claimed or held
+    remotely are mirrored into the local zone arrays so this node's tickets
+    keep their status. Availability is cached for at most `max_staleness`
+    seconds and refreshed by every claim or release response.
+    A request the coordinator does not answer within `timeout` fails the
+    purchase or hold; availability falls back to the last known count, and
+    seats it could not take back stay unavailable here until a later release
+    gets through.
+    """
+
+    def __init__(self, host: str, port: int, connections: int = 2, max_staleness: float = 0.5, timeout: float = 5.0):
+        self.__connections = [CoordinatorConnection(host, port) for _ in range(connections)]
+        self.__next_connection = itertools.cycle(self.__connections)
+        self.__request_ids = itertools.count(1)
+        self.__max_staleness = max_staleness
+        self.__timeout = timeout
+        self.__availability: Dict[int, tuple] = {}  # zone ID -> (count, time.monotonic() of the reading)
+        # Zones and releases the coordinator has not acknowledged yet, retried before later requests
+        self.__unregistered: Dict[int, Zone] = {}
+        self.__unreleased: List[tuple] = []  # (zone, seat indices, local release)
+        self.__retry_lock = threading.Lock()
+        self.__catalog = CoordinatorCatalog(self.__call)
+
+    # Getter for catalog
+    @property
+    def catalog(self):
+        return self.__catalog
+
+    def __submit(self, op: str, **fields) -> Future:
+        return next(self.__next_connection).submit({"id": next(self.__request_ids), "op": op, **fields})
+
+    def __call(self, op: str, **fields) -> Optional[dict]:
+        """Send one request and wait for its response; None if the coordinator cannot be reached in time."""
+        future = self.__submit(op, **fields)
+        try:
+            response = future.result(self.__timeout)
+        except (TimeoutError, OSError) as error:
+            logger.error("Coordinator request '%s' failed: %s", op, str(error) or "timed out")
+            if op == "claim":
+                # The claim may still go through; hand any seats it takes straight back
+                future.add_done_callback(self.__return_late_claim)
+            return None
+        now = time.monotonic()
+        for zone_id, count in response.get("available", {}).items():
+            self.__availability[int(zone_id)] = (count, now)
+        return response
+
+    def __return_late_claim(self, future: Future):
+        if future.exception() is None and future.result()["ok"]:
+            for zone_id, seats in future.result()["seats"].items():
+                self.__submit("release", zone=int(zone_id), seats=seats)
+            logger.warning("Returned seats of a claim answered after its timeout: %s", future.result()["seats"])
+
+    def __retry(self):
+        """Register zones and release seats whose earlier requests failed."""
+        with self.__retry_lock:
+            zones, self.__unregistered = self.__unregistered, {}
+            releases, self.__unreleased = self.__unreleased, []
+        for zone in zones.values():
+            self.register(zone)
+        for zone, indices, release_locally in releases:
+            self.__release(zone, indices, release_locally)
+
+    def register(self, zone: Zone):
+        response = self.__call("register", zone=zone.id, capacity=zone.capacity)
+        if response is None:
+            with self.__retry_lock:
+                self.__unregistered[zone.id] = zone
+        elif not response["ok"]:
+            raise ValueError(response["errors"][str(zone.id)])
+
+    def claim(self, buyer: User, quantities: Dict[Zone, int]) -> tuple:
+        self.__retry()
+        zones = {zone.id: zone for zone, quantity in quantities.items() if quantity > 0}
+        response = self.__call("claim", zones={str(zone.id): quantities[zone] for zone in zones.values()})
+        if response is None:
+            return {}, {zone: "Ticket inventory is unavailable, please try again" for zone in zones.values()}
+        if not response["ok"]:
+            return {}, {zones[int(zone_id)]: f"Not enough {zones[int(zone_id)].type} tickets available" for zone_id in response["errors"]}
+        claimed = {zones[int(zone_id)]: seats for zone_id, seats in response["seats"].items()}
+        for zone, seats in claimed.items():
+            with zone.lock:
+                zone.claim_seats(seats, buyer)
+        return claimed, {}
+
+    def release(self, zone: Zone, indices: List[int]):
+        self.__retry()
+        self.__release(zone, indices, lambda: [zone.return_ticket(zone.get_ticket(index)) for index in indices])
+
+    def hold(self, user: User, zone: Zone, quantity: int) -> List[int]:
+        self.__retry()
+        response = self.__call("claim", zones={str(zone.id): quantity})
+        if response is None or not response["ok"]:
+            return []
+        seats = response["seats"][str(zone.id)]
+        with zone.lock:
+            zone.hold_seats(seats, user)
+        return seats
+
+    def release_hold(self, zone: Zone, indices: List[int]):
+        def release_locally():
+            with zone.lock:
+                zone.release_seats(indices)
+        self.__release(zone, indices, release_locally)
+
+    def convert_hold(self, buyer: User, zone: Zone, indices: List[int]):
+        # The coordinator already counts held seats as taken
+        with zone.lock:
+            zone.claim_seats(indices, buyer)
+
+    def __release(self, zone: Zone, indices: List[int], release_locally: Callable[[], None]):
+        if self.__call("release", zone=zone.id, seats=indices) is None:
+            # Until the coordinator has the seats back they stay unavailable here too
+            with self.__retry_lock:
+                self.__unreleased.append((zone, indices, release_locally))
+            return
+        release_locally()
+
+    def get_available_count(self, zone: Zone) -> int:
+        cached = self.__availability.get(zone.id)
+        if cached is None or time.monotonic() - cached[1] > self.__max_staleness:
+            if self.__call("available", zones=[zone.id]) is None:
+                # A stale count is better than failing the page
+                return cached[0] if cached else zone.get_available_tickets_count()
+            cached = self.__availability.get(zone.id, (0, 0.0))
+        return cached[0]
+
+    def close(self):
+        for connection in self.__connections:
+            connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a standalone inventory coordinator.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7070)
+    args = parser.parse_args()
+    configure_logging(level=os.environ.get("TICKETS_LOG_LEVEL", "INFO"), module_levels=parse_levels(os.environ.get("TICKETS_LOG_LEVELS", "")))
+    asyncio.run(CoordinatorServer(args.host, args.port).serve_forever())
+
+
+if __name__ == "__main__":
+    main()
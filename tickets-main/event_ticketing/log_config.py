@@ -0,0 +1,128 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Union
+
+DEFAULT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+EXCEPTION_FORMATTER = logging.Formatter()
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that hands records over with only the message and traceback
+    rendered. Those are taken at once because arguments can change and
+    tracebacks keep their frames alive while the record waits in the queue;
+    the formatter's layout (time, JSON) and the write wait for the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class BatchingStreamHandler(logging.StreamHandler):
+    """StreamHandler that leaves flushing to BatchingQueueListener."""
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener that flushes its handlers once the queue runs dry, so a burst is written in one go."""
+
+    def dequeue(self, block: bool):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            for handler in self.handlers:
+                handler.flush()
+            return self.queue.get(block)
+
+    def stop(self):
+        if self._thread is None:
+            return  # Already stopped
+        super().stop()
+        for handler in self.handlers:
+            handler.flush()
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "controller=WARNING,persistence=DEBUG" into {logger name: level}."""
+    levels = {}
+    for item in spec.split(","):
+        if item.strip():
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: Union[int, str] = logging.INFO, module_levels: Optional[Dict[str, str]] = None,
+                      json_format: bool = False, queued: bool = True, stream=None) -> Optional[QueueListener]:
+    """
+    Set up application logging, replacing any handlers on the root logger.
+    Modules log through `logging.getLogger(__name__)`, so `module_levels`
+    (e.g. {"controller": "WARNING"}) can quiet one module's hot paths without
+    touching the rest. With `queued`, records go through an in-process queue
+    and are laid out and written by a background thread.
+    :param level: Root log level
+    :param module_levels: Log level per module (logger name)
+    :param json_format: Write one JSON object per record, including `extra` fields
+    :param queued: Write from a background thread instead of the logging thread
+    :param stream: Output stream, stderr by default
+    :return: The running QueueListener when queued, otherwise None
+    """
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        if getattr(handler, "listener", None):
+            handler.listener.stop()  # Drain the previous configuration's queue first
+        handler.close()
+    root.setLevel(level)
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    output = BatchingStreamHandler(stream or sys.stderr) if queued else logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JSONFormatter() if json_format else logging.Formatter(DEFAULT_FORMAT))
+    if not queued:
+        root.addHandler(output)
+        return None
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.listener = BatchingQueueListener(records, output, respect_handler_level=True)
+    handler.listener.start()
+    root.addHandler(handler)
+    atexit.register(handler.listener.stop)  # Write out whatever is still queued
+    return handler.listener
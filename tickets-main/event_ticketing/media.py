@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Thumbnails are optional; pages fall back to the original image
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+CHUNK_SIZE = 256 * 1024
+
+
+def make_thumbnail(source: str, target: str, size: Tuple[int, int]) -> str:
+    """Write a JPEG no larger than `size` for `source`; runs in a worker process."""
+    with Image.open(source) as image:
+        image.thumbnail(size)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        temp_path = f"{target}.{os.getpid()}.tmp"
+        image.save(temp_path, format="JPEG", quality=85, optimize=True)
+    os.replace(temp_path, target)
+    return target
+
+
+def run_thumbnail_process(source: str, target: str, size: Tuple[int, int], timeout: float = 60.0) -> str:
+    """
+    Run make_thumbnail() in a fresh interpreter that only imports this module.
+    Forking the threaded server could copy a lock some other thread holds, and
+    multiprocessing's spawn and forkserver workers would import the main module
+    (app.py when run as a script) and start a second app in every worker.
+    """
+    width, height = size
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), source, target, str(width), str(height)],
+                            capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"Thumbnail process exited with status {result.returncode}")
+    return target
+
+
+class ImageStore:
+    """
+    Uploaded images stored by content: the file name is the SHA-256 of the
+    bytes, so uploading the same image twice keeps one copy and names never
+    collide. Uploads are copied to disk in chunks on a worker thread, hashing
+    as they go. Thumbnails are made by up to `workers` worker processes when an
+    image is stored, or when one without a thumbnail is first shown; a failed
+    or missing image is tried again after `retry_after` seconds.
+    """
+
+    def __init__(self, root: str = "static/images", thumbnail_size: Tuple[int, int] = (400, 300),
+                 max_bytes: int = 10 * 1024 * 1024, workers: int = 2, on_thumbnail: Optional[Callable[[str], None]] = None,
+                 retry_after: float = 300.0):
+        self.__root = root
+        self.__thumbnail_dir = os.path.join(root, "thumbnails")
+        self.__thumbnail_size = thumbnail_size
+        self.__max_bytes = max_bytes
+        self.__workers = workers
+        self.__on_thumbnail = on_thumbnail
+        self.__retry_after = retry_after
+        self.__pool: Optional[ThreadPoolExecutor] = None
+        self.__thumbnails: Dict[str, bool] = {}  # image URL -> thumbnail ready (False while pending)
+        self.__failures: Dict[str, float] = {}  # image URL -> monotonic time its thumbnail failed or the image was missing
+        self.__lock = threading.Lock()
+        os.makedirs(self.__thumbnail_dir, exist_ok=True)
+
+    # Getter for root
+    @property
+    def root(self):
+        return self.__root
+
+    def __store(self, source: BinaryIO, extension: str) -> str:
+        digest = hashlib.sha256()
+        size = 0
+        descriptor, temp_path = tempfile.mkstemp(dir=self.__root, suffix=".upload")
+        try:
+            with os.fdopen(descriptor, "wb") as target:
+                while chunk := source.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.__max_bytes:
+                        raise ValueError(f"Image is larger than {self.__max_bytes} bytes")
+                    digest.update(chunk)
+                    target.write(chunk)
+            name = digest.hexdigest()
+            directory = os.path.join(self.__root, name[:2])
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, name + extension)
+            if os.path.exists(path):
+                os.remove(temp_path)  # Same bytes already stored
+            else:
+                os.replace(temp_path, path)
+            return path
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    async def save_upload(self, upload) -> str:
+        """
+        Store an uploaded image file and start making its thumbnail.
+        :param upload: Uploaded file with `filename` and a readable `file`
+        :return: Image URL (path under the static root)
+        """
+        extension = os.path.splitext(upload.filename or "")[1].lower()
+        if extension not in IMAGE_EXTENSIONS:
+            raise ValueError(f"Unsupported image type '{extension}'")
+        image_url = await asyncio.to_thread(self.__store, upload.file, extension)
+        self.__schedule_thumbnail(image_url)
+        return image_url
+
+    def __thumbnail_path(self, image_url: str) -> str:
+        name = os.path.splitext(os.path.basename(image_url))[0]
+        width, height = self.__thumbnail_size
+        return os.path.join(self.__thumbnail_dir, f"{name}-{width}x{height}.jpg")
+
+    def __schedule_thumbnail(self, image_url: str):
+        with self.__lock:
+            if Image is None or image_url in self.__thumbnails:
+                return
+            self.__failures.pop(image_url, None)
+            self.__thumbnails[image_url] = False
+            if self.__pool is None:
+                # Threads only wait here; each thumbnail is made in its own process
+                self.__pool = ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix="thumbnail")
+            future = self.__pool.submit(run_thumbnail_process, image_url, self.__thumbnail_path(image_url), self.__thumbnail_size)
+        future.add_done_callback(lambda done: self.__thumbnail_done(image_url, done))
+
+    def __thumbnail_done(self, image_url: str, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        with self.__lock:
+            if error:
+                # Forget it, so the image is tried again once retry_after has passed
+                del self.__thumbnails[image_url]
+                self.__failures[image_url] = time.monotonic()
+            else:
+                self.__thumbnails[image_url] = True
+        if error:
+            logger.warning("Thumbnail for %s failed: %s", image_url, error)
+        elif self.__on_thumbnail:
+            self.__on_thumbnail(image_url)
+
+    def thumbnail_url(self, image_url: str) -> str:
+        """The thumbnail's URL once it exists, otherwise the original's; external URLs pass through."""
+        if "://" in image_url:
+            return image_url
+        with self.__lock:
+            ready = self.__thumbnails.get(image_url)
+            failed_at = self.__failures.get(image_url)
+        if ready is None and (failed_at is None or time.monotonic() - failed_at >= self.__retry_after):
+            # First sight of an image stored before thumbnails existed (or by another worker), or a retry
+            if os.path.exists(self.__thumbnail_path(image_url)):
+                ready = True
+                with self.__lock:
+                    self.__thumbnails[image_url] = True
+                    self.__failures.pop(image_url, None)
+            elif os.path.isfile(image_url):
+                self.__schedule_thumbnail(image_url)
+            else:
+                with self.__lock:
+                    self.__failures[image_url] = time.monotonic()
+        return self.__thumbnail_path(image_url) if ready else image_url
+
+    def close(self):
+        if self.__pool:
+            self.__pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    # Thumbnail worker: python media.py SOURCE TARGET WIDTH HEIGHT
+    make_thumbnail(sys.argv[1], sys.argv[2], (int(sys.argv[3]), int(sys.argv[4])))
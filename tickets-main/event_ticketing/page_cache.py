@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from starlette.requests import Request
+
+# Response headers that belong to one client and must not be replayed to others
+PRIVATE_HEADERS = (b"set-cookie", b"content-length", b"etag", b"cache-control")
+
+
+class CachedPage:
+    """A rendered response, with the scope versions it was rendered under and a strong ETag."""
+
+    def __init__(self, status: int, headers: List[tuple], body: bytes, versions: tuple):
+        self.__status = status
+        self.__headers = headers
+        self.__body = body
+        self.__versions = versions
+        self.__created_at = time.monotonic()
+        self.__etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    # Getter for status
+    @property
+    def status(self):
+        return self.__status
+
+    # Getter for headers
+    @property
+    def headers(self):
+        return self.__headers
+
+    # Getter for body
+    @property
+    def body(self):
+        return self.__body
+
+    # Getter for versions
+    @property
+    def versions(self):
+        return self.__versions
+
+    # Getter for created_at
+    @property
+    def created_at(self):
+        return self.__created_at
+
+    # Getter for etag
+    @property
+    def etag(self):
+        return self.__etag
+
+
+class PageCache:
+    """
+    Rendered pages keyed by route and parameters. Every page depends on one or
+    more scopes such as "events" or "event:3"; invalidating a scope bumps its
+    version, which turns every page rendered under the old version into a miss
+    without having to find them. Concurrent misses for one key share a single
+    render. With a `ttl`, pages also expire after that many seconds, bounding
+    staleness for changes this process is never told about.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+        self.__pages: OrderedDict = OrderedDict()  # key -> CachedPage, least recently used first
+        self.__versions: Dict[str, int] = {}
+        self.__in_flight: Dict[str, asyncio.Future] = {}  # Only touched from the event loop
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__collapsed = 0
+
+    def invalidate(self, *scopes: str):
+        """Make every page that depends on any of `scopes` stale; safe from any thread."""
+        with self.__lock:
+            for scope in scopes:
+                self.__versions[scope] = self.__versions.get(scope, 0) + 1
+
+    def __current_versions(self, scopes: Iterable[str]) -> tuple:
+        return tuple(self.__versions.get(scope, 0) for scope in scopes)
+
+    def lookup(self, key: str, scopes: Tuple[str, ...]) -> Optional[CachedPage]:
+        with self.__lock:
+            page = self.__pages.get(key)
+            if page is None:
+                return None
+            expired = self.__ttl is not None and time.monotonic() - page.created_at > self.__ttl
+            if expired or page.versions != self.__current_versions(scopes):
+                del self.__pages[key]
+                return None
+            self.__pages.move_to_end(key)
+            self.__hits += 1
+            return page
+
+    def store(self, key: str, page: CachedPage):
+        with self.__lock:
+            self.__pages[key] = page
+            self.__pages.move_to_end(key)
+            while len(self.__pages) > self.__max_entries:
+                self.__pages.popitem(last=False)
+
+    async def get(self, key: str, scopes: Tuple[str, ...], render: Callable[[], Awaitable[tuple]]) -> CachedPage:
+        """
+        Return the cached page for `key`, rendering it on a miss.
+        :param key: Cache key (route and parameters)
+        :param scopes: Invalidation scopes the page depends on
+        :param render: Coroutine function returning (status, headers, body)
+        :return: CachedPage; only 200 responses are kept
+        """
+        page = self.lookup(key, scopes)
+        if page:
+            return page
+        flight = self.__in_flight.get(key)
+        if flight:
+            self.__collapsed += 1
+            page = await asyncio.shield(flight)
+            if page:
+                return page
+            return await self.get(key, scopes, render)  # The shared render failed; try our own
+        flight = asyncio.get_running_loop().create_future()
+        self.__in_flight[key] = flight
+        page = None
+        try:
+            with self.__lock:
+                self.__misses += 1
+                # Read before rendering: an invalidation during the render leaves the page stale
+                versions = self.__current_versions(scopes)
+            status, headers, body = await render()
+            page = CachedPage(status, headers, body, versions)
+            if status == 200:
+                self.store(key, page)
+            return page
+        finally:
+            del self.__in_flight[key]
+            flight.set_result(page)
+
+    def get_metrics(self) -> dict:
+        with self.__lock:
+            return {"entries": len(self.__pages), "hits": self.__hits, "misses": self.__misses, "collapsed": self.__collapsed}
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class PageCacheMiddleware:
+    """
+    ASGI middleware serving GET pages through a PageCache. `routes` pairs path
+    patterns with a function of (request, match) that returns the cache key
+    and invalidation scopes, or None to bypass the cache. Responses carry a
+    strong ETag and are revalidated by clients: a matching If-None-Match gets
+    304 Not Modified with no body.
+    """
+
+    def __init__(self, app, cache: PageCache, routes: List[Tuple[Pattern, Callable[[Request, re.Match], Optional[tuple]]]]):
+        self.__app = app
+        self.__cache = cache
+        self.__routes = routes
+
+    async def __call__(self, scope, receive, send):
+        target = self.__route(scope) if scope["type"] == "http" and scope["method"] in ("GET", "HEAD") else None
+        if target is None:
+            await self.__app(scope, receive, send)
+            return
+        key, scopes = target
+        page = await self.__cache.get(key, scopes, lambda: self.__render(scope, receive))
+        await self.__send(page, scope, send)
+
+    def __route(self, scope) -> Optional[tuple]:
+        for pattern, describe in self.__routes:
+            match = pattern.fullmatch(scope["path"])
+            if match:
+                return describe(Request(scope), match)
+        return None
+
+    async def __render(self, scope, receive) -> tuple:
+        status, headers, chunks = 500, [], []
+
+        async def capture(message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [(name, value) for name, value in message.get("headers", []) if name.lower() not in PRIVATE_HEADERS]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        # HEAD requests share the GET page and drop the body on the way out
+        await self.__app({**scope, "method": "GET"}, receive, capture)
+        return status, headers, b"".join(chunks)
+
+    @staticmethod
+    async def __send(page: CachedPage, scope, send):
+        headers = list(page.headers)
+        if page.status == 200:
+            validators = [(b"etag", page.etag.encode()), (b"cache-control", b"no-cache")]
+            if_none_match = Request(scope).headers.get("if-none-match")
+            if if_none_match and etag_matches(if_none_match, page.etag):
+                await send({"type": "http.response.start", "status": 304, "headers": validators})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            headers += validators
+        body = b"" if scope["method"] == "HEAD" else page.body
+        headers.append((b"content-length", str(len(page.body)).encode()))
+        await send({"type": "http.response.start", "status": page.status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,161 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# Encoded hashes carry their algorithm and parameters:
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+# Bare 64-character hex strings are legacy unsalted SHA-256 hashes.
+SCRYPT = "scrypt"
+PBKDF2 = "pbkdf2_sha256"
+
+
+def b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def is_legacy_hash(encoded: str) -> bool:
+    return "$" not in encoded
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    """Check a password against any supported encoded hash."""
+    if is_legacy_hash(encoded):
+        # app.py used to pre-hash passwords with SHA-256 before the model hashed
+        # them again, so legacy hashes are sha256(password) or sha256(sha256(password))
+        digest = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(digest, encoded) or hmac.compare_digest(hashlib.sha256(digest.encode()).hexdigest(), encoded)
+    algorithm, *fields = encoded.split("$")
+    if algorithm == SCRYPT:
+        n, r, p, salt, expected = fields
+        expected = b64decode(expected)
+        actual = hashlib.scrypt(password.encode(), salt=b64decode(salt), n=int(n), r=int(r), p=int(p), maxmem=256 * int(n) * int(r), dklen=len(expected))
+    elif algorithm == PBKDF2:
+        iterations, salt, expected = fields
+        expected = b64decode(expected)
+        actual = hashlib.pbkdf2_hmac("sha256", password.encode(), b64decode(salt), int(iterations), dklen=len(expected))
+    else:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+class PasswordHasher:
+    """Salted KDF with tunable cost: scrypt (memory-hard) or PBKDF2-HMAC-SHA256 (iterated)."""
+
+    def __init__(self, algorithm: str = SCRYPT, scrypt_n: int = 2 ** 14, scrypt_r: int = 8, scrypt_p: int = 1, pbkdf2_iterations: int = 600_000):
+        if algorithm not in (SCRYPT, PBKDF2):
+            raise ValueError(f"Unsupported password hashing algorithm '{algorithm}'")
+        self.__algorithm = algorithm
+        self.__scrypt_params = (scrypt_n, scrypt_r, scrypt_p)
+        self.__pbkdf2_iterations = pbkdf2_iterations
+
+    # Getter for algorithm
+    @property
+    def algorithm(self):
+        return self.__algorithm
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        if self.__algorithm == SCRYPT:
+            n, r, p = self.__scrypt_params
+            digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=32)
+            return f"{SCRYPT}${n}${r}${p}${b64encode(salt)}${b64encode(digest)}"
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, self.__pbkdf2_iterations, dklen=32)
+        return f"{PBKDF2}${self.__pbkdf2_iterations}${b64encode(salt)}${b64encode(digest)}"
+
+    def needs_rehash(self, encoded: str) -> bool:
+        """True for legacy hashes and hashes made with another algorithm or cost."""
+        if is_legacy_hash(encoded):
+            return True
+        algorithm, *fields = encoded.split("$")
+        if algorithm != self.__algorithm:
+            return True
+        if algorithm == SCRYPT:
+            return tuple(int(value) for value in fields[:3]) != self.__scrypt_params
+        return int(fields[0]) != self.__pbkdf2_iterations
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many hashing jobs are already queued."""
+
+
+class HashingPool:
+    """
+    Runs password hashing off the event loop in a small thread pool. At most
+    `max_workers` hashes run at once and at most `max_pending` may wait; more
+    are rejected with PasswordHashingBusy instead of piling up during a login storm.
+    """
+
+    def __init__(self, hasher: PasswordHasher, max_workers: int = 2, max_pending: int = 64, window: int = 1024):
+        self.__hasher = hasher
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self.__slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self.__lock = threading.Lock()
+        self.__completed = 0
+        self.__rejected = 0
+        self.__in_flight = 0
+        # Recent (queue wait, hashing time) pairs for percentiles
+        self.__latencies: deque = deque(maxlen=window)
+
+    # Getter for hasher
+    @property
+    def hasher(self):
+        return self.__hasher
+
+    async def __run(self, function, *args):
+        if not self.__slots.acquire(blocking=False):
+            with self.__lock:
+                self.__rejected += 1
+            raise PasswordHashingBusy("Too many password hashing jobs queued")
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            result = function(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        with self.__lock:
+            self.__in_flight += 1
+        try:
+            result, waited, hashed = await asyncio.get_running_loop().run_in_executor(self.__executor, timed)
+        finally:
+            self.__slots.release()
+            with self.__lock:
+                self.__in_flight -= 1
+        with self.__lock:
+            self.__completed += 1
+            self.__latencies.append((waited, hashed))
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self.__run(self.__hasher.hash, password)
+
+    async def verify(self, password: str, encoded: str) -> bool:
+        return await self.__run(verify_password, password, encoded)
+
+    def get_metrics(self) -> dict:
+        """Counters plus p50/p99 queue wait and hashing time (seconds) over recent jobs."""
+        with self.__lock:
+            waits = sorted(waited for waited, _ in self.__latencies)
+            hashes = sorted(hashed for _, hashed in self.__latencies)
+            metrics = {"completed": self.__completed, "rejected": self.__rejected, "in_flight": self.__in_flight}
+
+        def percentile(values, fraction: float) -> Optional[float]:
+            return values[min(len(values) - 1, int(fraction * len(values)))] if values else None
+
+        metrics.update(
+            wait_p50=percentile(waits, 0.50), wait_p99=percentile(waits, 0.99),
+            hash_p50=percentile(hashes, 0.50), hash_p99=percentile(hashes, 0.99)
+        )
+        return metrics
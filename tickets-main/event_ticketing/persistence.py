@@ -0,0 +1,544 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from controller import Controller, User, Event, Hall, Zone, Ticket, TicketList, Order, Payment, RefundRequest, Hold, OrderStatus, RefundStatus
+from snapshot import read_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Classes whose static ID counters are saved and restored
+COUNTERS = {
+    "User": (User, "user_counter"),
+    "Event": (Event, "event_counter"),
+    "Hall": (Hall, "hall_counter"),
+    "Zone": (Zone, "zone_counter"),
+    "Ticket": (Ticket, "ticket_counter"),
+    "Order": (Order, "order_counter"),
+    "Payment": (Payment, "payment_counter"),
+    "RefundRequest": (RefundRequest, "refund_counter"),
+    "Hold": (Hold, "hold_counter"),
+}
+
+SNAPSHOT_VERSION = 1
+
+
+class WriteAheadLog:
+    """
+    Append-only journal of Controller mutations, one compact JSON record per line.
+    Appends only buffer the record; a flusher thread writes whatever has piled
+    up and fsyncs once per batch (group commit). With `sync_commit`, callers
+    wait in wait_durable() until their record's batch is on disk.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.002, sync_commit: bool = True, next_lsn: int = 1):
+        self.__path = path
+        self.__flush_interval = flush_interval
+        self.__sync_commit = sync_commit
+        self.__file = open(path, "ab")
+        self.__pending: List[bytes] = []
+        self.__last_lsn = next_lsn - 1
+        self.__durable_lsn = self.__last_lsn
+        self.__fsync_count = 0
+        self.__closed = False
+        self.__condition = threading.Condition()
+        self.__io_lock = threading.Lock()
+        self.__flusher = threading.Thread(target=self.__run, name="wal-flusher", daemon=True)
+        self.__flusher.start()
+
+    # Getter for path
+    @property
+    def path(self):
+        return self.__path
+
+    # Getter for last_lsn
+    @property
+    def last_lsn(self):
+        return self.__last_lsn
+
+    # Getter for durable_lsn
+    @property
+    def durable_lsn(self):
+        return self.__durable_lsn
+
+    # Getter for fsync_count
+    @property
+    def fsync_count(self):
+        return self.__fsync_count
+
+    def append(self, record: dict) -> int:
+        """Buffer a record and return its log sequence number."""
+        with self.__condition:
+            self.__last_lsn += 1
+            line = json.dumps({"lsn": self.__last_lsn, **record}, separators=(",", ":"))
+            self.__pending.append(line.encode() + b"\n")
+            self.__condition.notify_all()
+            return self.__last_lsn
+
+    def wait_durable(self, lsn: int):
+        if not self.__sync_commit:
+            return
+        with self.__condition:
+            while self.__durable_lsn < lsn and not self.__closed:
+                self.__condition.wait()
+
+    def flush(self):
+        """Write and fsync everything appended so far."""
+        with self.__io_lock:
+            self.__write_pending()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__pending and not self.__closed:
+                    self.__condition.wait()
+                if self.__closed:
+                    return
+            # Give concurrent writers a moment to join this batch
+            time.sleep(self.__flush_interval)
+            self.flush()
+
+    def __write_pending(self):
+        """Write the pending batch; the caller holds the IO lock."""
+        with self.__condition:
+            batch, self.__pending = self.__pending, []
+            batch_lsn = self.__last_lsn
+        if batch:
+            self.__file.write(b"".join(batch))
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+            self.__fsync_count += 1
+        with self.__condition:
+            self.__durable_lsn = max(self.__durable_lsn, batch_lsn)
+            self.__condition.notify_all()
+
+    def compact(self, through_lsn: int):
+        """Drop records up to `through_lsn`, once a snapshot covers them."""
+        with self.__io_lock:
+            self.__write_pending()
+            kept = [record for record in self.read(self.__path) if record["lsn"] > through_lsn]
+            temp_path = self.__path + ".tmp"
+            with open(temp_path, "wb") as temp_file:
+                for record in kept:
+                    temp_file.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            self.__file.close()
+            os.replace(temp_path, self.__path)
+            self.__file = open(self.__path, "ab")
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+        self.__flusher.join()
+        self.flush()
+        self.__file.close()
+
+    @staticmethod
+    def read(path: str) -> Iterator[dict]:
+        """Yield the records in a log file, stopping at a torn final write."""
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as log_file:
+            for line in log_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning("Ignoring incomplete record at the end of %s.", path)
+                    return
+
+
+@contextmanager
+def quiet_logging():
+    """Silence INFO records while replaying, which would otherwise log every ticket again."""
+    previous_level = logging.root.manager.disable
+    logging.disable(max(previous_level, logging.INFO))
+    try:
+        yield
+    finally:
+        logging.disable(previous_level)
+
+
+def force_next_id(cls, counter: str, next_id: int):
+    """Make the next object created from `cls` get `next_id`."""
+    setattr(cls, counter, next_id - 1)
+
+
+def ticket_ids(tickets) -> list:
+    """IDs of a ticket list, without resolving the views of a restored TicketList."""
+    return tickets.ids if isinstance(tickets, TicketList) else [ticket.id for ticket in tickets]
+
+
+def dump_controller(controller: Controller) -> dict:
+    """Capture the Controller for snapshot.write_snapshot(); call inside controller.freeze()."""
+    halls = {hall.id: hall for hall in controller.get_halls()}
+    registered_halls = set(halls)
+    for event in controller.get_events():
+        halls.setdefault(event.hall.id, event.hall)
+
+    events = []
+    for event in controller.get_events():
+        zones = []
+        for zone in event.zones.values():
+            statuses, buyer_ids, counts = zone.export_inventory()
+            zones.append({
+                "id": zone.id, "type": zone.type, "price": zone.price, "capacity": zone.capacity, "first_ticket_id": zone.first_ticket_id,
+                "statuses": statuses, "buyer_ids": buyer_ids, "counts": counts
+            })
+        events.append({
+            "id": event.id, "name": event.name, "date": event.date.isoformat(), "organizer_id": event.organizer.id, "hall_id": event.hall.id,
+            "description": event.description, "image_url": event.image_url, "zones": zones
+        })
+
+    return {
+        "version": SNAPSHOT_VERSION,
+        "counters": {name: getattr(cls, counter) for name, (cls, counter) in COUNTERS.items()},
+        "users": [
+            {"id": user.id, "name": user.name, "email": user.email, "password_hash": user.password_hash, "roles": user.roles}
+            for user in controller.get_users()
+        ],
+        "halls": [
+            {"id": hall.id, "size": hall.size, "capacity": hall.capacity, "registered": hall.id in registered_halls}
+            for hall in halls.values()
+        ],
+        "events": events,
+        "orders": [
+            {"id": order.id, "buyer_id": order.buyer.id, "status": order.status.name, "ticket_ids": ticket_ids(order.tickets)}
+            for order in controller.get_orders()
+        ],
+        "user_tickets": {
+            str(user.id): ticket_ids(controller.get_user_tickets(user.id)) for user in controller.get_users()
+        },
+        "refund_requests": [
+            {"id": request.id, "ticket_id": request.ticket.id, "buyer_id": request.buyer.id, "status": request.status.name}
+            for request in controller.get_refund_requests()
+        ],
+    }
+
+
+def restore_event(controller: Controller, record: dict, halls: Dict[int, Hall]) -> Event:
+    """
+    Recreate an event and its zones with their original IDs and ticket ID blocks.
+    Zone records from a snapshot carry their seat arrays, which the zones use in place.
+    """
+    hall = halls[record["hall_id"]]
+    force_next_id(Event, "event_counter", record["id"])
+    event = controller.create_event(
+        name=record["name"], date=datetime.fromisoformat(record["date"]), organizer=controller.get_user_by_id(record["organizer_id"]), hall=hall,
+        description=record["description"], image_url=record["image_url"], zones=[], allow_overlap=True
+    )
+    for zone_record in record["zones"]:
+        force_next_id(Zone, "zone_counter", zone_record["id"])
+        force_next_id(Ticket, "ticket_counter", zone_record["first_ticket_id"])
+        controller.add_zone_to_event(
+            event_id=event.id, zone_type=zone_record["type"], percentage=zone_record["capacity"] / hall.capacity if hall.capacity else 0,
+            price=zone_record["price"], quantity=zone_record["capacity"], user=event.organizer,
+            inventory=(zone_record["statuses"], zone_record["buyer_ids"], zone_record["counts"]) if "statuses" in zone_record else None
+        )
+    return event
+
+
+def load_snapshot(controller: Controller, snapshot: dict) -> Dict[int, Hall]:
+    """Rebuild Controller state from dump_controller() output; returns the halls by ID."""
+    if snapshot["version"] != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {snapshot['version']}")
+    for user in snapshot["users"]:
+        force_next_id(User, "user_counter", user["id"])
+        controller.create_user(name=user["name"], email=user["email"], password="", roles=user["roles"], password_hash=user["password_hash"])
+
+    halls: Dict[int, Hall] = {}
+    for record in snapshot["halls"]:
+        force_next_id(Hall, "hall_counter", record["id"])
+        halls[record["id"]] = Hall(size=record["size"], capacity=record["capacity"])
+        if record["registered"]:
+            controller.add_hall(halls[record["id"]])
+
+    for record in snapshot["events"]:
+        restore_event(controller, record, halls)
+
+    # Sold tickets stay ID lists until read, so restoring costs O(orders + users), not O(tickets)
+    for record in snapshot["orders"]:
+        force_next_id(Order, "order_counter", record["id"])
+        order = controller.create_order(buyer=controller.get_user_by_id(record["buyer_id"]))
+        order.restore_tickets(TicketList(record["ticket_ids"], controller.get_ticket_by_id))
+        order.status = OrderStatus[record["status"]]
+
+    for user_id, user_ticket_ids in snapshot["user_tickets"].items():
+        if len(user_ticket_ids):
+            controller.restore_user_tickets(controller.get_user_by_id(int(user_id)), user_ticket_ids)
+
+    for record in snapshot["refund_requests"]:
+        force_next_id(RefundRequest, "refund_counter", record["id"])
+        refund_request = controller.create_refund_request(ticket_id=record["ticket_id"], buyer=controller.get_user_by_id(record["buyer_id"]))
+        refund_request.status = RefundStatus[record["status"]]
+
+    for name, (cls, counter) in COUNTERS.items():
+        setattr(cls, counter, snapshot["counters"][name])
+    return halls
+
+
+def apply_record(controller: Controller, record: dict, halls: Dict[int, Hall]):
+    """Replay one journal record against the Controller."""
+    op = record["op"]
+    if op == "create_user":
+        force_next_id(User, "user_counter", record["id"])
+        controller.create_user(name=record["name"], email=record["email"], password="", roles=record["roles"], password_hash=record["password_hash"])
+    elif op == "set_password_hash":
+        controller.get_user_by_id(record["id"]).password_hash = record["password_hash"]
+    elif op == "add_hall":
+        force_next_id(Hall, "hall_counter", record["id"])
+        halls[record["id"]] = Hall(size=record["size"], capacity=record["capacity"])
+        controller.add_hall(halls[record["id"]])
+    elif op == "create_event":
+        hall = record["hall"]
+        if hall["id"] not in halls:
+            # Events may use halls that were never registered with add_hall
+            force_next_id(Hall, "hall_counter", hall["id"])
+            halls[hall["id"]] = Hall(size=hall["size"], capacity=hall["capacity"])
+        restore_event(controller, {**record, "hall_id": hall["id"]}, halls)
+    elif op == "create_order":
+        force_next_id(Order, "order_counter", record["id"])
+        controller.create_order(buyer=controller.get_user_by_id(record["buyer_id"]))
+    elif op == "purchase":
+        controller.apply_purchase(order_id=record["order_id"], seats=record["seats"])
+    elif op == "complete_order":
+        controller.complete_order(order_id=record["order_id"])
+    elif op == "create_refund_request":
+        force_next_id(RefundRequest, "refund_counter", record["id"])
+        controller.create_refund_request(ticket_id=record["ticket_id"], buyer=controller.get_user_by_id(record["buyer_id"]))
+    elif op == "approve_refund":
+        controller.approve_refund(refund_request_id=record["id"])
+    elif op == "reject_refund":
+        controller.reject_refund(refund_request_id=record["id"])
+    else:
+        logger.error("Unknown journal record '%s' at LSN %s.", op, record['lsn'])
+
+
+class BackgroundSave:
+    """Progress of one forked snapshot, updated from the messages its child process sends."""
+
+    def __init__(self, pid: int):
+        self.__pid = pid
+        self.__started_at = time.time()
+        self.__state = "running"
+        self.__lsn = 0
+        self.__bytes_written = 0
+        self.__total_bytes = 0
+        self.__duration: Optional[float] = None
+        self.__error: Optional[str] = None
+        self.__finished = threading.Event()
+
+    # Getter for pid
+    @property
+    def pid(self):
+        return self.__pid
+
+    # Getter for started_at
+    @property
+    def started_at(self):
+        return self.__started_at
+
+    # Getter for state ("running", "succeeded" or "failed")
+    @property
+    def state(self):
+        return self.__state
+
+    # Getter for running
+    @property
+    def running(self):
+        return self.__state == "running"
+
+    # Getter for lsn (last log record covered by the snapshot)
+    @property
+    def lsn(self):
+        return self.__lsn
+
+    # Getter for bytes_written
+    @property
+    def bytes_written(self):
+        return self.__bytes_written
+
+    # Getter for progress (fraction of the file written)
+    @property
+    def progress(self):
+        return self.__bytes_written / self.__total_bytes if self.__total_bytes else 0.0
+
+    # Getter for duration (seconds; elapsed so far while running)
+    @property
+    def duration(self):
+        return self.__duration if self.__duration is not None else time.time() - self.__started_at
+
+    # Getter for error (reported by the child when it fails)
+    @property
+    def error(self):
+        return self.__error
+
+    def update(self, message: dict):
+        self.__lsn = message.get("lsn", self.__lsn)
+        self.__error = message.get("error", self.__error)
+        self.__bytes_written = message.get("written", self.__bytes_written)
+        self.__total_bytes = message.get("total", self.__total_bytes)
+        if message.get("done"):
+            self.__duration = message["duration"]
+
+    def finish(self, succeeded: bool):
+        if self.__duration is None:
+            self.__duration = time.time() - self.__started_at
+        self.__state = "succeeded" if succeeded and self.__bytes_written else "failed"
+        self.__finished.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.__finished.wait(timeout)
+
+
+class ControllerStore:
+    """
+    Durable Controller state in a data directory: a binary snapshot (see
+    snapshot.py) plus a write-ahead log of the mutations made since that snapshot.
+    """
+
+    def __init__(self, data_dir: str, flush_interval: float = 0.002, sync_commit: bool = True):
+        self.__data_dir = data_dir
+        self.__snapshot_path = os.path.join(data_dir, "controller.snapshot")
+        self.__wal_path = os.path.join(data_dir, "controller.wal")
+        self.__flush_interval = flush_interval
+        self.__sync_commit = sync_commit
+        self.__journal: Optional[WriteAheadLog] = None
+        self.__restored = False
+        self.__snapshot_lsn = 0
+        self.__background_save: Optional[BackgroundSave] = None
+        self.__background_lock = threading.Lock()
+
+    # Getter for journal
+    @property
+    def journal(self):
+        return self.__journal
+
+    # Getter for restored (True when open() found existing state)
+    @property
+    def restored(self):
+        return self.__restored
+
+    # Getter for background_save (the latest BGSAVE, if any)
+    @property
+    def background_save(self):
+        return self.__background_save
+
+    def open(self) -> Controller:
+        """Rebuild a Controller from the snapshot and log, then journal its new mutations."""
+        os.makedirs(self.__data_dir, exist_ok=True)
+        controller = Controller()
+        snapshot_lsn = 0
+        last_lsn = 0
+        halls: Dict[int, Hall] = {}
+        started = time.perf_counter()
+        with quiet_logging():
+            if os.path.exists(self.__snapshot_path):
+                snapshot = read_snapshot(self.__snapshot_path)
+                halls = load_snapshot(controller, snapshot)
+                snapshot_lsn = last_lsn = snapshot["lsn"]
+                self.__restored = True
+            replayed = 0
+            for record in WriteAheadLog.read(self.__wal_path):
+                last_lsn = max(last_lsn, record["lsn"])
+                if record["lsn"] > snapshot_lsn:
+                    apply_record(controller, record, halls)
+                    replayed += 1
+            self.__restored = self.__restored or replayed > 0
+        logger.info("Controller restored from %s (%s log records replayed) in %.3fs.", self.__data_dir, replayed, time.perf_counter() - started)
+
+        self.__snapshot_lsn = snapshot_lsn
+        self.__journal = WriteAheadLog(self.__wal_path, flush_interval=self.__flush_interval, sync_commit=self.__sync_commit, next_lsn=last_lsn + 1)
+        controller.attach_journal(self.__journal)
+        return controller
+
+    def checkpoint(self, controller: Controller) -> int:
+        """
+        Write a snapshot of the Controller and drop the log records it covers; returns bytes written.
+        Mutations only pause while the state is copied; the file is written afterwards.
+        """
+        with self.__background_lock:
+            # An older background snapshot must not replace this one afterwards
+            if self.__background_save:
+                self.__background_save.wait()
+            with controller.freeze():
+                snapshot = dump_controller(controller)
+                snapshot["lsn"] = self.__journal.last_lsn
+            size = write_snapshot(self.__snapshot_path, snapshot)
+            self.__journal.compact(snapshot["lsn"])
+            self.__snapshot_lsn = snapshot["lsn"]
+        logger.info("Checkpoint written at LSN %s (%s bytes).", snapshot['lsn'], size)
+        return size
+
+    def background_checkpoint(self, controller: Controller) -> Optional[BackgroundSave]:
+        """
+        Snapshot the Controller from a forked child (BGSAVE) while this process keeps serving.
+        Mutations only pause for the fork itself; the child serializes its
+        copy-on-write view and reports progress through a pipe. Once the child
+        succeeds, the log records its snapshot covers are dropped.
+        :return: The new BackgroundSave, or None if one is already running
+        """
+        with self.__background_lock:
+            if self.__background_save and self.__background_save.running:
+                logger.warning("Background save already in progress.")
+                return None
+            read_fd, write_fd = os.pipe()
+
+            def child() -> int:
+                # Runs in the forked child: errors go through the pipe, never to the log (see Controller.fork)
+                os.close(read_fd)
+                started = time.perf_counter()
+                with os.fdopen(write_fd, "w", buffering=1) as channel:
+                    def report(**fields):
+                        channel.write(json.dumps(fields) + "\n")
+                    try:
+                        snapshot = dump_controller(controller)
+                        snapshot["lsn"] = self.__journal.last_lsn
+                        report(lsn=snapshot["lsn"])
+                        size = write_snapshot(self.__snapshot_path, snapshot, progress=lambda written, total: report(written=written, total=total))
+                    except Exception as error:
+                        report(error=f"{type(error).__name__}: {error}")
+                        return 1
+                    report(done=True, written=size, duration=time.perf_counter() - started)
+                return 0
+
+            pid = controller.fork(child)
+            os.close(write_fd)
+            self.__background_save = save = BackgroundSave(pid)
+        logger.info("Background save started in process %s.", pid)
+        threading.Thread(target=self.__monitor, args=(save, read_fd), name="bgsave-monitor", daemon=True).start()
+        return save
+
+    def __monitor(self, save: BackgroundSave, read_fd: int):
+        with os.fdopen(read_fd) as channel:
+            for line in channel:
+                save.update(json.loads(line))
+        _, status = os.waitpid(save.pid, 0)
+        save.finish(os.waitstatus_to_exitcode(status) == 0)
+        if save.state != "succeeded":
+            logger.error("Background save in process %s failed: %s", save.pid, save.error or f"exit status {os.waitstatus_to_exitcode(status)}")
+            return
+        self.__journal.compact(save.lsn)
+        self.__snapshot_lsn = max(self.__snapshot_lsn, save.lsn)
+        logger.info("Background save written at LSN %s (%s bytes in %.3fs).", save.lsn, save.bytes_written, save.duration)
+
+    def start_background_saves(self, controller: Controller, interval: float) -> threading.Thread:
+        """Run background_checkpoint() every `interval` seconds when the log has grown."""
+        def run():
+            while True:
+                time.sleep(interval)
+                if self.__journal.last_lsn > self.__snapshot_lsn:
+                    self.background_checkpoint(controller)
+        saver = threading.Thread(target=run, name="bgsave-scheduler", daemon=True)
+        saver.start()
+        return saver
+
+    def close(self):
+        if self.__journal:
+            self.__journal.close()
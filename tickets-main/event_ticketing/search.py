@@ -0,0 +1,140 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional
+
+TOKEN = re.compile(r"\w+")
+NAME_WEIGHT = 3.0  # A term in the event name counts this many times a term in the description
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.lower())
+
+
+class EventSearchIndex:
+    """
+    In-memory search over event names and descriptions.
+    An inverted index maps each term to the events containing it with a
+    weighted term frequency; a sorted vocabulary answers prefix lookups, so the
+    last query word also matches words it starts (search as you type).
+    Every query word must match. Results are ranked by TF-IDF score, then by
+    date. A sorted (date, event ID) list answers date ranges by bisection.
+    Events are added one at a time as they are created.
+    """
+
+    def __init__(self):
+        self.__postings: Dict[str, Dict[int, float]] = {}  # term -> event ID -> weighted term frequency
+        self.__terms: List[str] = []  # Sorted vocabulary
+        self.__dates: Dict[int, datetime] = {}
+        self.__date_keys: List[tuple] = []  # Sorted (date, event ID)
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__dates)
+
+    def add(self, event_id: int, name: str, description: str, date: datetime):
+        weights: Dict[str, float] = {}
+        for term in tokenize(name):
+            weights[term] = weights.get(term, 0.0) + NAME_WEIGHT
+        for term in tokenize(description):
+            weights[term] = weights.get(term, 0.0) + 1.0
+        with self.__lock:
+            for term, weight in weights.items():
+                postings = self.__postings.get(term)
+                if postings is None:
+                    postings = self.__postings[term] = {}
+                    insort(self.__terms, term)
+                postings[event_id] = weight
+            self.__dates[event_id] = date
+            insort(self.__date_keys, (date, event_id))
+
+    def __expand(self, prefix: str) -> List[str]:
+        """Every vocabulary term starting with `prefix`."""
+        position = bisect_left(self.__terms, prefix)
+        terms = []
+        while position < len(self.__terms) and self.__terms[position].startswith(prefix):
+            terms.append(self.__terms[position])
+            position += 1
+        return terms
+
+    def __weighted_postings(self, terms: List[str]) -> List[tuple]:
+        return [(self.__postings[term], math.log(1 + len(self.__dates) / len(self.__postings[term]))) for term in terms]
+
+    def __match(self, terms: List[str]) -> Dict[int, float]:
+        """Score of every event containing any of `terms`."""
+        scores: Dict[int, float] = {}
+        for postings, idf in self.__weighted_postings(terms):
+            for event_id, weight in postings.items():
+                scores[event_id] = scores.get(event_id, 0.0) + weight * idf
+        return scores
+
+    def __narrow(self, scores: Dict[int, float], terms: List[str]) -> Dict[int, float]:
+        """Keep the events of `scores` that contain any of `terms`, adding their score."""
+        weighted_postings = self.__weighted_postings(terms)
+        extras: Dict[int, float] = {}
+        if len(scores) * len(terms) <= sum(len(postings) for postings, _ in weighted_postings):
+            for event_id in scores:
+                for postings, idf in weighted_postings:
+                    weight = postings.get(event_id)
+                    if weight:
+                        extras[event_id] = extras.get(event_id, 0.0) + weight * idf
+        else:
+            # A short prefix can expand to many terms: walk their postings once instead
+            for postings, idf in weighted_postings:
+                for event_id, weight in postings.items():
+                    if event_id in scores:
+                        extras[event_id] = extras.get(event_id, 0.0) + weight * idf
+        return {event_id: scores[event_id] + extra for event_id, extra in extras.items()}
+
+    def search(self, query: str, start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = 20) -> List[int]:
+        """
+        IDs of the best matching events.
+        :param query: Words to find; the last one may be incomplete
+        :param start: Only events on or after this date
+        :param end: Only events before this date
+        :param limit: Maximum number of results
+        :return: Event IDs, best match first
+        """
+        words = tokenize(query)
+        with self.__lock:
+            low = 0 if start is None else bisect_left(self.__date_keys, (start,))
+            high = len(self.__date_keys) if end is None else bisect_left(self.__date_keys, (end,))
+            if not words:
+                # Date range only: events in date order, earliest first
+                return [event_id for _, event_id in self.__date_keys[low:min(high, low + limit)]]
+
+            word_terms = []
+            for position, word in enumerate(words):
+                terms = self.__expand(word) if position == len(words) - 1 else ([word] if word in self.__postings else [])
+                if not terms:
+                    return []
+                word_terms.append(terms)
+            # Score the rarest word's events, then only look up those in the other words' postings
+            word_terms.sort(key=lambda terms: sum(len(self.__postings[term]) for term in terms))
+            if high - low < sum(len(self.__postings[term]) for term in word_terms[0]):
+                # The date range is the smaller candidate set: start from its events
+                scores = {event_id: 0.0 for _, event_id in self.__date_keys[low:high]}
+            else:
+                scores = self.__match(word_terms.pop(0))
+                if start is not None or end is not None:
+                    dates = self.__dates
+                    scores = {
+                        event_id: score for event_id, score in scores.items()
+                        if (start is None or dates[event_id] >= start) and (end is None or dates[event_id] < end)
+                    }
+            for terms in word_terms:
+                scores = self.__narrow(scores, terms)
+            dates = self.__dates
+        return [event_id for event_id, _ in heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], dates[item[0]], item[0]))]
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Completions of `prefix`, most common first."""
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        with self.__lock:
+            terms = self.__expand(prefix)
+            return heapq.nsmallest(limit, terms, key=lambda term: (-len(self.__postings[term]), term))
@@ -0,0 +1,119 @@
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from controller import User
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    Server-side sessions with a size limit and an idle timeout.
+    Sessions are kept in least-recently-used order, so expired sessions are
+    always at the front: eviction stops at the first live one. Expired sessions
+    are dropped when looked up and by a periodic sweep; when the store is full
+    the least recently used session makes room for the new one.
+    """
+
+    def __init__(self, max_size: int = 100_000, idle_ttl: float = 1800.0):
+        self.__max_size = max_size
+        self.__idle_ttl = idle_ttl
+        self.__sessions: OrderedDict = OrderedDict()  # session ID -> (user, last seen)
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__sessions)
+
+    def create(self, user: User) -> str:
+        session_id = secrets.token_urlsafe(32)
+        with self.__lock:
+            self.__sessions[session_id] = (user, time.monotonic())
+            while len(self.__sessions) > self.__max_size:
+                self.__sessions.popitem(last=False)
+        return session_id
+
+    def get(self, session_id: Optional[str]) -> Optional[User]:
+        if not session_id:
+            return None
+        now = time.monotonic()
+        with self.__lock:
+            session = self.__sessions.get(session_id)
+            if session is None:
+                return None
+            user, last_seen = session
+            if now - last_seen > self.__idle_ttl:
+                del self.__sessions[session_id]
+                return None
+            self.__sessions[session_id] = (user, now)
+            self.__sessions.move_to_end(session_id)
+        return user
+
+    def delete(self, session_id: Optional[str]):
+        with self.__lock:
+            self.__sessions.pop(session_id, None)
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """Drop sessions idle for longer than the TTL; returns how many were dropped."""
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        with self.__lock:
+            while self.__sessions:
+                session_id, (user, last_seen) = next(iter(self.__sessions.items()))
+                if now - last_seen <= self.__idle_ttl:
+                    break
+                del self.__sessions[session_id]
+                evicted += 1
+        if evicted:
+            logger.info("Evicted %s expired sessions.", evicted)
+        return evicted
+
+    def start_sweeper(self, interval: float = 60.0) -> threading.Thread:
+        """Evict expired sessions from a daemon thread every `interval` seconds."""
+        def sweep():
+            while True:
+                time.sleep(interval)
+                self.evict_expired()
+        sweeper = threading.Thread(target=sweep, name="session-sweeper", daemon=True)
+        sweeper.start()
+        return sweeper
+
+
+class SignedCookieSessions:
+    """
+    Stateless sessions: the user ID and expiry travel in an HMAC-signed cookie
+    value, so any worker sharing the secret can check it without a lookup table.
+    Logging out only clears the cookie; a copied value stays valid until it expires.
+    """
+
+    def __init__(self, lookup_user: Callable[[int], Optional[User]], secret: Optional[bytes] = None, ttl: float = 1800.0):
+        self.__lookup_user = lookup_user
+        self.__secret = secret or os.urandom(32)
+        self.__ttl = ttl
+
+    def __signature(self, payload: str) -> str:
+        return hmac.new(self.__secret, payload.encode(), hashlib.sha256).hexdigest()
+
+    def create(self, user: User) -> str:
+        payload = f"{user.id}:{int(time.time() + self.__ttl)}"
+        return f"{payload}.{self.__signature(payload)}"
+
+    def get(self, session_id: Optional[str]) -> Optional[User]:
+        if not session_id or "." not in session_id:
+            return None
+        payload, signature = session_id.rsplit(".", 1)
+        if not hmac.compare_digest(signature, self.__signature(payload)):
+            return None
+        user_id, expires_at = payload.split(":")
+        if int(expires_at) < time.time():
+            return None
+        return self.__lookup_user(int(user_id))
+
+    def delete(self, session_id: Optional[str]):
+        """Nothing is stored server-side."""
@@ -0,0 +1,280 @@
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+from catalog import Catalog
+from controller import Zone, TicketStatus, TICKET_STATUSES, TICKET_STATUS_CODES
+
+# Allocator header in each segment: the cursor and the number of returned-seat stack entries
+ALLOCATOR_HEADER_SIZE = 16
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessLock:
+    """
+    Mutex across threads and processes: a thread lock for this process plus
+    an exclusive flock() on a lock file shared by all processes.
+    """
+
+    def __init__(self, path: str):
+        self.__path = path
+        self.__thread_lock = threading.Lock()
+        self.__file = open(path, "a+b")
+
+    # Getter for path
+    @property
+    def path(self):
+        return self.__path
+
+    def acquire(self) -> bool:
+        self.__thread_lock.acquire()
+        try:
+            fcntl.flock(self.__file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            self.__thread_lock.release()
+            raise
+        return True
+
+    def release(self):
+        fcntl.flock(self.__file.fileno(), fcntl.LOCK_UN)
+        self.__thread_lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class ZoneSegment(SharedMemory):
+    """Shared memory segment whose buffer stays exported to a zone for the life of the process."""
+
+    def close(self):
+        try:
+            super().close()
+        except BufferError:
+            pass  # The zone still uses the mapping; it goes away with the process
+
+
+@contextmanager
+def untracked():
+    """
+    Keep segments away from the resource tracker, which would unlink them
+    when the creating worker exits (SharedMemory has track=False from 3.13 on).
+    """
+    register, unregister = resource_tracker.register, resource_tracker.unregister
+    resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+    resource_tracker.unregister = lambda name, rtype: None if rtype == "shared_memory" else unregister(name, rtype)
+    try:
+        yield
+    finally:
+        resource_tracker.register, resource_tracker.unregister = register, unregister
+
+
+class SharedSeatAllocator:
+    """
+    controller.SeatAllocator state in a zone's shared segment, so that every
+    worker allocates from one cursor and sees the seats the others return.
+    Returned seats are a stack plus one "pooled" flag per seat, which keeps
+    every seat on the stack at most once. Seats taken while on the stack are
+    dropped lazily, once they reach the top.
+    """
+
+    def __init__(self, header, stack, pooled, statuses):
+        self.__header = header  # [cursor, stack size]
+        self.__stack = stack
+        self.__pooled = pooled
+        self.__statuses = statuses
+        self.__available_code = TICKET_STATUS_CODES[TicketStatus.AVAILABLE]
+
+    # Getter for cursor
+    @property
+    def cursor(self):
+        return self.__header[0]
+
+    # Setter for cursor
+    @cursor.setter
+    def cursor(self, value: int):
+        self.__header[0] = value
+
+    def add(self, index: int):
+        if not self.__pooled[index]:
+            self.__pooled[index] = 1
+            self.__stack[self.__header[1]] = index
+            self.__header[1] += 1
+
+    def discard(self, index: int):
+        pass  # Dropped by returned_seats() once it reaches the top of the stack
+
+    def returned_seats(self, quantity: int) -> List[int]:
+        top = self.__header[1]
+        while top and self.__statuses[self.__stack[top - 1]] != self.__available_code:
+            top -= 1
+            self.__pooled[self.__stack[top]] = 0
+        self.__header[1] = top
+        seats: List[int] = []
+        while top and len(seats) < quantity:
+            top -= 1
+            if self.__statuses[self.__stack[top]] == self.__available_code:
+                seats.append(self.__stack[top])
+        return seats
+
+    def __len__(self):
+        return self.__header[1]
+
+
+class FileCatalog(Catalog):
+    """Catalog kept as a JSON-lines file next to the zone lock files, locked with flock()."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.__path = path
+        # Readable by this user only: the records carry password hashes
+        os.close(os.open(path, os.O_CREAT | os.O_APPEND | os.O_WRONLY, 0o600))
+        self.__lock = ProcessLock(f"{path}.lock")
+
+    # Getter for path
+    @property
+    def path(self):
+        return self.__path
+
+    def acquire_lock(self):
+        self.__lock.acquire()
+
+    def release_lock(self):
+        self.__lock.release()
+
+    def read_records(self, position) -> List[Tuple[dict, object]]:
+        records = []
+        with open(self.__path, "rb") as file:
+            file.seek(position)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break  # Appends happen under the lock, so this is only seen by has_new_records()
+                position += len(line)
+                records.append((json.loads(line), position))
+        return records
+
+    def append_record(self, record: dict):
+        with open(self.__path, "ab") as file:
+            file.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+            return file.tell()
+
+    def has_new_records(self) -> bool:
+        return os.path.getsize(self.__path) > self.position
+
+    def unlink(self):
+        for path in (self.__path, f"{self.__path}.lock"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class SharedInventory:
+    """
+    Zone seat state in named shared memory, so several worker processes sell
+    from the same zones. Each zone gets one segment holding its status counters,
+    buyer IDs, seat statuses and seat allocator, plus a lock file for
+    cross-process claims.
+    Segments are named by zone ID, so the workers share a FileCatalog through
+    which they create users, halls and events: it gives every zone one ID in
+    all of them. The worker creating a zone creates its segment; the others
+    attach to it when they apply the catalog record.
+    Segments outlive the processes using them; call unlink() to remove them.
+    """
+
+    def __init__(self, name: str, lock_dir: Optional[str] = None):
+        self.__name = name
+        self.__lock_dir = lock_dir or os.path.join(tempfile.gettempdir(), f"{name}-locks")
+        os.makedirs(self.__lock_dir, mode=0o700, exist_ok=True)
+        self.__segments: Dict[int, SharedMemory] = {}
+        self.__catalog = FileCatalog(os.path.join(self.__lock_dir, "catalog.jsonl"))
+
+    # Getter for name
+    @property
+    def name(self):
+        return self.__name
+
+    # Getter for catalog
+    @property
+    def catalog(self):
+        return self.__catalog
+
+    def attach(self, zone: Zone):
+        """
+        Move the zone's seat state into its shared segment: a new one for a zone
+        created here, the creator's one for a zone replayed from the catalog.
+        """
+        # int64 status counts, buyer IDs, allocator header and returned-seat stack, then status bytes and pooled flags
+        counts_size = 8 * len(TICKET_STATUSES)
+        buyer_ids_end = counts_size + 8 * zone.capacity
+        stack_start = buyer_ids_end + ALLOCATOR_HEADER_SIZE
+        statuses_start = stack_start + 8 * zone.capacity
+        pooled_start = statuses_start + zone.capacity
+        size = pooled_start + zone.capacity
+        lock = ProcessLock(os.path.join(self.__lock_dir, f"zone-{zone.id}.lock"))
+        with lock:
+            name = f"{self.__name}-zone-{zone.id}"
+            if not self.__catalog.replaying:
+                self.__remove_segment(name)  # Left over from an earlier run with the same name
+            segment, created = self.__open_segment(name, size)
+            if segment.size < size:
+                raise ValueError(f"Shared segment for zone {zone.id} is smaller than its {zone.capacity} seats")
+            buffer = segment.buf
+            status_counts = buffer[:counts_size].cast('q')
+            if created:
+                # New segments are zero-filled: every seat is available with no buyer
+                status_counts[TICKET_STATUS_CODES[TicketStatus.AVAILABLE]] = zone.capacity
+            statuses = buffer[statuses_start:pooled_start]
+            zone.share_inventory(
+                statuses=statuses,
+                buyer_ids=buffer[counts_size:buyer_ids_end],
+                status_counts=status_counts,
+                lock=lock,
+                allocator=SharedSeatAllocator(
+                    header=buffer[buyer_ids_end:stack_start].cast('q'),
+                    stack=buffer[stack_start:statuses_start].cast('q'),
+                    pooled=buffer[pooled_start:size],
+                    statuses=statuses
+                )
+            )
+        self.__segments[zone.id] = segment
+        logger.info("Zone %s %s shared inventory '%s'.", zone.id, 'created in' if created else 'attached to', self.__name)
+
+    @staticmethod
+    def __remove_segment(name: str):
+        with untracked():
+            try:
+                stale = ZoneSegment(name=name)
+            except FileNotFoundError:
+                return
+            stale.close()
+            stale.unlink()
+        logger.warning("Removed stale shared segment '%s'.", name)
+
+    @staticmethod
+    def __open_segment(name: str, size: int) -> tuple:
+        # Workers come and go independently, so no single one may unlink a segment at exit
+        with untracked():
+            try:
+                return ZoneSegment(name=name, create=True, size=size), True
+            except FileExistsError:
+                return ZoneSegment(name=name), False
+
+    def unlink(self):
+        """Remove this process's segments, lock files and the catalog once no worker uses them any more."""
+        for zone_id, segment in self.__segments.items():
+            with untracked():
+                segment.unlink()
+            lock_path = os.path.join(self.__lock_dir, f"zone-{zone_id}.lock")
+            if os.path.exists(lock_path):
+                os.remove(lock_path)
+        self.__segments.clear()
+        self.__catalog.unlink()
@@ -0,0 +1,135 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from typing import Callable, List, Optional
+
+from controller import TICKET_STATUSES
+
+# File layout (little endian):
+#   header        magic, format version, zone count, ID-list count, metadata offset/length
+#   zone index    one fixed-size entry per zone: ID, capacity, array offsets and status counts
+#   metadata      JSON for users, halls, events, orders and refund requests
+#   ID lists      int64 ticket ID lists (order tickets, user tickets), each an (offset, count) pair
+#   zone arrays   per zone: seat status bytes, then int64 buyer IDs, page aligned
+# Only the header and index are parsed eagerly; the seat arrays are used in place.
+MAGIC = b"TKTSNAP\x00"
+FORMAT_VERSION = 1
+STATUS_COUNT = len(TICKET_STATUSES)  # Status counts stored per zone
+HEADER = struct.Struct("<8sIIIQQ")
+ZONE_ENTRY = struct.Struct(f"<qqQQ{STATUS_COUNT}q")
+ID_LIST = struct.Struct("<QQ")
+ALIGNMENT = mmap.PAGESIZE
+
+
+def align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(path: str, snapshot: dict, progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Write dump_controller() output as a binary snapshot; returns bytes written.
+    Zone records carry raw `statuses`/`buyer_ids` buffers and `counts`; the
+    `ticket_ids` lists of orders and `user_tickets` go to the ID-list section.
+    The file is written beside `path` and renamed into place.
+    `progress` is called with (bytes written, total bytes) as sections are written.
+    """
+    zones = [zone for event in snapshot["events"] for zone in event["zones"]]
+    id_lists: List[List[int]] = []
+
+    def id_list(ticket_ids: List[int]) -> int:
+        id_lists.append(ticket_ids)
+        return len(id_lists) - 1
+
+    metadata = dict(snapshot)
+    metadata["events"] = [
+        {**event, "zones": [{key: value for key, value in zone.items() if key not in ("statuses", "buyer_ids", "counts")} for zone in event["zones"]]}
+        for event in snapshot["events"]
+    ]
+    metadata["orders"] = [{**order, "ticket_ids": id_list(order["ticket_ids"])} for order in snapshot["orders"]]
+    metadata["user_tickets"] = {user_id: id_list(ticket_ids) for user_id, ticket_ids in snapshot["user_tickets"].items()}
+    metadata_bytes = json.dumps(metadata, separators=(",", ":")).encode()
+
+    metadata_offset = HEADER.size + ZONE_ENTRY.size * len(zones)
+    id_table_offset = align(metadata_offset + len(metadata_bytes))
+    id_data_offset = id_table_offset + ID_LIST.size * len(id_lists)
+    id_entries = []
+    offset = id_data_offset
+    for ticket_ids in id_lists:
+        id_entries.append(ID_LIST.pack(offset, len(ticket_ids)))
+        offset += 8 * len(ticket_ids)
+
+    zone_entries = []
+    zone_offsets = []
+    for zone in zones:
+        statuses_offset = align(offset)
+        buyer_ids_offset = align(statuses_offset + len(zone["statuses"]))
+        offset = buyer_ids_offset + len(zone["buyer_ids"])
+        zone_offsets.append((statuses_offset, buyer_ids_offset))
+        zone_entries.append(ZONE_ENTRY.pack(zone["id"], zone["capacity"], statuses_offset, buyer_ids_offset, *zone["counts"]))
+
+    temp_path = f"{path}.{os.getpid()}.tmp"  # Background saves run in their own process
+    with open(temp_path, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(zones), len(id_lists), metadata_offset, len(metadata_bytes)))
+        snapshot_file.write(b"".join(zone_entries))
+        snapshot_file.write(metadata_bytes)
+        snapshot_file.seek(id_table_offset)
+        snapshot_file.write(b"".join(id_entries))
+        for ticket_ids in id_lists:
+            snapshot_file.write(array('q', ticket_ids).tobytes())
+        if progress:
+            progress(snapshot_file.tell(), offset)
+        for zone, (statuses_offset, buyer_ids_offset) in zip(zones, zone_offsets):
+            snapshot_file.seek(statuses_offset)
+            snapshot_file.write(zone["statuses"])
+            snapshot_file.seek(buyer_ids_offset)
+            snapshot_file.write(zone["buyer_ids"])
+            if progress:
+                progress(snapshot_file.tell(), offset)
+        snapshot_file.truncate(offset)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temp_path, path)
+    return offset
+
+
+def read_snapshot(path: str) -> dict:
+    """
+    Map a binary snapshot and return it in dump_controller() shape.
+    The file is mapped copy-on-write: zone `statuses`/`buyer_ids` and the
+    ticket ID lists are writable memoryviews over the mapping, so pages are only
+    read when touched and changes never reach the file.
+    """
+    with open(path, "rb") as snapshot_file:
+        mapping = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_COPY)
+    view = memoryview(mapping)
+    magic, version, zone_count, id_list_count, metadata_offset, metadata_length = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a ticket snapshot")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {version}")
+
+    zones = {}
+    for position in range(zone_count):
+        zone_id, capacity, statuses_offset, buyer_ids_offset, *counts = ZONE_ENTRY.unpack_from(view, HEADER.size + position * ZONE_ENTRY.size)
+        zones[zone_id] = {
+            "statuses": view[statuses_offset:statuses_offset + capacity],
+            "buyer_ids": view[buyer_ids_offset:buyer_ids_offset + 8 * capacity].cast('q'),
+            "counts": counts,
+        }
+
+    id_table_offset = align(metadata_offset + metadata_length)
+    id_lists = []
+    for position in range(id_list_count):
+        offset, count = ID_LIST.unpack_from(view, id_table_offset + position * ID_LIST.size)
+        id_lists.append(view[offset:offset + 8 * count].cast('q'))
+
+    snapshot = json.loads(bytes(view[metadata_offset:metadata_offset + metadata_length]))
+    for event in snapshot["events"]:
+        for zone in event["zones"]:
+            zone.update(zones[zone["id"]])
+    for order in snapshot["orders"]:
+        order["ticket_ids"] = id_lists[order["ticket_ids"]]
+    snapshot["user_tickets"] = {user_id: id_lists[position] for user_id, position in snapshot["user_tickets"].items()}
+    return snapshot
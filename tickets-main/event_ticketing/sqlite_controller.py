@@ -0,0 +1,791 @@
+import asyncio
+import logging
+import queue
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from controller import TicketStatus, OrderStatus, PaymentStatus, RefundStatus, EventPage
+from passwords import PasswordHasher, HashingPool, verify_password
+from search import EventSearchIndex
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    email_normalized TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    roles TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_email ON users (email_normalized, id);
+CREATE TABLE IF NOT EXISTS halls (
+    id INTEGER PRIMARY KEY,
+    size TEXT NOT NULL,
+    capacity INTEGER NOT NULL,
+    registered INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    organizer_id INTEGER NOT NULL REFERENCES users (id),
+    hall_id INTEGER NOT NULL REFERENCES halls (id),
+    description TEXT NOT NULL,
+    image_url TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_date ON events (date, id);
+CREATE INDEX IF NOT EXISTS events_hall_date ON events (hall_id, date, id);
+CREATE TABLE IF NOT EXISTS zones (
+    id INTEGER PRIMARY KEY,
+    event_id INTEGER NOT NULL REFERENCES events (id),
+    type TEXT NOT NULL,
+    price REAL NOT NULL,
+    capacity INTEGER NOT NULL,
+    available INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS zones_event ON zones (event_id);
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY,
+    zone_id INTEGER NOT NULL REFERENCES zones (id),
+    seat INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    buyer_id INTEGER REFERENCES users (id)
+);
+CREATE INDEX IF NOT EXISTS tickets_zone_status ON tickets (zone_id, status);
+CREATE INDEX IF NOT EXISTS tickets_buyer ON tickets (buyer_id, status);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    buyer_id INTEGER NOT NULL REFERENCES users (id),
+    status TEXT NOT NULL,
+    total_price REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_tickets (
+    order_id INTEGER NOT NULL REFERENCES orders (id),
+    ticket_id INTEGER NOT NULL REFERENCES tickets (id),
+    PRIMARY KEY (order_id, ticket_id)
+);
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    order_id INTEGER NOT NULL REFERENCES orders (id),
+    amount REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refund_requests (
+    id INTEGER PRIMARY KEY,
+    ticket_id INTEGER NOT NULL REFERENCES tickets (id),
+    buyer_id INTEGER NOT NULL REFERENCES users (id),
+    status TEXT NOT NULL,
+    refund_amount REAL NOT NULL
+);
+"""
+
+# Statements are module constants so each pooled connection's statement cache reuses them
+INSERT_USER = "INSERT INTO users (name, email, email_normalized, password_hash, roles) VALUES (?, ?, ?, ?, ?)"
+SELECT_USER_BY_ID = "SELECT id, name, email, password_hash, roles FROM users WHERE id = ?"
+SELECT_USER_BY_EMAIL = "SELECT id, name, email, password_hash, roles FROM users WHERE email_normalized = ? ORDER BY id LIMIT 1"
+SELECT_USERS = "SELECT id, name, email, password_hash, roles FROM users ORDER BY id"
+UPDATE_PASSWORD_HASH = "UPDATE users SET password_hash = ? WHERE id = ?"
+INSERT_HALL = "INSERT OR IGNORE INTO halls (id, size, capacity, registered) VALUES (?, ?, ?, ?)"
+REGISTER_HALL = "UPDATE halls SET registered = 1 WHERE id = ?"
+SELECT_HALL_BY_ID = "SELECT id, size, capacity FROM halls WHERE id = ?"
+SELECT_HALLS = "SELECT id, size, capacity FROM halls WHERE registered = 1 ORDER BY id"
+INSERT_EVENT = "INSERT INTO events (name, date, organizer_id, hall_id, description, image_url) VALUES (?, ?, ?, ?, ?, ?)"
+EVENT_COLUMNS = "events.id, events.name, events.date, events.organizer_id, events.description, events.image_url, halls.id, halls.size, halls.capacity"
+SELECT_EVENT_BY_ID = f"SELECT {EVENT_COLUMNS} FROM events JOIN halls ON halls.id = events.hall_id WHERE events.id = ?"
+SELECT_EVENTS = f"SELECT {EVENT_COLUMNS} FROM events JOIN halls ON halls.id = events.hall_id ORDER BY events.id"
+SELECT_EVENT_SEARCH_FIELDS = "SELECT id, name, description, date FROM events"
+# Hall bookings overlapping a period: events starting in (start - booking length, end)
+SELECT_HALL_BOOKING = "SELECT id FROM events WHERE hall_id = ? AND date > ? AND date < ? LIMIT 1"
+SELECT_FREE_HALLS = "SELECT id, size, capacity FROM halls WHERE registered = 1 AND id NOT IN (SELECT hall_id FROM events WHERE date > ? AND date < ?) ORDER BY id"
+# Event pages: keyset pagination over the (date, id) indexes; {where} holds the optional filters
+COUNT_EVENTS = "SELECT COUNT(*) FROM events WHERE {where}"
+SELECT_EVENTS_PAGE = f"SELECT {EVENT_COLUMNS} FROM events JOIN halls ON halls.id = events.hall_id WHERE {{where}} ORDER BY events.date, events.id LIMIT ?"
+INSERT_ZONE = "INSERT INTO zones (event_id, type, price, capacity, available) VALUES (?, ?, ?, ?, ?)"
+SELECT_ZONES_BY_EVENT = "SELECT id, type, price, capacity FROM zones WHERE event_id = ? ORDER BY id"
+SELECT_ZONE_AVAILABLE = "SELECT available FROM zones WHERE id = ?"
+ADJUST_ZONE_AVAILABLE = "UPDATE zones SET available = available + ? WHERE id = ?"
+# Seats are generated inside SQLite rather than sent one row at a time
+INSERT_ZONE_TICKETS = """
+    WITH RECURSIVE seats (seat) AS (SELECT 0 UNION ALL SELECT seat + 1 FROM seats WHERE seat + 1 < ?)
+    INSERT INTO tickets (zone_id, seat, status) SELECT ?, seat, 'AVAILABLE' FROM seats
+"""
+# Claims up to N free seats in one statement; the caller checks rowcount
+CLAIM_TICKETS = """
+    UPDATE tickets SET status = 'SOLD', buyer_id = ?
+    WHERE id IN (SELECT id FROM tickets WHERE zone_id = ? AND status = 'AVAILABLE' ORDER BY id LIMIT ?)
+    RETURNING id
+"""
+TICKET_COLUMNS = "tickets.id, tickets.status, zones.id, zones.type, zones.price, zones.capacity, " + EVENT_COLUMNS
+TICKET_JOINS = "FROM tickets JOIN zones ON zones.id = tickets.zone_id JOIN events ON events.id = zones.event_id JOIN halls ON halls.id = events.hall_id"
+SELECT_TICKET_BY_ID = f"SELECT {TICKET_COLUMNS} {TICKET_JOINS} WHERE tickets.id = ?"
+SELECT_USER_TICKETS = f"SELECT {TICKET_COLUMNS} {TICKET_JOINS} WHERE tickets.buyer_id = ? AND tickets.status = 'SOLD' ORDER BY tickets.id"
+SELECT_TICKET_EVENT = "SELECT zones.event_id FROM tickets JOIN zones ON zones.id = tickets.zone_id WHERE tickets.id = ?"
+REFUND_TICKET = "UPDATE tickets SET status = 'AVAILABLE', buyer_id = NULL WHERE id = ? AND status = 'SOLD'"
+INSERT_ORDER = "INSERT INTO orders (buyer_id, status, total_price) VALUES (?, 'PENDING', 0)"
+SELECT_ORDER_BY_ID = "SELECT id, buyer_id, status, total_price FROM orders WHERE id = ?"
+ADD_ORDER_TOTAL = "UPDATE orders SET total_price = total_price + ? WHERE id = ?"
+INSERT_ORDER_TICKET = "INSERT INTO order_tickets (order_id, ticket_id) VALUES (?, ?)"
+COUNT_ORDER_TICKETS = "SELECT COUNT(*) FROM order_tickets WHERE order_id = ?"
+COMPLETE_ORDER = "UPDATE orders SET status = 'COMPLETED' WHERE id = ? AND status = 'PENDING'"
+INSERT_PAYMENT = "INSERT INTO payments (order_id, amount, status) VALUES (?, ?, ?)"
+INSERT_REFUND_REQUEST = "INSERT INTO refund_requests (ticket_id, buyer_id, status, refund_amount) VALUES (?, ?, 'PENDING', ?)"
+REFUND_COLUMNS = "refund_requests.id, refund_requests.status, refund_requests.buyer_id, " + TICKET_COLUMNS
+REFUND_JOINS = "FROM refund_requests JOIN tickets ON tickets.id = refund_requests.ticket_id JOIN zones ON zones.id = tickets.zone_id JOIN events ON events.id = zones.event_id JOIN halls ON halls.id = events.hall_id"
+SELECT_REFUND_REQUEST_BY_ID = f"SELECT {REFUND_COLUMNS} {REFUND_JOINS} WHERE refund_requests.id = ?"
+SELECT_REFUND_REQUESTS = f"SELECT {REFUND_COLUMNS} {REFUND_JOINS} ORDER BY refund_requests.id"
+DECIDE_REFUND_REQUEST = "UPDATE refund_requests SET status = ? WHERE id = ? AND status = 'PENDING'"
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections in WAL mode, shareable across threads."""
+
+    def __init__(self, path: str, size: int = 4):
+        self.__connections: queue.Queue = queue.Queue()
+        for _ in range(size):
+            connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=256)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA busy_timeout = 5000")
+            connection.execute("PRAGMA foreign_keys = ON")
+            self.__connections.put(connection)
+        self.__size = size
+
+    @contextmanager
+    def connection(self):
+        connection = self.__connections.get()
+        try:
+            yield connection
+        finally:
+            self.__connections.put(connection)
+
+    @contextmanager
+    def transaction(self):
+        """Run a write transaction; BEGIN IMMEDIATE takes the write lock up front."""
+        with self.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def close(self):
+        for _ in range(self.__size):
+            self.__connections.get().close()
+
+
+class UserRecord:
+    def __init__(self, id: int, name: str, email: str, password_hash: str, roles: List[str]):
+        self.__id = id
+        self.__name = name
+        self.__email = email
+        self.__password_hash = password_hash
+        self.__roles = roles
+
+    # Getter for id
+    @property
+    def id(self):
+        return self.__id
+
+    # Getter for name
+    @property
+    def name(self):
+        return self.__name
+
+    # Getter for email
+    @property
+    def email(self):
+        return self.__email
+
+    # Getter for roles
+    @property
+    def roles(self):
+        return self.__roles
+
+    # Getter for password_hash
+    @property
+    def password_hash(self):
+        return self.__password_hash
+
+    def has_role(self, role: str) -> bool:
+        return role in self.__roles
+
+    def verify_password(self, password: str) -> bool:
+        return verify_password(password, self.__password_hash)
+
+
+class HallRecord:
+    def __init__(self, id: int, size: str, capacity: int):
+        self.__id = id
+        self.__size = size
+        self.__capacity = capacity
+
+    # Getter for id
+    @property
+    def id(self):
+        return self.__id
+
+    # Getter for size
+    @property
+    def size(self):
+        return self.__size
+
+    # Getter for capacity
+    @property
+    def capacity(self):
+        return self.__capacity
+
+
+class EventRecord:
+    def __init__(self, controller: 'SQLiteController', id: int, name: str, date: datetime, organizer_id: int, description: str, image_url: str, hall: HallRecord):
+        self.__controller = controller
+        self.__id = id
+        self.__name = name
+        self.__date = date
+        self.__organizer_id = organizer_id
+        self.__description = description
+        self.__image_url = image_url
+        self.__hall = hall
+        self.__zones: Optional[Dict[str, 'ZoneRecord']] = None
+
+    # Getter for id
+    @property
+    def id(self):
+        return self.__id
+
+    # Getter for name
+    @property
+    def name(self):
+        return self.__name
+
+    # Getter for date
+    @property
+    def date(self):
+        return self.__date
+
+    # Getter for organizer
+    @property
+    def organizer(self):
+        return self.__controller.get_user_by_id(self.__organizer_id)
+
+    # Getter for description
+    @property
+    def description(self):
+        return self.__description
+
+    # Getter for image_url
+    @property
+    def image_url(self):
+        return self.__image_url
+
+    # Getter for hall
+    @property
+    def hall(self):
+        return self.__hall
+
+    # Getter for zones (loaded on first access)
+    @property
+    def zones(self):
+        if self.__zones is None:
+            self.__zones = self.__controller.get_event_zones(self)
+        return self.__zones
+
+
+class ZoneRecord:
+    def __init__(self, controller: 'SQLiteController', id: int, type: str, price: float, capacity: int, event: EventRecord):
+        self.__controller = controller
+        self.__id = id
+        self.__type = type
+        self.__price = price
+        self.__capacity = capacity
+        self.__event = event
+
+    # Getter for id
+    @property
+    def id(self):
+        return self.__id
+
+    # Getter for type
+    @property
+    def type(self):
+        return self.__type
+
+    # Getter for price
+    @property
+    def price(self):
+        return self.__price
+
+    # Getter for capacity
+    @property
+    def capacity(self):
+        return self.__capacity
+
+    # Getter for event
+    @property
+    def event(self):
+        return self.__event
+
+    def get_available_tickets_count(self) -> int:
+        """Read the zone's availability counter (a single-row lookup)."""
+        return self.__controller.get_zone_available_count(self.__id)
+
+
+class TicketRecord:
+    def __init__(self, id: int, status: TicketStatus, zone: ZoneRecord):
+        self.__id = id
+        self.__status = status
+        self.__zone = zone
+
+    # Getter for id
+    @property
+    def id(self):
+        return self.__id
+
+    # Getter for status
+    @property
+    def status(self):
+        return self.__status
+
+    # Getter for zone
+    @property
+    def zone(self):
+        return self.__zone
+
+
+class OrderRecord:
+    def __init__(self, id: int, buyer: UserRecord, status: OrderStatus, total_price: float):
+        self.__id = id
+        self.__buyer = buyer
+        self.__status = status
+        self.__total_price = total_price
+
+    # Getter for id
+    @property
+    def id(self):
+        return self.__id
+
+    # Getter for buyer
+    @property
+    def buyer(self):
+        return self.__buyer
+
+    # Getter for status
+    @property
+    def status(self):
+        return self.__status
+
+    # Getter for total_price
+    @property
+    def total_price(self):
+        return self.__total_price
+
+
+class RefundRequestRecord:
+    def __init__(self, id: int, status: RefundStatus, buyer_id: int, ticket: TicketRecord):
+        self.__id = id
+        self.__status = status
+        self.__buyer_id = buyer_id
+        self.__ticket = ticket
+
+    # Getter for id
+    @property
+    def id(self):
+        return self.__id
+
+    # Getter for status
+    @property
+    def status(self):
+        return self.__status
+
+    # Getter for ticket
+    @property
+    def ticket(self):
+        return self.__ticket
+
+
+class SQLitePurchaseResult:
+    """Same shape as controller.PurchaseResult."""
+
+    def __init__(self, order: OrderRecord, tickets: Dict[ZoneRecord, List[TicketRecord]], errors: Dict[ZoneRecord, str]):
+        self.__order = order
+        self.__tickets = tickets
+        self.__errors = errors
+
+    # Getter for order
+    @property
+    def order(self):
+        return self.__order
+
+    # Getter for tickets (purchased tickets per zone)
+    @property
+    def tickets(self):
+        return self.__tickets
+
+    # Getter for errors (failure reason per zone)
+    @property
+    def errors(self):
+        return self.__errors
+
+    # Getter for success
+    @property
+    def success(self):
+        return not self.__errors
+
+
+class SQLiteController:
+    """
+    Controller storage backend keeping all state in SQLite (WAL mode).
+    Implements the Controller methods used by the routes in app.py and returns
+    read-only records with the same attributes as the in-memory classes.
+    """
+
+    def __init__(self, path: str, pool_size: int = 4, booking_length: timedelta = timedelta(days=1)):
+        self.__pool = ConnectionPool(path, size=pool_size)
+        self.__booking_length = booking_length
+        with self.__pool.connection() as connection:
+            connection.executescript(SCHEMA)
+        self.__password_hasher = PasswordHasher()
+        self.__hashing_pool = HashingPool(self.__password_hasher)
+        self.__change_listeners: List[Callable[[str, int], None]] = []
+        # In-memory search index, loaded from the table and kept up to date by create_event
+        self.__search_index = EventSearchIndex()
+        with self.__pool.connection() as connection:
+            for event_id, name, description, date in connection.execute(SELECT_EVENT_SEARCH_FIELDS):
+                self.__search_index.add(event_id, name, description, datetime.fromisoformat(date))
+
+    def close(self):
+        self.__pool.close()
+
+    def shared_catalog(self):
+        """Users, halls and events live in the database, which every process already shares."""
+        return nullcontext()
+
+    def configure_password_hashing(self, hasher: PasswordHasher, max_workers: int = 2, max_pending: int = 64):
+        self.__password_hasher = hasher
+        self.__hashing_pool = HashingPool(hasher, max_workers=max_workers, max_pending=max_pending)
+
+    def get_password_hashing_metrics(self) -> dict:
+        return self.__hashing_pool.get_metrics()
+
+    def add_change_listener(self, listener: Callable[[str, int], None]):
+        """See Controller.add_change_listener; only changes made through this instance are announced."""
+        self.__change_listeners.append(listener)
+
+    def __notify(self, change: str, event_id: int):
+        for listener in self.__change_listeners:
+            listener(change, event_id)
+
+    # Row mapping
+    def __user_from_row(self, row) -> UserRecord:
+        return UserRecord(id=row[0], name=row[1], email=row[2], password_hash=row[3], roles=row[4].split(",") if row[4] else [])
+
+    def __event_from_row(self, row) -> EventRecord:
+        hall = HallRecord(id=row[6], size=row[7], capacity=row[8])
+        return EventRecord(self, id=row[0], name=row[1], date=datetime.fromisoformat(row[2]), organizer_id=row[3], description=row[4], image_url=row[5], hall=hall)
+
+    def __ticket_from_row(self, row) -> TicketRecord:
+        event = self.__event_from_row(row[6:])
+        zone = ZoneRecord(self, id=row[2], type=row[3], price=row[4], capacity=row[5], event=event)
+        return TicketRecord(id=row[0], status=TicketStatus[row[1]], zone=zone)
+
+    # User Management
+    def create_user(self, name: str, email: str, password: str, roles: List[str], password_hash: Optional[str] = None) -> UserRecord:
+        password_hash = password_hash or self.__password_hasher.hash(password)
+        with self.__pool.transaction() as connection:
+            user_id = connection.execute(INSERT_USER, (name, email, email.strip().casefold(), password_hash, ",".join(roles))).lastrowid
+        logger.info("User '%s' created with roles: %s.", name, roles)
+        return UserRecord(id=user_id, name=name, email=email, password_hash=password_hash, roles=roles)
+
+    async def create_user_async(self, name: str, email: str, password: str, roles: List[str]) -> UserRecord:
+        password_hash = await self.__hashing_pool.hash(password)
+        return await asyncio.to_thread(self.create_user, name=name, email=email, password="", roles=roles, password_hash=password_hash)
+
+    def set_password_hash(self, user: UserRecord, password_hash: str):
+        with self.__pool.transaction() as connection:
+            connection.execute(UPDATE_PASSWORD_HASH, (password_hash, user.id))
+
+    def get_users(self) -> List[UserRecord]:
+        with self.__pool.connection() as connection:
+            return [self.__user_from_row(row) for row in connection.execute(SELECT_USERS)]
+
+    def get_user_by_id(self, user_id: int) -> Optional[UserRecord]:
+        with self.__pool.connection() as connection:
+            row = connection.execute(SELECT_USER_BY_ID, (user_id,)).fetchone()
+        if row:
+            return self.__user_from_row(row)
+        logger.warning("User with ID %s not found.", user_id)
+        return None
+
+    def get_user_by_email(self, email: str) -> Optional[UserRecord]:
+        with self.__pool.connection() as connection:
+            row = connection.execute(SELECT_USER_BY_EMAIL, (email.strip().casefold(),)).fetchone()
+        if row:
+            return self.__user_from_row(row)
+        logger.warning("User with email %s not found.", email)
+        return None
+
+    def authenticate_user(self, email: str, password: str) -> Optional[UserRecord]:
+        user = self.get_user_by_email(email)
+        if user and user.verify_password(password):
+            if self.__password_hasher.needs_rehash(user.password_hash):
+                self.set_password_hash(user, self.__password_hasher.hash(password))
+            return user
+        logger.warning("Authentication failed for email: %s", email)
+        return None
+
+    async def authenticate_user_async(self, email: str, password: str) -> Optional[UserRecord]:
+        user = self.get_user_by_email(email)
+        if user and await self.__hashing_pool.verify(password, user.password_hash):
+            if self.__password_hasher.needs_rehash(user.password_hash):
+                await asyncio.to_thread(self.set_password_hash, user, await self.__hashing_pool.hash(password))
+            return user
+        logger.warning("Authentication failed for email: %s", email)
+        return None
+
+    def get_user_tickets(self, user_id: int) -> List[TicketRecord]:
+        with self.__pool.connection() as connection:
+            return [self.__ticket_from_row(row) for row in connection.execute(SELECT_USER_TICKETS, (user_id,))]
+
+    # Hall Management
+    def add_hall(self, hall):
+        with self.__pool.transaction() as connection:
+            connection.execute(INSERT_HALL, (hall.id, hall.size, hall.capacity, 1))
+            connection.execute(REGISTER_HALL, (hall.id,))
+
+    def get_halls(self) -> List[HallRecord]:
+        with self.__pool.connection() as connection:
+            return [HallRecord(*row) for row in connection.execute(SELECT_HALLS)]
+
+    def get_hall_by_id(self, hall_id: int) -> Optional[HallRecord]:
+        with self.__pool.connection() as connection:
+            row = connection.execute(SELECT_HALL_BY_ID, (hall_id,)).fetchone()
+        if row:
+            return HallRecord(*row)
+        logger.warning("Hall with ID %s not found.", hall_id)
+        return None
+
+    # Event Management
+    def create_event(self, name: str, date: datetime, organizer, hall, description: str, image_url: str, zones: List[Dict[str, float]],
+                     allow_overlap: bool = False) -> Optional[EventRecord]:
+        """See Controller.create_event; the write transaction makes the booking check atomic across processes."""
+        with self.__pool.transaction() as connection:
+            booking = (hall.id, (date - self.__booking_length).isoformat(), (date + self.__booking_length).isoformat())
+            if not allow_overlap and connection.execute(SELECT_HALL_BOOKING, booking).fetchone():
+                logger.warning("Hall %s is already booked on %s.", hall.id, date)
+                return None
+            # Events may use halls that were never registered with add_hall
+            connection.execute(INSERT_HALL, (hall.id, hall.size, hall.capacity, 0))
+            event_id = connection.execute(INSERT_EVENT, (name, date.isoformat(), organizer.id, hall.id, description, image_url)).lastrowid
+            for zone in zones:
+                zone_id = connection.execute(INSERT_ZONE, (event_id, zone['type'], zone['price'], zone['quantity'], zone['quantity'])).lastrowid
+                if zone['quantity'] > 0:
+                    connection.execute(INSERT_ZONE_TICKETS, (zone['quantity'], zone_id))
+        logger.info("Event '%s' created by '%s'.", name, organizer.name)
+        self.__search_index.add(event_id, name, description, date)
+        self.__notify("event", event_id)
+        return self.get_event_by_id(event_id)
+
+    def get_event_by_id(self, event_id: int) -> Optional[EventRecord]:
+        with self.__pool.connection() as connection:
+            row = connection.execute(SELECT_EVENT_BY_ID, (event_id,)).fetchone()
+        if row:
+            return self.__event_from_row(row)
+        logger.warning("Event with ID %s not found.", event_id)
+        return None
+
+    def is_hall_free(self, hall_id: int, start: datetime, end: datetime) -> bool:
+        with self.__pool.connection() as connection:
+            booking = (hall_id, (start - self.__booking_length).isoformat(), end.isoformat())
+            return connection.execute(SELECT_HALL_BOOKING, booking).fetchone() is None
+
+    def can_book_hall(self, hall_id: int, date: datetime) -> bool:
+        return self.is_hall_free(hall_id, date, date + self.__booking_length)
+
+    def get_free_halls(self, start: datetime, end: datetime) -> List[HallRecord]:
+        """See Controller.get_free_halls; the booked halls come from a range scan of the date index, and SQLite returns their complement."""
+        with self.__pool.connection() as connection:
+            return [HallRecord(*row) for row in connection.execute(SELECT_FREE_HALLS, ((start - self.__booking_length).isoformat(), end.isoformat()))]
+
+    def get_events(self) -> List[EventRecord]:
+        with self.__pool.connection() as connection:
+            return [self.__event_from_row(row) for row in connection.execute(SELECT_EVENTS)]
+
+    def search_events(self, query: str, start: Optional[datetime] = None, end: Optional[datetime] = None, limit: int = 20) -> List[EventRecord]:
+        """See Controller.search_events; events created by other processes appear after a restart."""
+        events = (self.get_event_by_id(event_id) for event_id in self.__search_index.search(query, start=start, end=end, limit=limit))
+        return [event for event in events if event]
+
+    def suggest_search_terms(self, prefix: str, limit: int = 10) -> List[str]:
+        return self.__search_index.suggest(prefix, limit=limit)
+
+    def get_events_page(self, cursor: Optional[str] = None, limit: int = 20, hall_id: Optional[int] = None,
+                        start: Optional[datetime] = None, end: Optional[datetime] = None) -> EventPage:
+        """See Controller.get_events_page; the total is an index range count."""
+        filters, parameters = [], []
+        if hall_id is not None:
+            filters.append("events.hall_id = ?")
+            parameters.append(hall_id)
+        if start is not None:
+            filters.append("events.date >= ?")
+            parameters.append(start.isoformat())
+        if end is not None:
+            filters.append("events.date < ?")
+            parameters.append(end.isoformat())
+        page_filters, page_parameters = list(filters), list(parameters)
+        if cursor:
+            date, event_id = EventPage.decode_cursor(cursor)
+            page_filters.append("(events.date, events.id) > (?, ?)")
+            page_parameters += [date.isoformat(), event_id]
+        with self.__pool.connection() as connection:
+            total = connection.execute(COUNT_EVENTS.format(where=" AND ".join(filters) or "1"), parameters).fetchone()[0]
+            # One row past the page tells whether there is a next page
+            rows = connection.execute(SELECT_EVENTS_PAGE.format(where=" AND ".join(page_filters) or "1"), page_parameters + [limit + 1]).fetchall()
+        events = [self.__event_from_row(row) for row in rows[:limit]]
+        next_cursor = EventPage.encode_cursor(events[-1].date, events[-1].id) if len(rows) > limit else None
+        return EventPage(events=events, next_cursor=next_cursor, total=total)
+
+    def get_event_zones(self, event: EventRecord) -> Dict[str, ZoneRecord]:
+        with self.__pool.connection() as connection:
+            rows = connection.execute(SELECT_ZONES_BY_EVENT, (event.id,)).fetchall()
+        return {row[1]: ZoneRecord(self, id=row[0], type=row[1], price=row[2], capacity=row[3], event=event) for row in rows}
+
+    def get_available_tickets_count(self, zone: ZoneRecord) -> int:
+        return self.get_zone_available_count(zone.id)
+
+    def get_zone_available_count(self, zone_id: int) -> int:
+        with self.__pool.connection() as connection:
+            row = connection.execute(SELECT_ZONE_AVAILABLE, (zone_id,)).fetchone()
+        return row[0] if row else 0
+
+    # Order Management
+    def create_order(self, buyer) -> OrderRecord:
+        with self.__pool.transaction() as connection:
+            order_id = connection.execute(INSERT_ORDER, (buyer.id,)).lastrowid
+        logger.info("Order %s created by '%s'.", order_id, buyer.name)
+        return OrderRecord(id=order_id, buyer=buyer, status=OrderStatus.PENDING, total_price=0.0)
+
+    def get_order_by_id(self, order_id: int) -> Optional[OrderRecord]:
+        with self.__pool.connection() as connection:
+            row = connection.execute(SELECT_ORDER_BY_ID, (order_id,)).fetchone()
+        if row:
+            return OrderRecord(id=row[0], buyer=self.get_user_by_id(row[1]), status=OrderStatus[row[2]], total_price=row[3])
+        logger.warning("Order with ID %s not found.", order_id)
+        return None
+
+    def purchase_tickets(self, order_id: int, zone: ZoneRecord, quantity: int) -> bool:
+        order = self.get_order_by_id(order_id)
+        if not order:
+            logger.error("Order with ID %s not found.", order_id)
+            return False
+        return self.purchase_many(order, {zone: quantity}).success
+
+    def purchase_many(self, order: OrderRecord, quantities: Dict[ZoneRecord, int]) -> SQLitePurchaseResult:
+        """Buy seats in several zones in one transaction: every requested seat or none."""
+        zones = sorted((zone for zone, quantity in quantities.items() if quantity > 0), key=lambda zone: zone.id)
+        claimed: Dict[ZoneRecord, List[int]] = {}
+        errors: Dict[ZoneRecord, str] = {}
+        with self.__pool.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for zone in zones:
+                    ticket_ids = [row[0] for row in connection.execute(CLAIM_TICKETS, (order.buyer.id, zone.id, quantities[zone]))]
+                    if len(ticket_ids) < quantities[zone]:
+                        errors[zone] = f"Not enough {zone.type} tickets available"
+                        break
+                    claimed[zone] = ticket_ids
+                    connection.execute(ADJUST_ZONE_AVAILABLE, (-len(ticket_ids), zone.id))
+                    connection.executemany(INSERT_ORDER_TICKET, ((order.id, ticket_id) for ticket_id in ticket_ids))
+                    connection.execute(ADD_ORDER_TOTAL, (zone.price * len(ticket_ids), order.id))
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("ROLLBACK" if errors else "COMMIT")
+
+        if errors:
+            for zone in errors:
+                logger.error("Not enough tickets available in zone '%s'.", zone.type)
+            return SQLitePurchaseResult(order=order, tickets={}, errors=errors)
+        tickets = {zone: [TicketRecord(id=ticket_id, status=TicketStatus.SOLD, zone=zone) for ticket_id in ticket_ids] for zone, ticket_ids in claimed.items()}
+        if logger.isEnabledFor(logging.INFO):
+            zone_counts = {zone.type: len(ticket_ids) for zone, ticket_ids in claimed.items()}
+            logger.info(
+                "Order %s: %s tickets sold to '%s' (%s).", order.id, sum(zone_counts.values()), order.buyer.name, zone_counts,
+                extra={"order_id": order.id, "buyer_id": order.buyer.id, "tickets": {zone.id: len(ticket_ids) for zone, ticket_ids in claimed.items()}}
+            )
+        for event_id in {zone.event.id for zone in claimed}:
+            self.__notify("availability", event_id)
+        return SQLitePurchaseResult(order=order, tickets=tickets, errors={})
+
+    def complete_order(self, order_id: int) -> bool:
+        with self.__pool.transaction() as connection:
+            if connection.execute(COUNT_ORDER_TICKETS, (order_id,)).fetchone()[0] == 0:
+                logger.error("Order %s has no tickets to complete.", order_id)
+                return False
+            if connection.execute(COMPLETE_ORDER, (order_id,)).rowcount == 0:
+                return False
+            total_price = connection.execute(SELECT_ORDER_BY_ID, (order_id,)).fetchone()[3]
+            connection.execute(INSERT_PAYMENT, (order_id, total_price, PaymentStatus.COMPLETED.name))
+        logger.info("Order %s completed successfully.", order_id)
+        return True
+
+    # Refund Management
+    def get_ticket_by_id(self, ticket_id: int) -> Optional[TicketRecord]:
+        with self.__pool.connection() as connection:
+            row = connection.execute(SELECT_TICKET_BY_ID, (ticket_id,)).fetchone()
+        if row:
+            return self.__ticket_from_row(row)
+        logger.warning("Ticket with ID %s not found.", ticket_id)
+        return None
+
+    def create_refund_request(self, ticket_id: int, buyer) -> Optional[RefundRequestRecord]:
+        ticket = self.get_ticket_by_id(ticket_id)
+        if not ticket:
+            return None
+        with self.__pool.transaction() as connection:
+            refund_request_id = connection.execute(INSERT_REFUND_REQUEST, (ticket_id, buyer.id, ticket.zone.price)).lastrowid
+        logger.info("Refund request %s created for ticket %s.", refund_request_id, ticket_id)
+        return RefundRequestRecord(id=refund_request_id, status=RefundStatus.PENDING, buyer_id=buyer.id, ticket=ticket)
+
+    def get_refund_request_by_id(self, refund_request_id: int) -> Optional[RefundRequestRecord]:
+        with self.__pool.connection() as connection:
+            row = connection.execute(SELECT_REFUND_REQUEST_BY_ID, (refund_request_id,)).fetchone()
+        if row:
+            return RefundRequestRecord(id=row[0], status=RefundStatus[row[1]], buyer_id=row[2], ticket=self.__ticket_from_row(row[3:]))
+        logger.warning("Refund request with ID %s not found.", refund_request_id)
+        return None
+
+    def get_refund_requests(self) -> List[RefundRequestRecord]:
+        with self.__pool.connection() as connection:
+            rows = connection.execute(SELECT_REFUND_REQUESTS).fetchall()
+        return [RefundRequestRecord(id=row[0], status=RefundStatus[row[1]], buyer_id=row[2], ticket=self.__ticket_from_row(row[3:])) for row in rows]
+
+    def approve_refund(self, refund_request_id: int) -> bool:
+        with self.__pool.transaction() as connection:
+            if connection.execute(DECIDE_REFUND_REQUEST, (RefundStatus.APPROVED.name, refund_request_id)).rowcount == 0:
+                return False
+            ticket_id = connection.execute("SELECT ticket_id FROM refund_requests WHERE id = ?", (refund_request_id,)).fetchone()[0]
+            # The refunded seat goes straight back to the zone, as Zone.return_ticket does
+            refunded = connection.execute(REFUND_TICKET, (ticket_id,)).rowcount > 0
+            if refunded:
+                connection.execute("UPDATE zones SET available = available + 1 WHERE id = (SELECT zone_id FROM tickets WHERE id = ?)", (ticket_id,))
+                event_id = connection.execute(SELECT_TICKET_EVENT, (ticket_id,)).fetchone()[0]
+        logger.info("Refund request %s approved.", refund_request_id)
+        if refunded:
+            self.__notify("availability", event_id)
+        return True
+
+    def reject_refund(self, refund_request_id: int) -> bool:
+        with self.__pool.transaction() as connection:
+            rejected = connection.execute(DECIDE_REFUND_REQUEST, (RefundStatus.REJECTED.name, refund_request_id)).rowcount > 0
+        if rejected:
+            logger.info("Refund request %s rejected.", refund_request_id)
+        return rejected
+
+    def start_hold_sweeper(self, interval: float = 1.0):
+        """Seat holds are only implemented by the in-memory Controller; there is nothing to sweep."""
+        return None
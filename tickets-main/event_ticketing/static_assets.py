@@ -0,0 +1,198 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+
+from page_cache import etag_matches
+
+try:
+    from PIL import Image
+except ImportError:  # No WebP variants without Pillow; originals are served instead
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+FINGERPRINTED = re.compile(r"(?P<name>.+)\.(?P<fingerprint>[0-9a-f]{16})(?P<extension>\.[A-Za-z0-9]+)")
+CONTENT_ADDRESSED = re.compile(r"[0-9a-f]{64}")  # media.ImageStore names files by their SHA-256
+WEBP_SOURCES = {".jpg", ".jpeg", ".png"}
+COMPRESSIBLE = {".css", ".js", ".svg", ".html", ".json", ".txt"}
+IMMUTABLE = b"public, max-age=31536000, immutable"
+
+
+class StaticAssets:
+    """
+    Fingerprinted static files. url() puts a hash of a file's content in its
+    name, so a URL always means the same bytes and can be cached for a year;
+    a changed file gets a new URL. Only files under `root` are served, only
+    under their current fingerprint, and never from hidden directories.
+    Images are also offered as WebP and text files gzip-compressed to clients
+    that accept them; those variants are made on first request and kept
+    under `variants_dir` (by default root/.variants).
+    """
+
+    def __init__(self, root: str = "static", prefix: str = "/assets", variants_dir: Optional[str] = None):
+        self.__root = os.path.realpath(root)
+        self.__prefix = prefix.rstrip("/") + "/"
+        self.__variants_dir = variants_dir or os.path.join(root, ".variants")
+        self.__fingerprints: Dict[str, Tuple[int, int, str]] = {}  # path -> (mtime_ns, size, fingerprint)
+        self.__variant_lock = threading.Lock()
+        os.makedirs(self.__variants_dir, exist_ok=True)
+
+    # Getter for prefix
+    @property
+    def prefix(self):
+        return self.__prefix
+
+    def fingerprint(self, path: str) -> Optional[str]:
+        """First 16 hex digits of the SHA-256 of the file, or None if it does not exist."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        cached = self.__fingerprints.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if CONTENT_ADDRESSED.fullmatch(stem):
+            fingerprint = stem[:16]  # The name already is the content hash
+        else:
+            digest = hashlib.sha256()
+            with open(path, "rb") as asset:
+                while chunk := asset.read(CHUNK_SIZE):
+                    digest.update(chunk)
+            fingerprint = digest.hexdigest()[:16]
+        self.__fingerprints[path] = (stat.st_mtime_ns, stat.st_size, fingerprint)
+        return fingerprint
+
+    def url(self, path: str) -> str:
+        """
+        Fingerprinted URL of a file under the root (a path relative to the working
+        directory, like image URLs); external URLs and other files are left alone.
+        """
+        if "://" in path:
+            return path
+        path = path.lstrip("/")
+        relative = os.path.relpath(os.path.realpath(path), self.__root)
+        fingerprint = self.fingerprint(path)
+        if fingerprint is None or any(part.startswith(".") for part in relative.split(os.sep)):
+            return f"/{path}"  # Missing, outside the root (relpath starts with "..") or hidden
+        name, extension = os.path.splitext(relative.replace(os.sep, "/"))
+        return f"{self.__prefix}{name}.{fingerprint}{extension}"
+
+    def resolve(self, url_path: str) -> Optional[Tuple[str, str]]:
+        """(file path, fingerprint) for an asset URL path, or None unless it names a file under the root by its current fingerprint."""
+        match = FINGERPRINTED.fullmatch(url_path[len(self.__prefix):])
+        if not match or any(part.startswith(".") for part in match["name"].split("/")):
+            return None  # Also keeps "..", and hidden files such as the variants, out of reach
+        path = os.path.realpath(os.path.join(self.__root, match["name"] + match["extension"]))
+        if not path.startswith(self.__root + os.sep) or not os.path.isfile(path):
+            return None
+        if self.fingerprint(path) != match["fingerprint"]:
+            return None
+        return path, match["fingerprint"]
+
+    def __variant(self, path: str, fingerprint: str, suffix: str, make) -> Optional[str]:
+        variant = os.path.join(self.__variants_dir, f"{fingerprint}{suffix}")
+        if os.path.exists(variant):
+            return variant
+        with self.__variant_lock:
+            if not os.path.exists(variant):
+                temp_path = f"{variant}.{os.getpid()}.tmp"
+                try:
+                    make(path, temp_path)
+                except Exception as error:
+                    logger.warning("Could not make %s variant of %s: %s", suffix, path, error)
+                    return None
+                os.replace(temp_path, variant)
+        return variant
+
+    def select(self, path: str, fingerprint: str, accept: str, accept_encoding: str) -> Tuple[str, str, Optional[str], str]:
+        """
+        Pick the representation to send for the client's Accept headers.
+        :return: (file path, content type, content encoding or None, ETag)
+        """
+        extension = os.path.splitext(path)[1].lower()
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if extension in WEBP_SOURCES and Image is not None and "image/webp" in accept:
+            variant = self.__variant(path, fingerprint, ".webp", make_webp)
+            if variant:
+                return variant, "image/webp", None, f'"{fingerprint}-webp"'
+        if extension in COMPRESSIBLE:
+            if "br" in accept_encoding and os.path.exists(path + ".br"):
+                return path + ".br", content_type, "br", f'"{fingerprint}-br"'  # Precompressed at build time
+            if "gzip" in accept_encoding:
+                variant = self.__variant(path, fingerprint, extension + ".gz", make_gzip)
+                if variant:
+                    return variant, content_type, "gzip", f'"{fingerprint}-gzip"'
+        return path, content_type, None, f'"{fingerprint}"'
+
+
+def make_webp(source: str, target: str):
+    with Image.open(source) as image:
+        image.save(target, format="WEBP", quality=80, method=4)
+
+
+def make_gzip(source: str, target: str):
+    with open(source, "rb") as original, gzip.open(target, "wb", compresslevel=9) as compressed:
+        while chunk := original.read(CHUNK_SIZE):
+            compressed.write(chunk)
+
+
+class StaticAssetMiddleware:
+    """
+    ASGI middleware answering GET/HEAD requests under the assets prefix.
+    Responses are immutable with a strong ETag per representation, and vary
+    on Accept and Accept-Encoding. File bodies go out through the server's
+    zero-copy `http.response.pathsend` extension when it offers one (e.g.
+    Hypercorn, Granian) and are streamed in chunks from a thread otherwise.
+    """
+
+    def __init__(self, app, assets: StaticAssets):
+        self.__app = app
+        self.__assets = assets
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.__assets.prefix) or scope["method"] not in ("GET", "HEAD"):
+            await self.__app(scope, receive, send)
+            return
+        resolved = await asyncio.to_thread(self.__assets.resolve, scope["path"])
+        if resolved is None:
+            await send({"type": "http.response.start", "status": 404, "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"Not Found"})
+            return
+        request_headers = Headers(scope=scope)
+        path, content_type, encoding, etag = await asyncio.to_thread(
+            self.__assets.select, *resolved, request_headers.get("accept", ""), request_headers.get("accept-encoding", "")
+        )
+        headers = [
+            (b"etag", etag.encode()),
+            (b"cache-control", IMMUTABLE),
+            (b"vary", b"Accept, Accept-Encoding"),
+        ]
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers += [(b"content-type", content_type.encode()), (b"content-length", str(os.path.getsize(path)).encode())]
+        if encoding:
+            headers.append((b"content-encoding", encoding.encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+        elif "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": path})
+        else:
+            with open(path, "rb") as asset:
+                while chunk := await asyncio.to_thread(asset.read, CHUNK_SIZE):
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WaitingRoom:
+    """
+    Admission queue for one event's purchase route.
+    Buyers get increasing queue positions; positions are admitted at a fixed
+    rate (plus a small burst when the queue is idle). Admitted buyers receive a
+    signed admission token, bound to their user ID and their queue position,
+    that the purchase route verifies in O(1) and consumes: each admitted
+    position buys once. Consumed positions are remembered per process, like
+    the queue itself, until their token would have expired.
+    """
+
+    def __init__(self, event_id: int, admit_per_second: float, burst: int, secret: bytes, token_ttl: float = 600.0):
+        self.__event_id = event_id
+        self.__admit_per_second = admit_per_second
+        self.__burst = burst
+        self.__secret = secret
+        self.__token_ttl = token_ttl
+        self.__issued = 0  # Highest queue position handed out
+        self.__admitted = float(burst)  # Positions up to this value may enter
+        self.__last_update = time.monotonic()
+        self.__consumed: Dict[int, float] = {}  # Admitted position -> token expiry, in consumption order
+        self.__lock = threading.Lock()
+
+    # Getter for event_id
+    @property
+    def event_id(self):
+        return self.__event_id
+
+    # Getter for issued
+    @property
+    def issued(self):
+        return self.__issued
+
+    def __advance(self, now: float):
+        """Admit everyone the rate allows since the last call; idle credit is capped at `burst`."""
+        elapsed = now - self.__last_update
+        self.__last_update = now
+        self.__admitted = min(self.__admitted + elapsed * self.__admit_per_second, self.__issued + self.__burst)
+
+    def __sign(self, payload: str) -> str:
+        signature = hmac.new(self.__secret, payload.encode(), hashlib.sha256).hexdigest()
+        return f"{payload}.{signature}"
+
+    def __unsign(self, token: Optional[str]) -> Optional[list]:
+        if not token or "." not in token:
+            return None
+        payload, signature = token.rsplit(".", 1)
+        expected = hmac.new(self.__secret, payload.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(signature, expected):
+            return None
+        return payload.split(":")
+
+    def join(self) -> str:
+        """Take the next queue position and return it as a signed queue token."""
+        with self.__lock:
+            self.__advance(time.monotonic())
+            self.__issued += 1
+            position = self.__issued
+        logger.info("Queue position %s issued for event %s.", position, self.__event_id)
+        return self.__sign(f"q:{self.__event_id}:{position}")
+
+    def get_position(self, queue_token: Optional[str]) -> Optional[int]:
+        fields = self.__unsign(queue_token)
+        if not fields or len(fields) != 3 or fields[0] != "q" or fields[1] != str(self.__event_id):
+            return None
+        return int(fields[2])
+
+    def people_ahead(self, position: int) -> int:
+        """Number of queued buyers that will be admitted before `position` (0 once admitted)."""
+        with self.__lock:
+            self.__advance(time.monotonic())
+            return max(0, position - int(self.__admitted))
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until `position` is admitted at the configured rate."""
+        return self.people_ahead(position) / self.__admit_per_second
+
+    def is_admitted(self, position: int) -> bool:
+        return self.people_ahead(position) == 0
+
+    async def wait_for_admission(self, position: int):
+        """Sleep until `position` is admitted."""
+        while not self.is_admitted(position):
+            await asyncio.sleep(min(self.estimated_wait(position), 1.0))
+
+    def issue_admission_token(self, position: int, user_id: int) -> Optional[str]:
+        """
+        Sign an admission for an admitted, unused queue position.
+        :param position: Queue position from the buyer's queue token
+        :param user_id: The only user the token admits
+        """
+        if not self.is_admitted(position):
+            return None
+        with self.__lock:
+            if position in self.__consumed:
+                return None
+        expires_at = int(time.time() + self.__token_ttl)
+        return self.__sign(f"a:{self.__event_id}:{user_id}:{position}:{expires_at}")
+
+    def __admission(self, token: Optional[str], user_id: int) -> Optional[tuple]:
+        """The (position, expiry) of a valid, unexpired admission token issued to `user_id`."""
+        fields = self.__unsign(token)
+        if not fields or len(fields) != 5 or fields[0] != "a" or fields[1] != str(self.__event_id) or fields[2] != str(user_id):
+            return None
+        position, expires_at = int(fields[3]), int(fields[4])
+        if expires_at < time.time():
+            return None
+        return position, expires_at
+
+    def verify_admission_token(self, token: Optional[str], user_id: int) -> bool:
+        admission = self.__admission(token, user_id)
+        if admission is None:
+            return False
+        with self.__lock:
+            return admission[0] not in self.__consumed
+
+    def consume_admission_token(self, token: Optional[str], user_id: int) -> bool:
+        """
+        Use up an admission: True for the first caller only, so concurrent or
+        replayed purchases with the same token are refused.
+        """
+        admission = self.__admission(token, user_id)
+        if admission is None:
+            return False
+        position, expires_at = admission
+        now = time.time()
+        with self.__lock:
+            # Expired admissions are refused anyway; forget them oldest first
+            while self.__consumed:
+                old_position, old_expiry = next(iter(self.__consumed.items()))
+                if old_expiry >= now:
+                    break
+                del self.__consumed[old_position]
+            if position in self.__consumed:
+                return False
+            self.__consumed[position] = expires_at
+        return True
+
+    def restore_admission_token(self, token: Optional[str], user_id: int):
+        """Make a consumed admission usable again, after a purchase that bought nothing."""
+        admission = self.__admission(token, user_id)
+        if admission is not None:
+            with self.__lock:
+                self.__consumed.pop(admission[0], None)
+
+
+class WaitingRooms:
+    """Lazily created waiting rooms, one per event, sharing rate settings and secret."""
+
+    def __init__(self, admit_per_second: float = 50.0, burst: int = 50, secret: Optional[bytes] = None):
+        self.__admit_per_second = admit_per_second
+        self.__burst = burst
+        self.__secret = secret or os.urandom(32)
+        self.__rooms: Dict[int, WaitingRoom] = {}
+        self.__lock = threading.Lock()
+
+    # Getter for enabled
+    @property
+    def enabled(self):
+        return self.__admit_per_second > 0
+
+    def get_room(self, event_id: int) -> WaitingRoom:
+        room = self.__rooms.get(event_id)
+        if room is None:
+            with self.__lock:
+                room = self.__rooms.setdefault(event_id, WaitingRoom(event_id=event_id, admit_per_second=self.__admit_per_second, burst=self.__burst, secret=self.__secret))
+        return room
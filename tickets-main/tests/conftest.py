@@ -0,0 +1,28 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "event_ticketing"))
+
+
+@pytest.fixture
+def make_event():
+    """
+    Factory for a fresh Controller holding one event.
+    Call it with zone type -> seat count; it returns (controller, organizer, event),
+    and the organizer can buy tickets too.
+    """
+    from controller import Controller, Hall
+
+    def create(zones=None, name="Concert", date=datetime(2024, 6, 1)):
+        zones = zones or {"Regular": 10}
+        capacity = sum(zones.values())
+        controller = Controller()
+        organizer = controller.create_user(name="Organizer", email="organizer@example.com", password="secret", roles=["Buyer", "EventOrganizer"])
+        event = controller.create_event(name=name, date=date, organizer=organizer, hall=Hall(size="Medium", capacity=capacity), description="", image_url="",
+                                        zones=[{"type": zone_type, "percentage": quantity / capacity, "price": 10.0, "quantity": quantity}
+                                               for zone_type, quantity in zones.items()])
+        return controller, organizer, event
+    return create
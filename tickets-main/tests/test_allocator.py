@@ -0,0 +1,45 @@
+import logging
+import random
+
+from controller import TicketStatus
+
+
+def test_returned_seats_are_handed_out_before_new_ones(make_event):
+    controller, organizer, event = make_event({"Regular": 100})
+    zone = event.zones["Regular"]
+    order = controller.create_order(buyer=organizer)
+    assert controller.purchase_tickets(order_id=order.id, zone=zone, quantity=90)
+    for index in (10, 11, 12):
+        controller.approve_refund(controller.create_refund_request(ticket_id=zone.get_ticket(index).id, buyer=organizer).id)
+    with zone.lock:
+        assert zone.get_available_seats(5) == [10, 11, 12, 90, 91]
+
+
+def test_allocator_stays_exact_through_holds_and_refunds(make_event, caplog):
+    controller, organizer, event = make_event({"Regular": 300})
+    zone = event.zones["Regular"]
+    rng = random.Random(3)
+    holds = []
+    with caplog.at_level(logging.ERROR, logger="controller"):
+        for _ in range(2000):
+            action = rng.random()
+            if action < 0.4:
+                order = controller.create_order(buyer=organizer)
+                controller.purchase_tickets(order_id=order.id, zone=zone, quantity=rng.randint(1, 6))
+            elif action < 0.6:
+                hold = controller.hold_tickets(zone, rng.randint(1, 6), organizer, ttl=60)
+                if hold:
+                    holds.append(hold)
+            elif action < 0.8 and holds:
+                controller.release_hold(holds.pop(rng.randrange(len(holds))).id)
+            else:
+                sold = [index for index in range(zone.capacity) if zone.get_ticket_status(index) == TicketStatus.SOLD]
+                if sold:
+                    ticket = zone.get_ticket(rng.choice(sold))
+                    controller.approve_refund(controller.create_refund_request(ticket_id=ticket.id, buyer=organizer).id)
+            with zone.lock:
+                available = zone.get_available_tickets_count()
+                seats = zone.get_available_seats(available)
+            assert len(seats) == available == len(set(seats))
+            assert all(zone.get_ticket_status(index) == TicketStatus.AVAILABLE for index in seats)
+    assert not [record for record in caplog.records if "out of sync" in record.getMessage()]
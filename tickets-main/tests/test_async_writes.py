@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+from controller import Controller
+from passwords import PasswordHasher
+
+
+def record_threads(controller, name):
+    """Wrap a controller method so each call notes the thread it ran in."""
+    threads = []
+    method = getattr(controller, name)
+
+    def wrapper(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return method(*args, **kwargs)
+    setattr(controller, name, wrapper)
+    return threads
+
+
+def test_journaled_user_writes_run_off_the_event_loop():
+    controller = Controller()
+    controller.configure_password_hashing(PasswordHasher(scrypt_n=2 ** 10))
+    created = record_threads(controller, "create_user")
+    rehashed = record_threads(controller, "set_password_hash")
+
+    async def register_and_login():
+        user = await controller.create_user_async(name="Buyer", email="buyer@example.com", password="secret", roles=["Buyer"])
+        # New KDF settings make the next login upgrade the stored hash
+        controller.configure_password_hashing(PasswordHasher(scrypt_n=2 ** 11))
+        assert await controller.authenticate_user_async(email="buyer@example.com", password="secret") is user
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(register_and_login())
+    assert created and rehashed
+    assert loop_thread not in created + rehashed
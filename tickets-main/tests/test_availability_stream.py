@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+
+from availability_stream import AvailabilityBroadcaster, Subscription, format_message
+
+
+def decode(message: bytes) -> dict:
+    event, data = message.decode().strip().split("\n")
+    assert event == "event: availability"
+    return {int(zone_id): count for zone_id, count in json.loads(data.removeprefix("data: ")).items()}
+
+
+def test_subscribers_get_a_snapshot_then_only_changed_zones(make_event):
+    controller, buyer, event = make_event({"VIP": 5, "Regular": 5})
+    broadcaster = AvailabilityBroadcaster(controller, max_rate=100)
+    vip, regular = event.zones["VIP"], event.zones["Regular"]
+
+    async def scenario():
+        subscription = await broadcaster.subscribe(event.id)
+        assert decode(await subscription.get()) == {vip.id: 5, regular.id: 5}
+        # Purchases from another thread are coalesced into one message per round
+        await asyncio.to_thread(controller.purchase_tickets, controller.create_order(buyer=buyer).id, vip, 2)
+        await asyncio.to_thread(controller.purchase_tickets, controller.create_order(buyer=buyer).id, vip, 1)
+        update = decode(await asyncio.wait_for(subscription.get(), 5))
+        while update[vip.id] != 2:
+            update = decode(await asyncio.wait_for(subscription.get(), 5))
+        assert update == {vip.id: 2}
+        broadcaster.unsubscribe(subscription)
+        assert broadcaster.get_metrics()["subscribers"] == 0
+    asyncio.run(scenario())
+
+
+def test_slow_subscribers_get_one_snapshot_instead_of_a_backlog():
+    async def scenario():
+        subscription = Subscription(event_id=1, queue_size=2)
+        assert subscription.offer(format_message({"1": 5}))
+        assert subscription.offer(format_message({"1": 4}))
+        assert not subscription.offer(format_message({"1": 3}))
+        subscription.reset(format_message({"1": 3, "2": 7}))
+        assert decode(await subscription.get()) == {1: 3, 2: 7}
+        assert subscription.resets == 1
+    asyncio.run(scenario())
+
+
+def test_a_change_during_the_snapshot_read_is_not_overwritten(make_event):
+    controller, buyer, event = make_event({"VIP": 5, "Regular": 5})
+    broadcaster = AvailabilityBroadcaster(controller, max_rate=100)
+    vip = event.zones["VIP"]
+    read_count = controller.get_available_tickets_count
+    reads = []
+
+    def stale_read(zone):
+        # The first read sees VIP before a purchase lands and returns only after the producer published it
+        if not reads:
+            reads.append(zone)
+            controller.purchase_tickets(controller.create_order(buyer=buyer).id, vip, 2)
+            deadline = time.monotonic() + 5
+            while broadcaster.get_metrics()["published"] == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            return 5
+        return read_count(zone)
+
+    controller.get_available_tickets_count = stale_read
+
+    async def scenario():
+        subscription = await broadcaster.subscribe(event.id)
+        counts = {}
+        while True:
+            try:
+                counts.update(decode(await asyncio.wait_for(subscription.get(), 0.5)))
+            except asyncio.TimeoutError:
+                break
+        assert broadcaster.get_metrics()["published"] >= 1
+        assert counts[vip.id] == 3
+    asyncio.run(scenario())
@@ -0,0 +1,146 @@
+import asyncio
+import socket
+import threading
+from datetime import datetime
+
+import pytest
+
+from controller import Controller, Hall, Zone, Ticket, Event, TicketStatus
+from coordinator import CoordinatorServer, RemoteCoordinator
+
+ZONES = [{"type": "Regular", "percentage": 1.0, "price": 10.0, "quantity": 10}]
+
+
+@pytest.fixture
+def server():
+    loop = asyncio.new_event_loop()
+    coordinator_server = CoordinatorServer(port=0)
+    listener = loop.run_until_complete(coordinator_server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield coordinator_server, listener.sockets[0].getsockname()[1]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    listener.close()
+
+    async def cancel_clients():
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    loop.run_until_complete(cancel_clients())
+    loop.close()
+
+
+@pytest.fixture
+def silent_port():
+    """A coordinator address that accepts connections and never answers."""
+    listener = socket.create_server(("127.0.0.1", 0))
+    accepted = []
+    threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True).start()
+    yield listener.getsockname()[1]
+    listener.close()
+
+
+def node(port, name):
+    """A node that starts from scratch, with its own ID counters, as a separate process would."""
+    Event.event_counter = Zone.zone_counter = Ticket.ticket_counter = 0
+    controller = Controller()
+    coordinator = RemoteCoordinator("127.0.0.1", port, timeout=2.0)
+    controller.use_coordinator(coordinator)
+    with controller.shared_catalog():
+        user = controller.get_user_by_email("organizer@example.com") or controller.create_user(
+            name="Organizer", email="organizer@example.com", password="", roles=["Buyer", "EventOrganizer"], password_hash="x")
+        hall = Hall(size="Small", capacity=10)
+        controller.add_hall(hall)
+        event = controller.create_event(name=name, date=datetime(2024, 5, 1), organizer=user, hall=hall, description="", image_url="", zones=ZONES)
+    return controller, coordinator, user, next(iter(event.zones.values()))
+
+
+def test_nodes_with_different_events_get_their_own_zones(server):
+    first, first_coordinator, user, first_zone = node(server[1], "First")
+    second, second_coordinator, _, second_zone = node(server[1], "Second")
+    assert first_zone.id != second_zone.id
+
+    assert second.purchase_many(second.create_order(buyer=user), {second_zone: 10}).success
+    assert first.purchase_many(first.create_order(buyer=user), {first_zone: 10}).success
+    # The first node sees the second node's event once it follows the catalog
+    first_coordinator.catalog.sync(first)
+    assert sorted(event.name for event in first.get_events()) == ["First", "Second"]
+    first_coordinator.close()
+    second_coordinator.close()
+
+
+def test_hold_is_claimed_through_the_coordinator(server):
+    first, first_coordinator, user, zone = node(server[1], "Held")
+    second, second_coordinator, _, _ = node(server[1], "Other")
+    second_coordinator.catalog.sync(second)
+    remote_zone = second.get_zone_by_id(zone.id)
+
+    hold = first.hold_tickets(zone, 4, user, ttl=60)
+    assert hold is not None and zone.get_tickets_count(TicketStatus.HELD) == 4
+    result = second.purchase_many(second.create_order(buyer=user), {remote_zone: 6})
+    assert result.success
+    assert not set(hold.seats) & {ticket.index for ticket in result.tickets[remote_zone]}
+    assert not second.purchase_many(second.create_order(buyer=user), {remote_zone: 1}).success
+
+    assert first.release_hold(hold.id)
+    assert zone.get_tickets_count(TicketStatus.HELD) == 0
+    assert second.purchase_many(second.create_order(buyer=user), {remote_zone: 4}).success
+    first_coordinator.close()
+    second_coordinator.close()
+
+
+def test_converted_hold_stays_taken_on_the_coordinator(server):
+    controller, coordinator, user, zone = node(server[1], "Converted")
+    hold = controller.hold_tickets(zone, 10, user, ttl=60)
+    order = controller.create_order(buyer=user)
+    assert controller.convert_hold_to_order(hold.id, order.id)
+    assert zone.get_sold_tickets_count() == 10
+    assert not controller.purchase_many(controller.create_order(buyer=user), {zone: 1}).success
+    coordinator.close()
+
+
+def test_register_rejects_a_different_capacity():
+    coordinator_server = CoordinatorServer()
+    assert coordinator_server.handle({"id": 1, "op": "register", "zone": 7, "capacity": 10})["ok"]
+    assert coordinator_server.handle({"id": 2, "op": "register", "zone": 7, "capacity": 10})["ok"]
+    assert not coordinator_server.handle({"id": 3, "op": "register", "zone": 7, "capacity": 20})["ok"]
+
+
+def test_catalog_lock_is_a_lease():
+    coordinator_server = CoordinatorServer()
+    assert coordinator_server.handle({"op": "catalog_lock", "owner": "a", "lease": 60})["ok"]
+    assert not coordinator_server.handle({"op": "catalog_lock", "owner": "b", "lease": 60})["ok"]
+    assert not coordinator_server.handle({"op": "catalog_append", "owner": "b", "record": {}})["ok"]
+    assert coordinator_server.handle({"op": "catalog_append", "owner": "a", "record": {"op": "x"}})["position"] == 1
+    assert coordinator_server.handle({"op": "catalog_lock", "owner": "a", "lease": 0})["ok"]
+    # An expired lease is taken over
+    assert coordinator_server.handle({"op": "catalog_lock", "owner": "b", "lease": 60})["ok"]
+    assert coordinator_server.handle({"op": "catalog_read", "position": 0})["records"] == [{"op": "x"}]
+
+
+def test_unanswered_requests_fail_cleanly(silent_port):
+    controller = Controller()
+    user = controller.create_user(name="Buyer", email="buyer@example.com", password="", roles=["Buyer", "EventOrganizer"], password_hash="x")
+    event = controller.create_event(name="Offline", date=datetime(2024, 5, 1), organizer=user, hall=Hall(size="Small", capacity=10),
+                                    description="", image_url="", zones=ZONES)
+    zone = next(iter(event.zones.values()))
+    order = controller.create_order(buyer=user)
+    assert controller.purchase_tickets(order_id=order.id, zone=zone, quantity=2)
+
+    coordinator = RemoteCoordinator("127.0.0.1", silent_port, timeout=0.2)
+    controller.use_coordinator(coordinator)
+    result = controller.purchase_many(controller.create_order(buyer=user), {zone: 1})
+    assert not result.success and zone in result.errors
+    assert controller.hold_tickets(zone, 1, user, ttl=60) is None
+    # Availability falls back to the local count
+    assert controller.get_available_tickets_count(zone) == 8
+
+    # A refund the coordinator did not acknowledge keeps its seat unavailable
+    ticket = order.tickets[0]
+    refund_request = controller.create_refund_request(ticket_id=ticket.id, buyer=user)
+    assert controller.approve_refund(refund_request.id)
+    assert ticket.status == TicketStatus.REFUNDED
+    assert zone.get_available_tickets_count() == 8
+    coordinator.close()
@@ -0,0 +1,61 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from controller import Controller, Hall
+from sqlite_controller import SQLiteController
+
+BASE = datetime(2024, 1, 1)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def controller(request, tmp_path):
+    if request.param == "memory":
+        yield Controller()
+    else:
+        controller = SQLiteController(str(tmp_path / "tickets.db"))
+        yield controller
+        controller.close()
+
+
+def book(controller, count=8, events=300, seed=24):
+    """Random bookings of one day each, with the expected calendar worked out by brute force."""
+    organizer = controller.create_user(name="Organizer", email="organizer@example.com", password="", roles=["EventOrganizer"], password_hash="x")
+    for _ in range(count):
+        controller.add_hall(Hall(size="Small", capacity=10))
+    halls = controller.get_halls()
+    rng = random.Random(seed)
+    booked = {}
+    for _ in range(events):
+        hall = rng.choice(halls)
+        date = BASE + timedelta(hours=rng.randrange(24 * 120))
+        clash = any(abs(date - other) < timedelta(days=1) for other in booked.get(hall.id, []))
+        assert controller.can_book_hall(hall.id, date) == (not clash)
+        event = controller.create_event(name="Booked", date=date, organizer=organizer, hall=hall, description="", image_url="", zones=[])
+        assert (event is not None) == (not clash)
+        if event is not None:
+            booked.setdefault(hall.id, []).append(date)
+    return halls, booked, rng
+
+
+def test_free_halls_are_the_complement_of_the_bookings(controller):
+    halls, booked, rng = book(controller)
+    for _ in range(200):
+        start = BASE + timedelta(hours=rng.randrange(24 * 125))
+        end = start + timedelta(hours=rng.randrange(1, 72))
+        expected = [hall.id for hall in halls
+                    if not any(date < end and date + timedelta(days=1) > start for date in booked.get(hall.id, []))]
+        assert [hall.id for hall in controller.get_free_halls(start, end)] == expected
+
+
+def test_booking_bounds_are_exclusive(controller):
+    halls, _, _ = book(controller, count=1, events=0)
+    hall = halls[0]
+    organizer = controller.get_user_by_email("organizer@example.com")
+    assert controller.create_event(name="Day", date=BASE, organizer=organizer, hall=hall, description="", image_url="", zones=[])
+    assert not controller.can_book_hall(hall.id, BASE + timedelta(hours=23))
+    assert controller.can_book_hall(hall.id, BASE + timedelta(days=1))
+    assert controller.can_book_hall(hall.id, BASE - timedelta(days=1))
+    assert [free.id for free in controller.get_free_halls(BASE + timedelta(days=1), BASE + timedelta(days=2))] == [hall.id]
+    assert controller.get_free_halls(BASE - timedelta(hours=1), BASE + timedelta(minutes=1)) == []
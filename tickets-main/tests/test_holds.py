@@ -0,0 +1,65 @@
+import time
+
+from controller import HoldStatus, TicketStatus, TimingWheel
+
+
+def test_timing_wheel_returns_items_once_when_due():
+    wheel = TimingWheel(tick=1.0, slots=4, now=0.0)
+    wheel.schedule(1, "soon", 2.5)
+    wheel.schedule(2, "next revolution", 6.0)
+    wheel.schedule(3, "cancelled", 2.0)
+    assert wheel.cancel(3) == "cancelled" and wheel.cancel(3) is None
+    assert wheel.advance(2.0) == []
+    assert wheel.advance(3.0) == ["soon"]
+    # Slot 2 is visited again at tick 6, where the second item is due
+    assert wheel.advance(5.9) == []
+    assert wheel.advance(100.0) == ["next revolution"]
+    assert len(wheel) == 0
+
+
+def test_timing_wheel_expires_items_already_due_on_the_next_tick():
+    wheel = TimingWheel(tick=1.0, slots=512, now=100.5)
+    wheel.schedule(1, "late", 100.0)
+    assert wheel.advance(101.0) == ["late"]
+
+
+def test_expired_holds_return_their_seats(make_event):
+    controller, buyer, event = make_event()
+    zone = event.zones["Regular"]
+    hold = controller.hold_tickets(zone, 4, buyer, ttl=30)
+    assert zone.get_tickets_count(TicketStatus.HELD) == 4 and zone.get_available_tickets_count() == 6
+    assert controller.expire_holds(time.monotonic()) == 0
+    assert controller.expire_holds(time.monotonic() + 60) == 1
+    assert hold.status == HoldStatus.EXPIRED
+    assert zone.get_tickets_count(TicketStatus.HELD) == 0 and zone.get_available_tickets_count() == 10
+    assert not controller.release_hold(hold.id)
+
+
+def test_converted_hold_sells_exactly_its_seats(make_event):
+    controller, buyer, event = make_event()
+    zone = event.zones["Regular"]
+    hold = controller.hold_tickets(zone, 3, buyer, ttl=30)
+    assert controller.hold_tickets(zone, 8, buyer, ttl=30) is None
+    order = controller.create_order(buyer=buyer)
+    assert controller.convert_hold_to_order(hold.id, order.id)
+    assert hold.status == HoldStatus.CONVERTED
+    assert all(zone.get_ticket_status(index) == TicketStatus.SOLD and zone.get_ticket_buyer_id(index) == buyer.id for index in hold.seats)
+    assert zone.get_sold_tickets_count() == 3 and zone.get_tickets_count(TicketStatus.HELD) == 0
+    # A converted hold can neither be converted again nor expire
+    assert not controller.convert_hold_to_order(hold.id, order.id)
+    assert controller.expire_holds(time.monotonic() + 60) == 0
+
+
+def test_hold_cannot_be_used_by_another_buyer_or_after_expiry(make_event):
+    controller, buyer, event = make_event()
+    zone = event.zones["Regular"]
+    other = controller.create_user(name="Other", email="other@example.com", password="secret", roles=["Buyer"])
+    hold = controller.hold_tickets(zone, 2, buyer, ttl=30)
+    assert not controller.convert_hold_to_order(hold.id, controller.create_order(buyer=other).id)
+
+    assert controller.hold_tickets(zone, 2, buyer, ttl=0) is None
+    expired = controller.hold_tickets(zone, 2, buyer, ttl=0.01)
+    time.sleep(0.02)
+    assert not controller.convert_hold_to_order(expired.id, controller.create_order(buyer=buyer).id)
+    assert expired.status == HoldStatus.EXPIRED
+    assert zone.get_tickets_count(TicketStatus.HELD) == 2
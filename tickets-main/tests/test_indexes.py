@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from controller import Controller, Hall
+
+
+def test_records_are_found_by_id_and_normalized_email():
+    controller = Controller()
+    users = [controller.create_user(name=f"User {i}", email=f"User{i}@Example.com", password="", roles=["Buyer", "EventOrganizer"], password_hash="x")
+             for i in range(20)]
+    assert controller.get_user_by_email("  user7@EXAMPLE.com ") is users[7]
+    assert all(controller.get_user_by_id(user.id) is user for user in users)
+
+    hall = Hall(size="Small", capacity=10)
+    controller.add_hall(hall)
+    event = controller.create_event(name="Indexed", date=datetime(2024, 11, 1), organizer=users[0], hall=hall, description="", image_url="",
+                                    zones=[{"type": "Regular", "percentage": 1.0, "price": 10.0, "quantity": 10}])
+    order = controller.create_order(buyer=users[1])
+    assert controller.purchase_tickets(order_id=order.id, zone=event.zones["Regular"], quantity=1)
+    request = controller.create_refund_request(ticket_id=event.zones["Regular"].get_ticket(0).id, buyer=users[1])
+    assert controller.get_hall_by_id(hall.id) is hall
+    assert controller.get_event_by_id(event.id) is event
+    assert controller.get_order_by_id(order.id) is order
+    assert controller.get_refund_request_by_id(request.id) is request
+
+
+def test_missing_records_are_none():
+    controller = Controller()
+    assert controller.get_user_by_email("nobody@example.com") is None
+    assert controller.get_user_by_id(10 ** 9) is None
+    assert controller.get_event_by_id(10 ** 9) is None
+    assert controller.get_order_by_id(10 ** 9) is None
+    assert controller.get_refund_request_by_id(10 ** 9) is None
@@ -0,0 +1,68 @@
+import io
+import json
+import logging
+
+import pytest
+
+from log_config import configure_logging, parse_levels
+
+
+@pytest.fixture
+def root_logger():
+    """Put back the root handlers and the levels the tests change."""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    logging.getLogger("quiet").setLevel(logging.NOTSET)
+
+
+class Formatted:
+    """Log argument that counts how often its message is formatted."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "formatted"
+
+
+def test_queued_json_records_are_written_by_the_listener(root_logger):
+    stream = io.StringIO()
+    listener = configure_logging(logging.INFO, module_levels={"quiet": "WARNING"}, json_format=True, stream=stream)
+    argument, skipped = Formatted(), Formatted()
+    logging.getLogger("loud").info("Order %s", argument, extra={"order_id": 7})
+    logging.getLogger("quiet").info("Not written %s", skipped)
+    listener.stop()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["logger"] == "loud" and lines[0]["message"] == "Order formatted" and lines[0]["order_id"] == 7
+    assert argument.calls == 1 and skipped.calls == 0
+
+
+def test_queued_records_keep_the_arguments_and_traceback_they_were_logged_with(root_logger):
+    stream = io.StringIO()
+    listener = configure_logging(logging.INFO, stream=stream)
+    roles = ["Buyer"]
+    logging.getLogger("controller").info("User created with roles %s", roles)
+    roles.append("Admin")
+    try:
+        raise ValueError("bad seat")
+    except ValueError:
+        logging.getLogger("controller").exception("Purchase failed")
+    listener.stop()
+
+    output = stream.getvalue()
+    assert "roles ['Buyer']\n" in output
+    assert "Purchase failed\nTraceback" in output and "ValueError: bad seat" in output
+
+
+def test_parse_levels():
+    assert parse_levels("controller=warning, persistence=DEBUG,") == {"controller": "WARNING", "persistence": "DEBUG"}
+    assert parse_levels("") == {}
@@ -0,0 +1,71 @@
+import asyncio
+import io
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from media import ImageStore
+
+
+class Upload:
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self.file = io.BytesIO(data)
+
+
+def png(width=800, height=600) -> bytes:
+    data = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(data, format="PNG")
+    return data.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    made = threading.Event()
+    store = ImageStore(root=str(tmp_path / "images"), thumbnail_size=(80, 60), max_bytes=64 * 1024, workers=1, on_thumbnail=lambda image_url: made.set())
+    yield store, made
+    store.close()
+
+
+def test_same_bytes_are_stored_once_with_a_thumbnail(store):
+    images, made = store
+    first = asyncio.run(images.save_upload(Upload("poster.png", png())))
+    second = asyncio.run(images.save_upload(Upload("copy.PNG", png())))
+    assert first == second and first.endswith(".png") and os.path.isfile(first)
+    assert made.wait(30)
+    thumbnail = images.thumbnail_url(first)
+    assert thumbnail != first
+    with Image.open(thumbnail) as image:
+        assert image.format == "JPEG" and image.width <= 80 and image.height <= 60
+
+
+def test_refused_uploads_leave_nothing_behind(store):
+    images, _ = store
+    with pytest.raises(ValueError):
+        asyncio.run(images.save_upload(Upload("poster.exe", png())))
+    with pytest.raises(ValueError):
+        asyncio.run(images.save_upload(Upload("huge.png", os.urandom(128 * 1024))))
+    leftovers = [name for _, _, names in os.walk(images.root) for name in names]
+    assert leftovers == []
+    assert images.thumbnail_url("https://example.com/poster.png") == "https://example.com/poster.png"
+
+
+def test_failed_thumbnails_are_tried_again(tmp_path, caplog):
+    made = threading.Event()
+    images = ImageStore(root=str(tmp_path / "images"), thumbnail_size=(80, 60), workers=1, retry_after=0, on_thumbnail=lambda image_url: made.set())
+    try:
+        broken = asyncio.run(images.save_upload(Upload("broken.png", b"not an image")))
+        deadline = time.monotonic() + 30
+        while not any("failed" in record.getMessage() for record in caplog.records) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not made.is_set()
+        # Fix the file behind the stored name; the next page view retries
+        with open(broken, "wb") as repaired:
+            repaired.write(png())
+        assert images.thumbnail_url(broken) == broken
+        assert made.wait(30) and images.thumbnail_url(broken) != broken
+    finally:
+        images.close()
@@ -0,0 +1,67 @@
+import asyncio
+import re
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from page_cache import PageCache, PageCacheMiddleware
+
+
+def test_invalidated_scopes_and_failed_renders_are_rendered_again():
+    cache = PageCache()
+    renders = []
+
+    async def render(status=200):
+        renders.append(status)
+        return status, [], b"page %d" % len(renders)
+
+    async def scenario():
+        first = await cache.get("event:1", ("event:1",), render)
+        assert (await cache.get("event:1", ("event:1",), render)) is first
+        cache.invalidate("event:1")
+        assert (await cache.get("event:1", ("event:1",), render)).body == b"page 2"
+        # Errors are not cached
+        await cache.get("event:2", ("event:2",), lambda: render(500))
+        await cache.get("event:2", ("event:2",), lambda: render(500))
+    asyncio.run(scenario())
+    assert renders == [200, 200, 500, 500]
+
+
+def test_concurrent_misses_share_one_render():
+    cache = PageCache()
+    renders = []
+
+    async def render():
+        renders.append(1)
+        await asyncio.sleep(0.01)
+        return 200, [], b"events"
+
+    async def scenario():
+        return await asyncio.gather(*[cache.get("events", ("events",), render) for _ in range(10)])
+    pages = asyncio.run(scenario())
+    assert len(renders) == 1 and all(page is pages[0] for page in pages)
+    assert cache.get_metrics()["collapsed"] == 9
+
+
+def test_middleware_serves_cached_pages_with_etags():
+    cache, renders = PageCache(), []
+
+    def events(request):
+        renders.append(request.url.path)
+        response = PlainTextResponse(f"render {len(renders)}")
+        response.set_cookie("visitor", "private")
+        return response
+
+    app = Starlette(routes=[Route("/events", events)])
+    app.add_middleware(PageCacheMiddleware, cache=cache, routes=[(re.compile(r"/events"), lambda request, match: ("events", ("events",)))])
+    client = TestClient(app)
+
+    first = client.get("/events")
+    assert first.text == "render 1" and "set-cookie" not in first.headers
+    assert client.get("/events").text == "render 1"
+    assert client.get("/events", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+    cache.invalidate("events")
+    assert client.get("/events").text == "render 2"
+    assert renders == ["/events", "/events"]
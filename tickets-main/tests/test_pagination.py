@@ -0,0 +1,69 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from controller import Controller, Hall
+from sqlite_controller import SQLiteController
+
+BASE = datetime(2024, 1, 1)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def controller(request, tmp_path):
+    if request.param == "memory":
+        yield Controller()
+    else:
+        controller = SQLiteController(str(tmp_path / "tickets.db"))
+        yield controller
+        controller.close()
+
+
+def create_events(controller, count=57):
+    organizer = controller.create_user(name="Organizer", email="organizer@example.com", password="", roles=["EventOrganizer"], password_hash="x")
+    for _ in range(3):
+        controller.add_hall(Hall(size="Small", capacity=10))
+    halls = controller.get_halls()
+    rng = random.Random(20)
+    for i in range(count):
+        # Several events share a date, so pages have to break ties by ID
+        controller.create_event(name=f"Event {i}", date=BASE + timedelta(days=rng.randrange(20)), organizer=organizer, hall=halls[i % 3],
+                                description="", image_url="", zones=[], allow_overlap=True)
+    return organizer, halls
+
+
+def walk(controller, limit, **filters):
+    events, cursor = [], None
+    while True:
+        page = controller.get_events_page(cursor=cursor, limit=limit, **filters)
+        assert len(page.events) <= limit
+        events.extend(page.events)
+        if page.next_cursor is None:
+            return events, page.total
+        cursor = page.next_cursor
+
+
+def test_pages_cover_the_catalog_in_date_order(controller):
+    _, halls = create_events(controller)
+    expected = sorted(controller.get_events(), key=lambda event: (event.date, event.id))
+    for limit in (1, 7, 20, 100):
+        events, total = walk(controller, limit)
+        assert [event.id for event in events] == [event.id for event in expected]
+        assert total == len(expected)
+
+    start, end = BASE + timedelta(days=5), BASE + timedelta(days=12)
+    events, total = walk(controller, 4, hall_id=halls[1].id, start=start, end=end)
+    matching = [event.id for event in expected if event.hall.id == halls[1].id and start <= event.date < end]
+    assert [event.id for event in events] == matching and total == len(matching)
+
+
+def test_cursor_survives_events_added_before_it(controller):
+    organizer, halls = create_events(controller)
+    first = controller.get_events_page(limit=10)
+    controller.create_event(name="Earlier", date=BASE - timedelta(days=1), organizer=organizer, hall=halls[0],
+                            description="", image_url="", zones=[], allow_overlap=True)
+    rest, _ = walk(controller, 10)
+    second = controller.get_events_page(cursor=first.next_cursor, limit=10)
+    # The next page carries on after the last event shown, without repeats
+    assert [event.id for event in second.events] == [event.id for event in rest[11:21]]
+    assert not {event.id for event in first.events} & {event.id for event in second.events}
@@ -0,0 +1,41 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from passwords import PBKDF2, SCRYPT, HashingPool, PasswordHasher, PasswordHashingBusy, verify_password
+
+FAST_SCRYPT = PasswordHasher(SCRYPT, scrypt_n=2 ** 10)
+FAST_PBKDF2 = PasswordHasher(PBKDF2, pbkdf2_iterations=1000)
+
+
+@pytest.mark.parametrize("hasher", [FAST_SCRYPT, FAST_PBKDF2])
+def test_hashes_are_salted_and_verify(hasher):
+    first, second = hasher.hash("secret"), hasher.hash("secret")
+    assert first != second and first.startswith(hasher.algorithm + "$")
+    assert verify_password("secret", first) and not verify_password("wrong", first)
+    assert not hasher.needs_rehash(first)
+
+
+def test_legacy_and_outdated_hashes_verify_and_need_a_rehash():
+    legacy = hashlib.sha256(b"secret").hexdigest()
+    assert verify_password("secret", legacy)
+    assert verify_password("secret", hashlib.sha256(legacy.encode()).hexdigest())
+    assert FAST_SCRYPT.needs_rehash(legacy)
+    assert FAST_SCRYPT.needs_rehash(FAST_PBKDF2.hash("secret"))
+    assert FAST_SCRYPT.needs_rehash(PasswordHasher(SCRYPT, scrypt_n=2 ** 11).hash("secret"))
+    with pytest.raises(ValueError):
+        PasswordHasher("md5")
+
+
+def test_pool_rejects_work_beyond_its_queue():
+    pool = HashingPool(PasswordHasher(SCRYPT, scrypt_n=2 ** 14), max_workers=1, max_pending=1)
+
+    async def storm():
+        return await asyncio.gather(*[pool.hash("secret") for _ in range(6)], return_exceptions=True)
+
+    results = asyncio.run(storm())
+    assert sum(isinstance(result, PasswordHashingBusy) for result in results) == 4
+    assert all(verify_password("secret", result) for result in results if isinstance(result, str))
+    metrics = pool.get_metrics()
+    assert metrics["completed"] == 2 and metrics["rejected"] == 4 and metrics["in_flight"] == 0
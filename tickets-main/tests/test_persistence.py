@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pytest
+
+from controller import Hall, TicketList, TicketStatus
+from persistence import ControllerStore, COUNTERS
+
+ZONES = [
+    {"type": "VIP", "percentage": 0.2, "price": 100.0, "quantity": 20},
+    {"type": "Regular", "percentage": 0.8, "price": 25.0, "quantity": 80},
+]
+
+
+def state(controller) -> list:
+    """Everything a restore must bring back, by ID."""
+    snapshot = [
+        [(user.id, user.email, user.password_hash, user.roles, [ticket.id for ticket in controller.get_user_tickets(user.id)]) for user in controller.get_users()],
+        [(hall.id, hall.size, hall.capacity) for hall in controller.get_halls()],
+        [(order.id, order.buyer.id, order.status, order.total_price, [ticket.id for ticket in order.tickets]) for order in controller.get_orders()],
+        [(request.id, request.ticket.id, request.status) for request in controller.get_refund_requests()],
+        {name: getattr(cls, counter) for name, (cls, counter) in COUNTERS.items() if name not in ("Hold", "Payment")},
+    ]
+    for event in controller.get_events():
+        snapshot.append((event.id, event.name, event.date, event.hall.id))
+        for zone in event.zones.values():
+            statuses, buyer_ids, counts = zone.export_inventory()
+            snapshot.append((zone.id, zone.type, zone.first_ticket_id, bytes(statuses), bytes(buyer_ids), counts))
+    return snapshot
+
+
+def populate(controller, name="Concert", buyers=5):
+    organizer = controller.create_user(name="Organizer", email=f"organizer-{name}@example.com", password="", roles=["EventOrganizer"], password_hash="x")
+    hall = Hall(size="Large", capacity=100)
+    controller.add_hall(hall)
+    event = controller.create_event(name=name, date=datetime(2024, 6, 1), organizer=organizer, hall=hall, description="", image_url="", zones=ZONES)
+    for i in range(buyers):
+        buyer = controller.create_user(name=f"Buyer {i}", email=f"buyer{i}-{name}@example.com", password="", roles=["Buyer"], password_hash="x")
+        order = controller.create_order(buyer=buyer)
+        assert controller.purchase_many(order, {event.zones["VIP"]: 1, event.zones["Regular"]: 2}).success
+        controller.complete_order(order.id)
+    ticket = controller.get_orders()[-1].tickets[0]
+    controller.approve_refund(controller.create_refund_request(ticket_id=ticket.id, buyer=ticket.buyer).id)
+    ticket = controller.get_orders()[-2].tickets[1]
+    controller.reject_refund(controller.create_refund_request(ticket_id=ticket.id, buyer=ticket.buyer).id)
+    return event
+
+
+@pytest.fixture
+def store(tmp_path):
+    stores = []
+
+    def open_store():
+        stores.append(ControllerStore(str(tmp_path / "data")))
+        return stores[-1], stores[-1].open()
+    yield open_store
+    for opened in stores:
+        opened.close()
+
+
+def test_log_replay_restores_the_same_state(store):
+    first, controller = store()
+    populate(controller)
+    before = state(controller)
+    first.close()
+
+    second, restored = store()
+    assert second.restored
+    assert state(restored) == before
+
+
+def test_snapshot_and_log_restore_the_same_state(store):
+    first, controller = store()
+    populate(controller, "Before")
+    first.checkpoint(controller)
+    populate(controller, "After")
+    before = state(controller)
+    first.close()
+
+    _, restored = store()
+    assert state(restored) == before
+
+
+def test_restored_tickets_resolve_lazily_and_stay_usable(store):
+    first, controller = store()
+    event = populate(controller)
+    first.checkpoint(controller)
+    first.close()
+
+    _, restored = store()
+    order = restored.get_orders()[0]
+    assert isinstance(order.tickets, TicketList)
+    assert order.total_price == 150.0
+    ticket = order.tickets[0]
+    assert ticket.status == TicketStatus.SOLD and ticket in restored.get_user_tickets(order.buyer.id)
+    # Changing a restored list copies its IDs out of the snapshot mapping
+    request = restored.create_refund_request(ticket_id=ticket.id, buyer=order.buyer)
+    assert restored.approve_refund(request.id)
+    assert ticket not in restored.get_user_tickets(order.buyer.id)
+    zone = restored.get_zone_by_id(event.zones["VIP"].id)
+    assert zone.get_available_tickets_count() == event.zones["VIP"].capacity - 3
+
+
+def test_background_save_restores_the_same_state(store):
+    first, controller = store()
+    populate(controller)
+    save = first.background_checkpoint(controller)
+    assert save is not None and save.wait(30)
+    assert save.state == "succeeded"
+    populate(controller, "After")
+    before = state(controller)
+    first.close()
+
+    _, restored = store()
+    assert state(restored) == before
+
+
+def test_failed_background_save_reports_its_error(store, monkeypatch):
+    first, controller = store()
+    populate(controller)
+
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr("persistence.write_snapshot", disk_full)
+    save = first.background_checkpoint(controller)
+    assert save is not None and save.wait(30)
+    assert save.state == "failed" and save.error == "OSError: No space left on device"
@@ -0,0 +1,39 @@
+import threading
+
+from controller import TicketStatus
+
+
+def test_purchase_is_all_zones_or_none(make_event):
+    controller, buyer, event = make_event({"VIP": 10, "Regular": 40})
+    vip, regular = event.zones["VIP"], event.zones["Regular"]
+    order = controller.create_order(buyer=buyer)
+    result = controller.purchase_many(order, {vip: 11, regular: 5})
+    assert not result.success and vip in result.errors and regular not in result.errors
+    assert result.tickets == {}
+    assert vip.get_available_tickets_count() == 10 and regular.get_available_tickets_count() == 40
+
+    result = controller.purchase_many(order, {vip: 10, regular: 5})
+    assert result.success
+    assert len(result.tickets[vip]) == 10 and len(result.tickets[regular]) == 5
+    assert all(ticket.status == TicketStatus.SOLD and ticket.buyer is buyer for tickets in result.tickets.values() for ticket in tickets)
+    assert vip.get_available_tickets_count() == 0 and regular.get_available_tickets_count() == 35
+
+
+def test_concurrent_purchases_never_oversell(make_event):
+    controller, buyer, event = make_event({"VIP": 10, "Regular": 40})
+    vip, regular = event.zones["VIP"], event.zones["Regular"]
+    results = []
+
+    def buy():
+        results.append(controller.purchase_many(controller.create_order(buyer=buyer), {vip: 1, regular: 3}))
+    threads = [threading.Thread(target=buy) for _ in range(30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    succeeded = [result for result in results if result.success]
+    assert len(succeeded) == 10
+    seats = [ticket.index for result in succeeded for ticket in result.tickets[regular]]
+    assert len(seats) == len(set(seats)) == 30
+    assert vip.get_sold_tickets_count() == 10 and regular.get_sold_tickets_count() == 30
@@ -0,0 +1,65 @@
+import random
+from datetime import datetime, timedelta
+
+from search import EventSearchIndex, tokenize
+
+BASE = datetime(2024, 1, 1)
+WORDS = ["jazz", "jam", "rock", "rocket", "opera", "open", "air", "night", "festival", "quartet"]
+
+
+def test_results_match_every_word_and_the_date_range():
+    rng = random.Random(21)
+    index, events = EventSearchIndex(), {}
+    for event_id in range(1, 301):
+        name = " ".join(rng.sample(WORDS, 2))
+        description = " ".join(rng.choices(WORDS, k=4))
+        date = BASE + timedelta(days=rng.randrange(60))
+        index.add(event_id, name, description, date)
+        events[event_id] = (set(tokenize(name + " " + description)), date)
+
+    for _ in range(200):
+        words = rng.sample(WORDS, rng.randint(1, 2))
+        words[-1] = words[-1][:rng.randint(2, len(words[-1]))]  # The last word may be a prefix
+        start = BASE + timedelta(days=rng.randrange(60)) if rng.random() < 0.5 else None
+        end = start + timedelta(days=rng.randrange(1, 20)) if start and rng.random() < 0.7 else None
+        expected = {
+            event_id for event_id, (terms, date) in events.items()
+            if all(word in terms for word in words[:-1]) and any(term.startswith(words[-1]) for term in terms)
+            and (start is None or date >= start) and (end is None or date < end)
+        }
+        assert set(index.search(" ".join(words), start=start, end=end, limit=len(events))) == expected
+
+
+def test_name_matches_rank_first_and_dates_break_ties():
+    index = EventSearchIndex()
+    index.add(1, "Summer opening", "A jazz evening", BASE + timedelta(days=2))
+    index.add(2, "Jazz night", "Late show", BASE + timedelta(days=3))
+    index.add(3, "Jazz brunch", "Morning show", BASE + timedelta(days=1))
+    index.add(4, "Rock night", "No jazz at all", BASE)
+    assert index.search("jazz") == [3, 2, 4, 1]
+    assert index.search("ja", limit=2) == [3, 2]
+    assert index.search("jazz night") == [2, 4]
+    assert index.search("", start=BASE + timedelta(days=1), limit=2) == [3, 1]
+    assert index.search("blues") == []
+
+
+def test_suggestions_are_the_most_common_completions():
+    index = EventSearchIndex()
+    index.add(1, "Rock night", "", BASE)
+    index.add(2, "Rock opera", "", BASE)
+    index.add(3, "Rocket launch", "", BASE)
+    assert index.suggest("Ro") == ["rock", "rocket"]
+    assert index.suggest("o") == ["opera"]
+    assert index.suggest("") == []
+
+
+def test_a_short_prefix_matches_every_term_it_starts():
+    index = EventSearchIndex()
+    for event_id in range(1, 72):
+        index.add(event_id, f"Rock a{event_id:03d}", "", BASE)
+    index.add(999, "Rock azure", "", BASE)
+    index.add(1000, "Jazz azure", "", BASE)
+    results = index.search("rock a", limit=200)
+    assert len(results) == 72 and 999 in results and 1000 not in results
+    assert len(index.search("a", limit=200)) == 73
+    assert index.suggest("az") == ["azure"]
@@ -0,0 +1,40 @@
+import time
+
+from controller import User
+from sessions import SessionStore, SignedCookieSessions
+
+
+def make_user(i=1):
+    return User(name=f"User {i}", email=f"user{i}@example.com", password="", roles=["Buyer"], password_hash="x")
+
+
+def test_store_evicts_the_least_recently_used_session_when_full():
+    store = SessionStore(max_size=2)
+    users = [make_user(i) for i in range(3)]
+    first, second = store.create(users[0]), store.create(users[1])
+    assert store.get(first) is users[0]  # The second session is now the least recently used
+    third = store.create(users[2])
+    assert len(store) == 2
+    assert store.get(second) is None
+    assert store.get(first) is users[0] and store.get(third) is users[2]
+
+
+def test_idle_sessions_expire():
+    store = SessionStore(idle_ttl=60)
+    first, second = store.create(make_user(1)), store.create(make_user(2))
+    assert store.evict_expired(time.monotonic()) == 0
+    assert store.evict_expired(time.monotonic() + 120) == 2
+    assert store.get(first) is None and store.get(second) is None
+
+
+def test_signed_cookie_sessions_need_a_valid_unexpired_signature():
+    user = make_user()
+    sessions = SignedCookieSessions(lookup_user={user.id: user}.get, secret=b"secret")
+    session_id = sessions.create(user)
+    assert sessions.get(session_id) is user
+    assert SignedCookieSessions(lookup_user={user.id: user}.get, secret=b"secret").get(session_id) is user
+    assert SignedCookieSessions(lookup_user={user.id: user}.get, secret=b"other").get(session_id) is None
+    payload, signature = session_id.rsplit(".", 1)
+    assert sessions.get(f"{user.id + 1}:{payload.split(':')[1]}.{signature}") is None
+    expired = SignedCookieSessions(lookup_user={user.id: user}.get, secret=b"secret", ttl=-1)
+    assert expired.get(expired.create(user)) is None
@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import uuid
+from datetime import datetime
+
+import pytest
+
+from controller import Controller, Hall
+from shared_inventory import SharedInventory
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "event_ticketing")
+
+# Another worker: creates its own event, sells from it and reports every zone it sees
+WORKER = """
+import json, sys
+from datetime import datetime
+from controller import Controller, Hall
+from shared_inventory import SharedInventory
+
+name, lock_dir, create = sys.argv[1], sys.argv[2], sys.argv[3] == "create"
+controller = Controller()
+inventory = SharedInventory(name, lock_dir)
+controller.attach_shared_inventory(inventory)
+if create:
+    with controller.shared_catalog():
+        user = controller.create_user(name="Worker", email="worker@example.com", password="", roles=["Buyer", "EventOrganizer"], password_hash="x")
+        hall = Hall(size="Small", capacity=10)
+        controller.add_hall(hall)
+        event = controller.create_event(name="Worker event", date=datetime(2024, 5, 1), organizer=user, hall=hall, description="",
+                                        image_url="", zones=[{"type": "Regular", "percentage": 1.0, "price": 10.0, "quantity": 10}])
+    order = controller.create_order(buyer=user)
+    assert controller.purchase_tickets(order_id=order.id, zone=next(iter(event.zones.values())), quantity=3)
+else:
+    inventory.catalog.sync(controller)
+json.dump({event.name: {zone.id: zone.get_available_tickets_count() for zone in event.zones.values()} for event in controller.get_events()}, sys.stdout)
+"""
+
+
+def run_worker(inventory_name, lock_dir, create):
+    completed = subprocess.run([sys.executable, "-c", WORKER, inventory_name, lock_dir, "create" if create else "read"],
+                               cwd=SOURCE_DIR, check=True, stdout=subprocess.PIPE, text=True)
+    return {name: {int(zone_id): count for zone_id, count in zones.items()} for name, zones in json.loads(completed.stdout).items()}
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    inventory = SharedInventory(f"tickets-test-{uuid.uuid4().hex[:8]}", str(tmp_path))
+    yield inventory
+    inventory.unlink()
+
+
+def test_workers_with_different_events_share_ids_and_seats(inventory, tmp_path):
+    worker_events = run_worker(inventory.name, str(tmp_path), create=True)
+    assert list(worker_events) == ["Worker event"]
+
+    controller = Controller()
+    controller.attach_shared_inventory(inventory)
+    with controller.shared_catalog():
+        # The other worker's user, hall and event are applied before anything is created here
+        user = controller.get_user_by_email("worker@example.com")
+        assert user is not None
+        hall = Hall(size="Large", capacity=20)
+        controller.add_hall(hall)
+        event = controller.create_event(name="Local event", date=datetime(2024, 5, 1), organizer=user, hall=hall, description="",
+                                        image_url="", zones=[{"type": "Regular", "percentage": 1.0, "price": 10.0, "quantity": 20}])
+    local_zone = next(iter(event.zones.values()))
+    worker_zone_id, = worker_events["Worker event"]
+    assert local_zone.id != worker_zone_id
+    assert controller.get_zone_by_id(worker_zone_id).get_available_tickets_count() == 7
+
+    order = controller.create_order(buyer=user)
+    assert controller.purchase_tickets(order_id=order.id, zone=local_zone, quantity=5)
+
+    # A third worker sees both events, each with its own seats
+    assert run_worker(inventory.name, str(tmp_path), create=False) == {
+        "Worker event": {worker_zone_id: 7},
+        "Local event": {local_zone.id: 15},
+    }
+
+
+def test_sync_applies_records_outside_a_section(inventory, tmp_path):
+    controller = Controller()
+    controller.attach_shared_inventory(inventory)
+    assert not inventory.catalog.has_new_records()
+    run_worker(inventory.name, str(tmp_path), create=True)
+    assert inventory.catalog.has_new_records()
+    inventory.catalog.sync(controller)
+    assert [event.name for event in controller.get_events()] == ["Worker event"]
+    assert not inventory.catalog.has_new_records()
+
+
+def test_catalog_records_are_refused_outside_a_section(inventory):
+    controller = Controller()
+    controller.attach_shared_inventory(inventory)
+    with pytest.raises(RuntimeError):
+        inventory.catalog.publish({"op": "add_hall", "id": 1, "size": "Small", "capacity": 1})
+
+
+def test_seats_freed_by_one_worker_are_found_by_another(inventory, caplog):
+    first = Controller()
+    first.attach_shared_inventory(inventory)
+    with first.shared_catalog():
+        user = first.create_user(name="Buyer", email="buyer@example.com", password="", roles=["Buyer", "EventOrganizer"], password_hash="x")
+        hall = Hall(size="Small", capacity=100)
+        first.add_hall(hall)
+        event = first.create_event(name="Shared", date=datetime(2024, 5, 1), organizer=user, hall=hall, description="",
+                                   image_url="", zones=[{"type": "Regular", "percentage": 1.0, "price": 10.0, "quantity": 100}])
+    second = Controller()
+    second.attach_shared_inventory(SharedInventory(inventory.name, os.path.dirname(inventory.catalog.path)))
+    with second.shared_catalog():
+        second_user = second.get_user_by_email("buyer@example.com")
+    first_zone = event.zones["Regular"]
+    second_zone = second.get_zone_by_id(first_zone.id)
+
+    # The second worker holds seats the first worker's allocator never handed out
+    assert first.purchase_many(first.create_order(buyer=user), {first_zone: 40}).success
+    hold = second.hold_tickets(second_zone, 20, second_user, ttl=60)
+    assert hold.seats == list(range(40, 60))
+    assert first.purchase_many(first.create_order(buyer=user), {first_zone: 40}).success
+    assert second.release_hold(hold.id)
+
+    with caplog.at_level(logging.ERROR, logger="controller"):
+        result = first.purchase_many(first.create_order(buyer=user), {first_zone: 20})
+    assert result.success
+    assert sorted(ticket.index for ticket in result.tickets[first_zone]) == list(range(40, 60))
+    assert first_zone.get_available_tickets_count() == 0
+    assert not caplog.records
@@ -0,0 +1,68 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from controller import Hall, TicketStatus
+from sqlite_controller import SQLiteController
+
+ZONES = [
+    {"type": "VIP", "percentage": 0.2, "price": 100.0, "quantity": 4},
+    {"type": "Regular", "percentage": 0.8, "price": 25.0, "quantity": 16},
+]
+
+
+@pytest.fixture
+def database(tmp_path):
+    controllers = []
+
+    def open_controller():
+        controllers.append(SQLiteController(str(tmp_path / "tickets.db")))
+        return controllers[-1]
+    yield open_controller
+    for controller in controllers:
+        controller.close()
+
+
+def create_event(controller):
+    organizer = controller.create_user(name="Organizer", email="organizer@example.com", password="", roles=["Buyer", "EventOrganizer"], password_hash="x")
+    controller.add_hall(Hall(size="Medium", capacity=20))
+    hall = controller.get_halls()[-1]
+    event = controller.create_event(name="Stored", date=datetime(2024, 12, 1), organizer=organizer, hall=hall, description="", image_url="", zones=ZONES)
+    return organizer, event
+
+
+def test_sales_and_refunds_survive_a_reopen(database):
+    controller = database()
+    buyer, event = create_event(controller)
+    order = controller.create_order(buyer=buyer)
+    result = controller.purchase_many(order, {event.zones["VIP"]: 2, event.zones["Regular"]: 3})
+    assert result.success and controller.complete_order(order.id)
+    ticket = result.tickets[event.zones["Regular"]][0]
+    assert controller.approve_refund(controller.create_refund_request(ticket_id=ticket.id, buyer=buyer).id)
+
+    reopened = database()
+    event = reopened.get_event_by_id(event.id)
+    assert event.zones["VIP"].get_available_tickets_count() == 2
+    assert event.zones["Regular"].get_available_tickets_count() == 14
+    # The refunded seat is back on sale, as in the in-memory controller
+    assert reopened.get_ticket_by_id(ticket.id).status == TicketStatus.AVAILABLE
+    assert len(reopened.get_user_tickets(buyer.id)) == 4
+    assert reopened.get_user_by_email("ORGANIZER@example.com").id == buyer.id
+
+
+def test_purchases_from_two_connections_never_oversell(database):
+    buyer, event = create_event(database())
+    controllers = [database(), database()]
+    results = []
+
+    def buy(controller):
+        for _ in range(10):
+            results.append(controller.purchase_many(controller.create_order(buyer=buyer), {event.zones["Regular"]: 1}).success)
+    threads = [threading.Thread(target=buy, args=(controllers[i % 2],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 16
+    assert controllers[0].get_event_by_id(event.id).zones["Regular"].get_available_tickets_count() == 0
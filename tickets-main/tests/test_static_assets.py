@@ -0,0 +1,79 @@
+import asyncio
+import gzip
+import os
+
+import pytest
+
+from static_assets import StaticAssets, StaticAssetMiddleware
+
+IMAGE_NAME = "ab" * 32 + ".png"
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """A working directory laid out like the app's: sources next to static/."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "app.py").write_text("SECRET = 'source code'\n")
+    (tmp_path / "static" / "images" / "ab").mkdir(parents=True)
+    (tmp_path / "static" / "images" / "ab" / IMAGE_NAME).write_bytes(b"\x89PNG not really")
+    (tmp_path / "static" / "site.css").write_text("body { color: red; }\n" * 100)
+    return StaticAssets(root="static")
+
+
+def get(assets, path, headers=()):
+    async def not_found(scope, receive, send):
+        raise AssertionError("request fell through to the app")
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "headers": [(name.encode(), value.encode()) for name, value in headers]}
+    asyncio.run(StaticAssetMiddleware(not_found, assets)(scope, None, send))
+    return messages[0]["status"], dict(messages[0]["headers"]), b"".join(message.get("body", b"") for message in messages[1:])
+
+
+def test_url_serves_file_with_immutable_caching(site):
+    url = site.url("static/site.css")
+    assert url.startswith("/assets/site.") and url.endswith(".css")
+    status, headers, body = get(site, url)
+    assert status == 200
+    assert headers[b"cache-control"] == b"public, max-age=31536000, immutable"
+    assert body == open("static/site.css", "rb").read()
+    assert get(site, url, [("if-none-match", headers[b"etag"].decode())])[0] == 304
+
+
+def test_content_addressed_name_is_its_fingerprint(site):
+    url = site.url(f"static/images/ab/{IMAGE_NAME}")
+    assert url == f"/assets/images/ab/{IMAGE_NAME[:-4]}.{'ab' * 8}.png"
+    assert get(site, url)[0] == 200
+
+
+def test_fingerprint_mismatch_is_not_found(site):
+    url = site.url("static/site.css")
+    with open("static/site.css", "a") as asset:
+        asset.write("changed")
+    assert get(site, url)[0] == 404
+    assert get(site, "/assets/site.0123456789abcdef.css")[0] == 404
+
+
+@pytest.mark.parametrize("path", [
+    "/assets/../app.0123456789abcdef.py",
+    "/assets/app.0123456789abcdef.py",
+    "/assets/.variants/x.0123456789abcdef.webp",
+])
+def test_files_outside_root_are_not_served(site, path):
+    assert get(site, path)[0] == 404
+
+
+def test_files_outside_root_are_not_fingerprinted(site):
+    assert site.url("app.py") == "/app.py"
+    assert site.url("https://example.com/a.jpg") == "https://example.com/a.jpg"
+
+
+def test_gzip_variant_for_text(site):
+    status, headers, body = get(site, site.url("static/site.css"), [("accept-encoding", "gzip, br")])
+    assert status == 200 and headers[b"content-encoding"] == b"gzip"
+    assert gzip.decompress(body) == open("static/site.css", "rb").read()
+    assert os.listdir("static/.variants")
@@ -0,0 +1,47 @@
+import threading
+
+from waiting_room import WaitingRoom
+
+
+def admitted_room(**settings):
+    room = WaitingRoom(event_id=1, admit_per_second=1.0, burst=5, secret=b"secret", **settings)
+    return room, room.get_position(room.join())
+
+
+def test_admission_is_bound_to_its_user():
+    room, position = admitted_room()
+    token = room.issue_admission_token(position, user_id=7)
+    assert room.verify_admission_token(token, 7)
+    assert not room.verify_admission_token(token, 8)
+    assert not room.consume_admission_token(token, 8)
+    assert not room.verify_admission_token(token + "0", 7)
+
+
+def test_admission_buys_once():
+    room, position = admitted_room()
+    token = room.issue_admission_token(position, user_id=7)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(room.consume_admission_token(token, 7))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+    assert not room.verify_admission_token(token, 7)
+    # The queue position cannot be traded for a fresh token either
+    assert room.issue_admission_token(position, user_id=7) is None
+
+
+def test_restored_admission_can_be_used_again():
+    room, position = admitted_room()
+    token = room.issue_admission_token(position, user_id=7)
+    assert room.consume_admission_token(token, 7)
+    room.restore_admission_token(token, 7)
+    assert room.consume_admission_token(token, 7)
+
+
+def test_expired_admissions_are_refused():
+    room, position = admitted_room(token_ttl=-1)
+    token = room.issue_admission_token(position, user_id=7)
+    assert not room.verify_admission_token(token, 7)
+    assert not room.consume_admission_token(token, 7)
@@ -0,0 +1,47 @@
+import random
+from datetime import datetime
+
+from controller import Hall, TicketStatus
+
+
+def test_seats_live_in_arrays_with_ticket_views_made_on_demand(make_event):
+    controller, buyer, event = make_event({"Regular": 50})
+    zone = event.zones["Regular"]
+    assert len(zone.tickets) == 50
+    ticket = zone.tickets[7]
+    assert ticket is zone.get_ticket(7) and ticket.index == 7 and ticket.zone is zone
+    assert ticket.status == TicketStatus.AVAILABLE and ticket.buyer is None
+
+    assert controller.purchase_tickets(order_id=controller.create_order(buyer=buyer).id, zone=zone, quantity=3)
+    statuses, buyer_ids, counts = zone.export_inventory()
+    assert len(statuses) == 50 and len(buyer_ids) == 8 * 50
+    assert [zone.get_ticket_status(index) for index in range(4)] == [TicketStatus.SOLD] * 3 + [TicketStatus.AVAILABLE]
+    assert zone.get_ticket(0).buyer is buyer and zone.get_ticket_buyer_id(0) == buyer.id
+    assert [ticket.index for ticket in zone.tickets[1:3]] == [1, 2]
+
+
+def test_status_counters_follow_every_transition(make_event):
+    _, _, event = make_event({"Regular": 50})
+    zone = event.zones["Regular"]
+    rng = random.Random(2)
+    statuses = list(TicketStatus)
+    for _ in range(1000):
+        with zone.lock:
+            zone.set_ticket_status(rng.randrange(50), rng.choice(statuses))
+        assert sum(zone.get_tickets_count(status) for status in statuses) == 50
+    assert zone.verify_counters()
+    for status in statuses:
+        assert zone.get_tickets_count(status) == sum(zone.get_ticket_status(index) == status for index in range(50))
+
+
+def test_ticket_ids_resolve_through_the_zone_ranges(make_event):
+    controller, buyer, event = make_event({"Regular": 50})
+    first = event.zones["Regular"]
+    second = controller.create_event(name="Second", date=datetime(2024, 10, 2), organizer=buyer, hall=Hall(size="Small", capacity=5),
+                                     description="", image_url="", zones=[{"type": "VIP", "percentage": 1.0, "price": 50.0, "quantity": 5}]).zones["VIP"]
+    for zone in (first, second):
+        for index in (0, zone.capacity - 1):
+            ticket = controller.get_ticket_by_id(zone.first_ticket_id + index)
+            assert ticket is zone.get_ticket(index) and ticket.id == zone.first_ticket_id + index
+    assert controller.get_ticket_by_id(first.first_ticket_id - 1) is None
+    assert controller.get_ticket_by_id(second.first_ticket_id + second.capacity) is None